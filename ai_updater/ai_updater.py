@@ -2,17 +2,76 @@ import os
 import argparse
 import subprocess
 import asyncio
+import functools
+import time
+import hashlib
+import contextvars
 
 from google import genai
 from google.genai import types
 from pydantic import BaseModel
 
-from ai_updater_utils import read_file_content, write_to_file, calculate_cost
+from ai_updater_utils import write_to_file, calculate_cost, estimate_tokens
 from ai_updater_tools import apply_patch, apply_patch_declaration
+from ai_updater_runtime import RequestBudget, ResponseCache
+from ai_updater_store import ContentStore, OverlayFS
+from ai_updater_validation import check_files, check_syntax, error_context
+from ai_updater_hunks import revert_spurious_hunks
+from ai_updater_topology import SdkTopology, file_stem
+from ai_updater_templates import TemplateResult, apply_templates
+from ai_updater_index import SdkIndex, parse_source
+from ai_updater_graph import DependencyGraph
+from ai_updater_diff import DIFF_RULES, compress_diff, exclude_pathspecs, filter_diff
+from ai_updater_proto import semantic_diff
+from ai_updater_dedupe import DEFAULT_THRESHOLD as NEAR_DUPLICATE_THRESHOLD, DuplicateCluster, collapse_near_duplicates
+from ai_updater_minify import minify
+from ai_updater_retrieval import ChunkRetriever, diff_query
+from ai_updater_memo import MIN_OBSERVATIONS, RelevanceMemo, change_signature, prompt_fingerprint
+from ai_updater_changes import ChangeModel, build_change_model
+from ai_updater_clusters import DiffCluster, cluster_diff
+from ai_updater_merge import MergeConflict, merge3
+from ai_updater_repair import normalize_path, parse_structured, repair_entries, repair_inclusion
+from ai_updater_continuation import CONTINUATION_TAIL_LINES, MAX_CONTINUATIONS, complete_lines, output_token_limit, splice
+from ai_updater_windows import WINDOWED_MIN_LINES, WindowPlan, plan_windows, stitch_windows, window_text
+from ai_updater_strategy import EDIT_TOKENS_PER_INSTRUCTION_TOKEN, EditCost, LineEdit, LineEdits, apply_line_edits, estimate_strategies, \
+    number_lines, select_strategy
 
 from prompts.getrelevantcontext_prompts import GETRELEVANTCONTEXT_P1, GETRELEVANTCONTEXT_P2, GETRELEVANTCONTEXT_S1, GETRELEVANTCONTEXT_S2
-from prompts.diffparser_prompts import DIFFPARSER_P, DIFFPARSER_S
-from prompts.applychanges_prompts import GENERATECOMPLETEFILE_P, GENERATECOMPLETEFILE_S, GENERATEPATCH_P, GENERATEPATCH_S, GENERATESUMMARY_P
+from prompts.diffparser_prompts import DIFFPARSER_P, DIFFPARSER_S, DIFFPLANNER_P, DIFFPLANNER_S, FILEINSTRUCTIONS_P, \
+    FILEINSTRUCTIONS_S, MISSINGINSTRUCTIONS_INTENT
+from prompts.applychanges_prompts import GENERATECOMPLETEFILE_P, GENERATECOMPLETEFILE_S, GENERATEPATCH_P, GENERATEPATCH_S, GENERATESUMMARY_P, FIXSYNTAX_P, \
+    GENERATELINEEDITS_P, GENERATELINEEDITS_S, GENERATEWINDOW_P, GENERATEWINDOW_S, MERGECONFLICT_P, MERGECONFLICT_S, \
+    GENERATECONTINUATION_P
+
+SUPPORTED_SDKS = ["python", "typescript", "cpp", "flutter"]
+
+# Maximum number of files the dependency graph adds to the stage 1 candidates
+MAX_GRAPH_FILES = 12
+# Maximum number of context files sent with each per-file call of the two-phase diff analysis (--analysis planned)
+MAX_FILE_CONTEXT_FILES = 4
+# Maximum number of times a generated file that fails the local syntax check is regenerated
+MAX_SYNTAX_FIX_ATTEMPTS = 2
+
+# Seed of the requests asking again for a structured output that could not be repaired locally (the first request used 42 and is cached)
+REPAIR_SEED = 43
+# Characters of the instructions of each file shown in the change plan sent to the per-file instructions requests
+MAX_PLAN_INTENT_LENGTH = 300
+# Lines of the original file shown before and after a region where concurrent edits of the file conflict
+CONFLICT_CONTEXT_LINES = 10
+# Temperature used to sample several patch candidates per request (--patch-candidates)
+PATCH_SAMPLING_TEMPERATURE = 0.7
+# Minimum predicted failure risk of a patch or line-range edit for --race to regenerate the file concurrently
+RACE_MIN_RISK = 0.2
+# Actual cost of the requests made while editing a file, set by apply_changes for each file
+EDIT_COST: contextvars.ContextVar[EditCost | None] = contextvars.ContextVar("edit_cost", default=None)
+
+# Directory name of each SDK checkout inside the parent directory used by --sdks mode
+SDK_CHECKOUT_DIRS = {
+    "python": "viam-python-sdk",
+    "typescript": "viam-typescript-sdk",
+    "cpp": "viam-cpp-sdk",
+    "flutter": "viam-flutter-sdk",
+}
 
 class ContextFiles(BaseModel):
     """Model for storing the files that should be analyzed as potential context.
@@ -41,25 +100,56 @@ class RequiredChanges(BaseModel):
     requires_creation: list[bool]
 
 
+class ChangePlan(BaseModel):
+    """Model for the planning pass of the two-phase diff analysis.
+    files_to_update: The paths to the files that need to be updated.
+    intents: A one or two sentence summary of the change to each file.
+    requires_creation: Whether each file needs to be created from scratch (True) or already exists and needs updating (False).
+    """
+    files_to_update: list[str]
+    intents: list[str]
+    requires_creation: list[bool]
+
+class FileInstructions(BaseModel):
+    """Model for the implementation instructions of a single file (second phase of the two-phase diff analysis).
+    implementation_details: The details of the changes to be made to the file.
+    """
+    implementation_details: str
+
+
 class AIUpdater:
     """Class for updating SDK code based on proto changes using AI."""
 
-    def __init__(self, args, api_key=""):
+    def __init__(self, args, api_key="", sdk: str = None, sdk_root_dir: str = None,
+                 budget: RequestBudget = None, cache: ResponseCache = None, store: ContentStore = None, memo: RelevanceMemo = None):
         """Initialize the AIUpdater.
 
         Args:
             args: Command line arguments
             api_key (str): Google API key. If None, will use GOOGLE_API_KEY env var
+            sdk (str): The SDK being updated. Defaults to args.sdk
+            sdk_root_dir (str): Root directory of the SDK checkout. Defaults to the --test/--work path
+            budget (RequestBudget): Concurrency and rate budget shared with other updaters in this process
+            cache (ResponseCache): Model response cache shared with other updaters in this process
+            store (ContentStore): File content store shared with other updaters in this process
+            memo (RelevanceMemo): Store of past relevance verdicts shared with other updaters in this process
         """
         self.args = args
+        self.sdk = sdk or args.sdk
+        self.multi_sdk = bool(args.sdks)
 
         self.current_dir = os.path.dirname(os.path.abspath(__file__))
-        if args.test:
+        if sdk_root_dir:
+            self.sdk_root_dir = sdk_root_dir
+        elif args.test:
             self.sdk_root_dir = args.test
         elif args.work:
             self.sdk_root_dir = args.work
         else:
             self.sdk_root_dir = os.path.dirname(self.current_dir)
+        self.ai_generated_dir = os.path.join(os.path.dirname(self.sdk_root_dir), "ai_generated")
+        if self.multi_sdk:
+            self.ai_generated_dir = os.path.join(self.ai_generated_dir, self.sdk)
 
         os.environ['SDK_ROOT_DIR'] = self.sdk_root_dir
         os.environ['CURRENT_DIR'] = self.current_dir
@@ -70,25 +160,168 @@ class AIUpdater:
             raise ValueError("GOOGLE_API_KEY environment variable not set and no API key provided")
         self.client = genai.Client(api_key=api_key)
         self.total_cost = 0.0
+        # Cost of the requests of the strategies that lost a --race
+        self.speculative_cost = EditCost()
+        self.budget = budget or RequestBudget(args.max_concurrency, args.rpm)
+        self.cache = cache or ResponseCache()
+        self.store = store or ContentStore()
+        self.memo = memo or open_relevance_memo(args, self.current_dir)
+        self.overlay = OverlayFS(self.store)
+        self.change_model = ChangeModel()
+        self.raw_git_diff = ""
+        self.duplicate_clusters: list[DuplicateCluster] = []
+        self.dependency_graph: DependencyGraph | None = None
+        # Files of the changed resources (relative to the SDK root), which are likely to be edited
+        self.target_files: set[str] = set()
+        # Implementation detail of every generated file, keyed by absolute path (used to regenerate files that fail validation)
+        self.implementation_details: dict[str, tuple[str, str]] = {}
+        # Number of the diff cluster whose pipeline this updater runs (see run_clusters), None for the main pipeline
+        self.cluster_number: int | None = None
 
-    async def get_relevant_context(self, git_diff_output: str, sdk_tree_output: str, tests_tree_output: str) -> list[ContextInclusion]:
-        """Two stage approach to use AI to gather the most relevant context files.
-        Stage 1: Gather all files that could be relevant to the changes.
-        Stage 2: Asynchronous AI calls are made to analyze each file to determine if it is actually relevant as context.
+    def output_path(self, filename: str) -> str:
+        """Path of a debug/summary output file. In --sdks mode the SDK name is appended so runs don't collide, and so is
+        the cluster number in the pipelines of a clustered diff.
+
+        Args:
+            filename: Base name of the output file (e.g. pr_summary.txt)
+
+        Returns:
+            str: Path of the output file inside the ai_updater directory
+        """
+        stem, ext = os.path.splitext(filename)
+        if self.multi_sdk:
+            stem = f"{stem}_{self.sdk}"
+        if self.cluster_number is not None:
+            stem = f"{stem}_cluster{self.cluster_number}"
+        return os.path.join(self.current_dir, stem + ext)
+
+    def destination_path(self, file_path: str) -> str:
+        """Path a generated SDK file is written to: a copy under ai_generated/ in test mode, the file itself in work mode.
+
+        Args:
+            file_path: Path of the file relative to the SDK root
+
+        Returns:
+            str: The destination path
+        """
+        if self.args.test:
+            return os.path.join(self.ai_generated_dir, file_path)
+        return os.path.join(self.sdk_root_dir, file_path)
+
+    def index_path(self) -> str | None:
+        """Path of the persisted SDK index of this checkout, selected by --sdk-index (None if it is disabled).
+
+        Returns:
+            str | None: The index file, named after the SDK and the checkout path so that checkouts don't evict each other
+        """
+        if self.args.sdk_index == "off":
+            return None
+        index_dir = self.args.sdk_index or os.path.join(self.current_dir, ".sdk_index")
+        checkout = hashlib.sha1(os.path.abspath(self.sdk_root_dir).encode("utf-8")).hexdigest()[:8]
+        return os.path.join(index_dir, f"{self.sdk}-{checkout}.json")
+
+    async def generate_content(self, model: str, contents, config: types.GenerateContentConfig) -> types.GenerateContentResponse:
+        """Send a request to Gemini through the shared cache and concurrency/rate budget, and track its cost.
+
+        Args:
+            model: The name of the Gemini model to use
+            contents: The prompt string or conversation history
+            config: The request configuration
+
+        Returns:
+            GenerateContentResponse: The (possibly cached) model response
+        """
+        async def request():
+            async with self.budget:
+                response = await self.client.aio.models.generate_content(model=model, contents=contents, config=config)
+            cost = calculate_cost(response.usage_metadata, response.model_version)
+            self.total_cost += cost
+            edit_cost = EDIT_COST.get()
+            if edit_cost is not None:
+                edit_cost.add(response.usage_metadata, cost)
+            return response
+
+        return await self.cache.get_or_create(ResponseCache.make_key(model, contents, config), request)
+
+    async def generate_text(self, model: str, prompt: str, config: types.GenerateContentConfig, label: str) -> str:
+        """Generate a long text output (a whole file or window), continuing it when it is cut off by the output limit.
+
+        A response that stops with finish reason MAX_TOKENS is cut back to its last complete line, and a continuation
+        request is sent with the conversation so far, asking the model to resume right after that line. The parts are
+        spliced together (see ai_updater_continuation.splice), up to MAX_CONTINUATIONS continuations. The output limit
+        itself is set by the caller from the expected size of the output (see output_token_limit).
+
+        Args:
+            model: The name of the Gemini model to use
+            prompt: The prompt of the generation
+            config: The request configuration, shared by the continuation requests
+            label: What is generated, for the log (e.g. the file path)
+
+        Returns:
+            str: The text of the response, with its continuations. It is still truncated if the last continuation was
+                cut off as well, which is logged
+        """
+        response = await self.generate_content(model=model, contents=prompt, config=config)
+        text = response.text or ""
+        contents = [types.Content(role="user", parts=[types.Part(text=prompt)])]
+        for continuation in range(1, MAX_CONTINUATIONS + 1):
+            if not response.candidates or response.candidates[0].finish_reason != types.FinishReason.MAX_TOKENS:
+                return text
+            text = complete_lines(text)
+            print(f"The output for {label} was cut off after {text.count(chr(10))} lines at {config.max_output_tokens} tokens, "
+                  f"sending continuation {continuation}/{MAX_CONTINUATIONS}")
+            continuation_prompt = GENERATECONTINUATION_P.format(last_lines="".join(text.splitlines(keepends=True)[-CONTINUATION_TAIL_LINES:]))
+            contents = contents[:1] + [types.Content(role="model", parts=[types.Part(text=text)]),
+                                       types.Content(role="user", parts=[types.Part(text=continuation_prompt)])]
+            response = await self.generate_content(model=model, contents=contents, config=config)
+            text = splice(text, response.text or "")
+        if response.candidates and response.candidates[0].finish_reason == types.FinishReason.MAX_TOKENS:
+            print(f"WARNING: The output for {label} is still cut off after {MAX_CONTINUATIONS} continuations.")
+        return text
+
+    async def get_candidate_files(self, git_diff_output: str, sdk_tree_output: str, tests_tree_output: str) -> list[str]:
+        """Stage 1 of get_relevant_context: gather all files that could be relevant to the changes.
+
+        The files of the changed proto packages are looked up in the SDK topology (see ai_updater_topology) and
+        expanded with their imports and base classes up to --graph-depth edges away (see ai_updater_graph). The files
+        of the --retrieval-k SDK chunks that best match the identifiers of the diff are added as well (see
+        ai_updater_retrieval). With --topology seed (default) these files are added to the files selected by the AI,
+        with --topology replace the AI call is skipped entirely when every changed package could be resolved.
 
         Args:
             git_diff_output (str): Git diff output containing proto/code changes
+            sdk_tree_output (str): Tree structure of the SDK
+            tests_tree_output (str): Tree structure of the tests
 
         Returns:
-            list[ContextInclusion]: List of ContextInclusion objects containing relevant files
+            list[str]: Paths of the candidate files, relative to the SDK root
         """
+        topology_files, unresolved_packages = [], []
+        if self.args.topology != "off":
+            topology_files, unresolved_packages = self.topology.resolve_packages(self.change_model.packages)
+            if self.args.debug:
+                print(f"SDK topology resolved {len(topology_files)} files (unresolved packages: {unresolved_packages})")
+        if topology_files and self.args.graph_depth > 0:
+            graph_files = DependencyGraph(self.index).expand(topology_files, self.args.graph_depth)
+            dependencies = [graph_file for graph_file in graph_files if graph_file.distance > 0][:MAX_GRAPH_FILES]
+            if self.args.debug:
+                print("Dependency graph added: " + ", ".join(f"{graph_file.path} ({graph_file.score:.2f})" for graph_file in dependencies))
+            topology_files += [graph_file.path for graph_file in dependencies]
+        if self.args.topology != "off" and self.args.retrieval_k > 0:
+            for file_path in self.retrieve_files(self.raw_git_diff):
+                if file_path not in topology_files:
+                    topology_files.append(file_path)
+        if self.args.topology == "replace" and topology_files and not unresolved_packages:
+            print(f"Finished get_relevant_context stage 1. Resolved {len(topology_files)} files locally from the SDK topology, dependency graph and retrieval.")
+            return topology_files
+
         prompt = GETRELEVANTCONTEXT_P1.format(
             sdk_tree_structure=sdk_tree_output,
             tests_tree_structure=tests_tree_output,
             git_diff_output=git_diff_output
         )
 
-        response = self.client.models.generate_content(
+        response = await self.generate_content(
             model="gemini-2.5-flash",
             contents=prompt,
             config=types.GenerateContentConfig(
@@ -101,49 +334,205 @@ class AIUpdater:
             )
         )
         print(f"Finished get_relevant_context stage 1. Gemini model used: {response.model_version}")
-        self.total_cost += calculate_cost(response.usage_metadata, response.model_version)
         if self.args.debug:
             if self.args.work:
                 print(f"get_relevant_context stage 1 response: {response.text}")
             elif self.args.test:
-                write_to_file(os.path.join(self.current_dir, "getrelevantcontext_stage1.txt"), str(response.text), quiet=True)
+                write_to_file(self.output_path("getrelevantcontext_stage1.txt"), str(response.text), quiet=True)
+
+        context_files = parse_structured(response, ContextFiles)
+        if context_files is None:
+            print("WARNING: The stage 1 response could not be parsed, only the topology and retrieval files are candidates.")
+        known_files = self.known_files()
+        candidate_files = list(dict.fromkeys(normalize_path(file_path, self.sdk_root_dir, known_files)
+                                             for file_path in (context_files or {}).get("file_paths", []) if file_path))
+        candidate_files += [file_path for file_path in topology_files if file_path not in candidate_files]
+        return candidate_files
 
-        file_analysis = []
-        for file_path in response.parsed.file_paths:
-            file_content = f"File path: {file_path}\n" + read_file_content(os.path.join(self.sdk_root_dir, file_path))
-            prompt = GETRELEVANTCONTEXT_P2.format(
+    def retrieve_files(self, git_diff_output: str) -> list[str]:
+        """Search the SDK for the chunks that best match the identifiers of the diff with BM25.
+
+        Args:
+            git_diff_output (str): Git diff output containing proto/code changes
+
+        Returns:
+            list[str]: Paths of the files of the --retrieval-k best chunks, best first
+        """
+        retriever = ChunkRetriever.from_index(self.index, lambda file_path: self.store.read_text(os.path.join(self.sdk_root_dir, file_path)))
+        chunks = retriever.search(diff_query(git_diff_output, self.change_model), self.args.retrieval_k)
+        if self.args.debug:
+            print("Retrieved chunks: " + ", ".join(f"{chunk.path}:{chunk.start_line} {chunk.name} ({chunk.score:.2f})" for chunk in chunks))
+        files = []
+        for chunk in chunks:
+            if chunk.path not in files:
+                files.append(chunk.path)
+        return files
+
+    def collapse_candidates(self, candidate_files: list[str], target_files: set[str]) -> list[str]:
+        """Drop candidate files that are near-duplicates of other candidates (MinHash similarity of at least
+        --near-duplicate-threshold), keeping a few exemplars per cluster. The dropped files are remembered in
+        self.duplicate_clusters and listed next to their exemplars in the diff analysis prompt.
+
+        Args:
+            candidate_files: Paths of the candidate files, relative to the SDK root
+            target_files: Files of the changed resources, which are never dropped
+
+        Returns:
+            list[str]: The remaining candidate files
+        """
+        self.duplicate_clusters = []
+        if self.args.near_duplicate_threshold <= 0:
+            return candidate_files
+        contents = {}
+        for file_path in candidate_files:
+            try:
+                contents[file_path] = self.store.read_text(os.path.join(self.sdk_root_dir, file_path))
+            except (OSError, UnicodeDecodeError):
+                pass
+        remaining, self.duplicate_clusters = collapse_near_duplicates(contents, target_files, self.args.near_duplicate_threshold)
+        if self.duplicate_clusters:
+            dropped = sum(len(cluster.dropped) for cluster in self.duplicate_clusters)
+            print(f"Collapsed {dropped} near-duplicate candidate files into {len(self.duplicate_clusters)} exemplar groups.")
+        return [file_path for file_path in candidate_files if file_path in remaining or file_path not in contents]
+
+    async def get_relevant_context(self, git_diff_output: str, sdk_tree_output: str, tests_tree_output: str) -> list[ContextInclusion]:
+        """Two stage approach to use AI to gather the most relevant context files.
+        Stage 1: Gather all files that could be relevant to the changes (see get_candidate_files).
+        Stage 2: Asynchronous AI calls are made to analyze each file to determine if it is actually relevant as context.
+        Near-duplicate candidates (e.g. the client.py of many sibling components) are collapsed to a few exemplars
+        before stage 2, see collapse_candidates.
+
+        Args:
+            git_diff_output (str): Git diff output containing proto/code changes
+
+        Returns:
+            list[ContextInclusion]: List of ContextInclusion objects containing relevant files
+        """
+        candidate_files = await self.get_candidate_files(git_diff_output, sdk_tree_output, tests_tree_output)
+        target_files = set(self.topology.resolve_packages(self.change_model.packages)[0])
+        self.target_files = target_files
+        candidate_files = self.collapse_candidates(candidate_files, target_files)
+
+        # Verdicts for unchanged files and the same kind of change are served from the relevance memo
+        signature = change_signature(self.change_model)
+        fingerprint = prompt_fingerprint(GETRELEVANTCONTEXT_P2, GETRELEVANTCONTEXT_S2)
+        verdicts: dict[str, ContextInclusion] = {}
+        memo_keys: dict[str, str] = {}
+        prompts: dict[str, str] = {}
+        for file_path in candidate_files:
+            abs_path = os.path.join(self.sdk_root_dir, file_path)
+            try:
+                memo_keys[file_path] = RelevanceMemo.make_key(self.store.get(abs_path).blob_sha, signature, file_path in target_files, fingerprint)
+            except (OSError, UnicodeDecodeError):
+                pass
+            else:
+                verdict = self.memo.lookup(memo_keys[file_path])
+                if verdict is not None:
+                    verdicts[file_path] = ContextInclusion(filename=file_path, inclusion=verdict.decision(self.memo.min_observations),
+                                                           reasoning=verdict.reasoning)
+                    continue
+            file_content = f"File path: {file_path}\n" + self.store.read(abs_path)
+            prompts[file_path] = GETRELEVANTCONTEXT_P2.format(
                 git_diff_output=git_diff_output,
                 file_content=file_content
             )
-            file_analysis.append(self.client.aio.models.generate_content(
+
+        def ask(file_path: str, seed: int):
+            return self.generate_content(
                 model="gemini-2.5-flash",
-                contents=prompt,
+                contents=prompts[file_path],
                 config=types.GenerateContentConfig(
                     temperature=0.1,
                     thinking_config=types.ThinkingConfig(thinking_budget=-1),
                     system_instruction=GETRELEVANTCONTEXT_S2,
                     response_schema=ContextInclusion,
                     response_mime_type="application/json",
-                    seed=42
+                    seed=seed
                 )
-            ))
-        file_analysis = await asyncio.gather(*file_analysis)
+            )
+
+        # Each observation of a memoized file is asked with its own seed, so that agreeing verdicts are not just replays
+        asked_files = list(prompts)
+        seeds = [42 + (self.memo.observations(memo_keys[file_path]) if file_path in memo_keys else 0) for file_path in asked_files]
+        file_analysis = await asyncio.gather(*[ask(file_path, seed) for file_path, seed in zip(asked_files, seeds)])
         analysis_str = ""
-        for response in file_analysis:
-            analysis_str += response.text
-            self.total_cost += calculate_cost(response.usage_metadata, response.model_version)
+        unparsed = []
+        for file_path, response in zip(asked_files, file_analysis):
+            analysis_str += response.text or ""
+            verdict = repair_inclusion(parse_structured(response, ContextInclusion), file_path)
+            if verdict is None:
+                unparsed.append(file_path)
+                continue
+            verdicts[file_path] = ContextInclusion(**verdict)
+            if file_path in memo_keys:
+                self.memo.record(memo_keys[file_path], verdicts[file_path].inclusion, verdicts[file_path].reasoning)
+        if unparsed:
+            # Only the verdicts that could not be repaired locally are asked again, a verdict still unusable includes the file
+            print(f"Asking again for {len(unparsed)} relevance verdicts that could not be parsed: {unparsed}")
+            for file_path, response in zip(unparsed, await asyncio.gather(*[ask(file_path, REPAIR_SEED) for file_path in unparsed])):
+                verdict = repair_inclusion(parse_structured(response, ContextInclusion), file_path)
+                verdicts[file_path] = ContextInclusion(**verdict) if verdict is not None else ContextInclusion(
+                    filename=file_path, inclusion=True, reasoning="The relevance verdict could not be parsed, so the file is included.")
+        self.memo.save()
         if self.args.debug:
             if self.args.work:
                 print(f"get_relevant_context stage 2 response: {analysis_str}")
             elif self.args.test:
-                write_to_file(os.path.join(self.current_dir, "getrelevantcontext_stage2.txt"), analysis_str, quiet=True)
-        print(f"Finished get_relevant_context stage 2. Gemini model used: {file_analysis[0].model_version}")
-        return [response.parsed for response in file_analysis]
+                write_to_file(self.output_path("getrelevantcontext_stage2.txt"), analysis_str, quiet=True)
+        model_used = file_analysis[0].model_version if file_analysis else "none"
+        print(f"Finished get_relevant_context stage 2. Gemini model used: {model_used} "
+              f"({len(candidate_files) - len(asked_files)} of {len(candidate_files)} verdicts served from the relevance memo)")
+        return [verdicts[file_path] for file_path in candidate_files]
 
-    def get_diff_analysis(self, git_diff_output: str, relevant_files: list[ContextInclusion]) -> types.GenerateContentResponse:
+    def format_context_files(self, relevant_files: list[ContextInclusion]) -> dict[str, str]:
+        """Format the included context files for the analysis prompts.
+
+        Context files that are only used as a reference (not part of the changed resources and not already edited) are
+        minified unless --no-minify is set, see ai_updater_minify. Files likely to be edited are sent verbatim. The files
+        dropped as near-duplicates are listed after the first kept exemplar of their cluster.
+
+        Args:
+            relevant_files: List of relevant file paths for context
+
+        Returns:
+            dict[str, str]: The prompt block of each included file, by path relative to the SDK root, in context order
+        """
+        blocks = {}
+        listed_clusters = set()
+        saved_tokens = 0
+        edited_files = self.overlay.files()
+        for file in relevant_files:
+            if file.inclusion:
+                file_path = os.path.join(self.sdk_root_dir, file.filename)
+                file_content = self.overlay.read(file_path)
+                reference_only = file.filename not in self.target_files and os.path.abspath(file_path) not in edited_files
+                if reference_only and not self.args.no_minify and not file_content.startswith("Error reading file"):
+                    minified = minify(file.filename, file_content)
+                    if minified.saved_tokens > 0:
+                        print(f"Minified context file {file.filename}: {minified.original_tokens} -> {minified.minified_tokens} tokens")
+                        saved_tokens += minified.saved_tokens
+                        file_content = minified.content
+                block = f"File: {file.filename}\nContent: \n{file_content}\n"
+                for i, cluster in enumerate(self.duplicate_clusters):
+                    if file.filename in cluster.kept and i not in listed_clusters:
+                        listed_clusters.add(i)
+                        block += f"Files following the same pattern (omitted): {', '.join(cluster.dropped)}\n"
+                blocks[file.filename] = block + "--------------------------------\n"
+
+        if saved_tokens:
+            print(f"Minifying reference-only context files saved {saved_tokens} tokens.")
+        return blocks
+
+    async def get_diff_analysis(self, git_diff_output: str, relevant_files: list[ContextInclusion]) -> types.GenerateContentResponse:
         """Analyze git diff using AI to identify required code changes. Outputs a list of files that need to be updated
         or created, and detailed instructions for the changes to be made to the files.
 
+        With --analysis planned, the analysis is split into a planning call and concurrent per-file calls, see
+        get_planned_diff_analysis.
+
+        The response is repaired locally and only the instructions that can't be repaired are asked again, see
+        repair_diff_analysis. A response that can't be parsed at all is asked again once.
+
         Args:
             git_diff_output: Git diff output as string
             relevant_files: List of relevant file paths for context
@@ -152,37 +541,225 @@ class AIUpdater:
             GenerateContentResponse: LLM response containing analysis of needed changes
         """
         # Gather relevant context files from the project and format them for the prompt
-        relevant_context = ""
-        for file in relevant_files:
-            if file.inclusion:
-                file_path = os.path.join(self.sdk_root_dir, file.filename)
-                file_content = read_file_content(file_path)
-                relevant_context += f"File: {file.filename}\nContent: \n{file_content}\n--------------------------------\n"
+        context_blocks = self.format_context_files(relevant_files)
+        if self.args.analysis == "planned":
+            response = await self.get_planned_diff_analysis(git_diff_output, context_blocks)
+        else:
+            prompt = DIFFPARSER_P.format(git_diff_output=git_diff_output, selected_context_files="".join(context_blocks.values()))
+            for seed in (42, REPAIR_SEED):
+                response = await self.generate_content(
+                    model="gemini-2.5-flash",
+                    contents=prompt,
+                    config=types.GenerateContentConfig(
+                        temperature=0.1,
+                        response_mime_type="application/json",
+                        response_schema=RequiredChanges,
+                        thinking_config=types.ThinkingConfig(thinking_budget=-1),
+                        system_instruction=DIFFPARSER_S,
+                        seed=seed
+                    )
+                )
+                if parse_structured(response, RequiredChanges) is not None:
+                    break
+                print("The diff analysis response could not be parsed.")
+        response = await self.repair_diff_analysis(response, git_diff_output, context_blocks)
 
-        prompt = DIFFPARSER_P.format(git_diff_output=git_diff_output, selected_context_files=relevant_context)
-        response =self.client.models.generate_content(
+        if self.args.debug:
+            if self.args.work:
+                print(f"get_diff_analysis response: {response.text}")
+            elif self.args.test:
+                write_to_file(self.output_path("getdiffanalysis.txt"), response.text, quiet=True)
+        print(f"Finished get_diff_analysis. Gemini model used: {response.model_version}")
+        return response
+
+    def related_context_files(self, file_path: str, context_paths: list[str]) -> list[str]:
+        """Pick the context files most relevant to a single file to update: the file itself, then files named after the
+        same resource or following the same naming pattern (e.g. arm/client.py for gripper/client.py), files importing or
+        imported by it, and files of the same directory.
+
+        Args:
+            file_path: The file to update, relative to the SDK root
+            context_paths: The paths of the included context files
+
+        Returns:
+            list[str]: Up to MAX_FILE_CONTEXT_FILES context paths, most relevant first
+        """
+        edges = self.dependency_edges()
+        stem = file_stem(file_path)
+        basename = os.path.basename(file_path)
+        directory = os.path.dirname(file_path)
+
+        def rank(path: str) -> int:
+            if path == file_path:
+                return 0
+            if file_stem(path) == stem or os.path.basename(path) == basename:
+                return 1
+            if path in edges.get(file_path, ()) or file_path in edges.get(path, ()):
+                return 2
+            if os.path.dirname(path) == directory:
+                return 3
+            return 4
+
+        ranked = sorted((path for path in context_paths if rank(path) < 4), key=rank)
+        return ranked[:MAX_FILE_CONTEXT_FILES]
+
+    def dependency_edges(self) -> dict[str, set[str]]:
+        """Import and inheritance edges between the SDK files (see ai_updater_graph), built once per run."""
+        if self.dependency_graph is None:
+            self.dependency_graph = DependencyGraph(self.index)
+        return self.dependency_graph.edges
+
+    async def get_planned_diff_analysis(self, git_diff_output: str, context_blocks: dict[str, str]) -> types.GenerateContentResponse:
+        """Two-phase diff analysis (--analysis planned).
+
+        A planning call without thinking gets the diff and only an outline (the definitions) of each context file, and
+        returns the files to change with a short intent for each. The implementation details of every planned file are
+        then written by concurrent calls, each given the diff, the whole plan and only the context files related to that
+        file (see related_context_files). Latency scales with the largest file instead of the whole change set.
+
+        Args:
+            git_diff_output: Git diff output as string
+            context_blocks: The formatted context files, as returned by format_context_files
+
+        Returns:
+            GenerateContentResponse: A response assembled from the per-file calls, with the RequiredChanges as parsed
+        """
+        outlines = ""
+        for file_path in context_blocks:
+            content = self.overlay.read(os.path.join(self.sdk_root_dir, file_path))
+            symbols, _ = parse_source(file_path, content)
+            definitions = ", ".join(f"{symbol.name} ({symbol.kind}, line {symbol.line})" for symbol in symbols) or "none found"
+            outlines += f"File: {file_path} ({content.count(chr(10)) + 1} lines)\nDefinitions: {definitions}\n"
+        plan_response = await self.generate_content(
             model="gemini-2.5-flash",
-            contents=prompt,
+            contents=DIFFPLANNER_P.format(git_diff_output=git_diff_output, context_outlines=outlines),
             config=types.GenerateContentConfig(
                 temperature=0.1,
                 response_mime_type="application/json",
-                response_schema=RequiredChanges,
-                thinking_config=types.ThinkingConfig(thinking_budget=-1),
-                system_instruction=DIFFPARSER_S,
+                response_schema=ChangePlan,
+                thinking_config=types.ThinkingConfig(thinking_budget=0),
+                system_instruction=DIFFPLANNER_S,
                 seed=42
             )
         )
+        plan = parse_structured(plan_response, ChangePlan)
+        if plan is None:
+            raise ValueError("ERROR: THE CHANGE PLAN COULD NOT BE PARSED")
+        repair = repair_entries(plan.get("files_to_update", []), plan.get("intents", []), plan.get("requires_creation", []), self.sdk_root_dir,
+                                self.known_files(), DIFF_RULES[self.sdk]["diff_dir"], self.file_exists)
+        if repair.notes:
+            print("Repaired the change plan: " + "; ".join(repair.notes))
+        plan_text = format_plan(repair.paths, repair.texts, repair.creations)
+        print(f"Planned changes to {len(repair.paths)} files:\n{plan_text}")
+
+        responses = await asyncio.gather(*[self.file_instructions(git_diff_output, plan_text, file_path, intent, creation, context_blocks)
+                                           for file_path, intent, creation in zip(repair.paths, repair.texts, repair.creations)])
+        required_changes = RequiredChanges(files_to_update=repair.paths, implementation_details=[instructions_text(response) for response in responses],
+                                           requires_creation=repair.creations)
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=required_changes.model_dump_json())]))],
+            model_version=responses[0].model_version if responses else plan_response.model_version,
+            parsed=required_changes,
+        )
+
+    def file_instructions(self, git_diff_output: str, plan_text: str, file_path: str, intent: str, creation: bool,
+                          context_blocks: dict[str, str], seed: int = 42):
+        """Request the implementation details of one file of a change plan, given only the context files related to it
+        (see related_context_files).
 
-        self.total_cost += calculate_cost(response.usage_metadata, response.model_version)
+        Args:
+            git_diff_output: Git diff output as string
+            plan_text: The change plan of every file (see format_plan)
+            file_path: The file to write the instructions for, relative to the SDK root
+            intent: The planned change to the file
+            creation: Whether the file is created from scratch
+            context_blocks: The formatted context files, as returned by format_context_files
+            seed: Seed of the request
+
+        Returns:
+            Awaitable[GenerateContentResponse]: The request, with FileInstructions as response schema
+        """
+        related = self.related_context_files(file_path, list(context_blocks))
+        selected_context = "".join(context_blocks[path] for path in related)
+        if not creation and file_path not in related:
+            content = self.overlay.read(os.path.join(self.sdk_root_dir, file_path))
+            selected_context = f"File: {file_path}\nContent: \n{content}\n--------------------------------\n" + selected_context
         if self.args.debug:
-            if self.args.work:
-                print(f"get_diff_analysis response: {response.text}")
-            elif self.args.test:
-                write_to_file(os.path.join(self.current_dir, "getdiffanalysis.txt"), response.text, quiet=True)
-        print(f"Finished get_diff_analysis. Gemini model used: {response.model_version}")
-        return response
+            print(f"Context for the instructions of {file_path}: {related}")
+        return self.generate_content(
+            model="gemini-2.5-flash",
+            contents=FILEINSTRUCTIONS_P.format(git_diff_output=git_diff_output, change_plan=plan_text, file_path=file_path,
+                                               intent=intent, file_state="a new file" if creation else "an existing file",
+                                               selected_context_files=selected_context),
+            config=types.GenerateContentConfig(
+                temperature=0.1,
+                response_mime_type="application/json",
+                response_schema=FileInstructions,
+                thinking_config=types.ThinkingConfig(thinking_budget=-1),
+                system_instruction=FILEINSTRUCTIONS_S,
+                seed=seed
+            )
+        )
+
+    def known_files(self) -> set[str]:
+        """Paths of the indexed SDK files and of the files staged in the overlay, relative to the SDK root."""
+        return set(self.index.files) | {os.path.relpath(abs_path, self.sdk_root_dir) for abs_path in self.overlay.files()}
+
+    def file_exists(self, file_path: str) -> bool:
+        """Whether a file (relative to the SDK root) exists, on disk or in the overlay."""
+        return self.overlay.exists(os.path.join(self.sdk_root_dir, file_path))
+
+    async def repair_diff_analysis(self, response: types.GenerateContentResponse, git_diff_output: str,
+                                   context_blocks: dict[str, str]) -> types.GenerateContentResponse:
+        """Repair the shape of a diff analysis locally (see ai_updater_repair.repair_entries): align the lists, normalize
+        and deduplicate the paths, drop generated files and infer requires_creation from whether each file exists.
+        Only the files left without instructions are asked again, each in a per-file instructions request (see
+        file_instructions). Files still without instructions after that are skipped.
+
+        Args:
+            response: The diff analysis response
+            git_diff_output: Git diff output as string
+            context_blocks: The formatted context files, as returned by format_context_files
+
+        Returns:
+            GenerateContentResponse: The response itself if it needed no repair, or a response with the repaired
+                RequiredChanges as parsed
+
+        Raises:
+            ValueError: If the response can't be parsed at all
+        """
+        data = parse_structured(response, RequiredChanges)
+        if data is None:
+            raise ValueError("ERROR: THE DIFF ANALYSIS COULD NOT BE PARSED")
+        repair = repair_entries(data.get("files_to_update", []), data.get("implementation_details", []), data.get("requires_creation", []),
+                                self.sdk_root_dir, self.known_files(), DIFF_RULES[self.sdk]["diff_dir"], self.file_exists)
+        if repair.notes:
+            print("Repaired the diff analysis: " + "; ".join(repair.notes))
+        elif isinstance(response.parsed, RequiredChanges) and not repair.missing:
+            return response
+        missing = repair.missing
+        if missing:
+            print(f"Asking again for the instructions of {[repair.paths[index] for index in missing]}")
+            plan_text = format_plan(repair.paths, repair.texts, repair.creations)
+            responses = await asyncio.gather(*[self.file_instructions(git_diff_output, plan_text, repair.paths[index], MISSINGINSTRUCTIONS_INTENT,
+                                                                      repair.creations[index], context_blocks, seed=REPAIR_SEED)
+                                               for index in missing])
+            for index, instructions_response in zip(missing, responses):
+                repair.texts[index] = instructions_text(instructions_response)
+        kept = [index for index, text in enumerate(repair.texts) if text]
+        for index in range(len(repair.paths)):
+            if index not in kept:
+                print(f"WARNING: No instructions could be obtained for {repair.paths[index]}, it is skipped.")
+        required_changes = RequiredChanges(files_to_update=[repair.paths[index] for index in kept],
+                                           implementation_details=[repair.texts[index] for index in kept],
+                                           requires_creation=[repair.creations[index] for index in kept])
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=required_changes.model_dump_json())]))],
+            model_version=response.model_version,
+            parsed=required_changes,
+        )
 
-    def generate_pr_summary(self, git_diff_output: str, diff_analysis: types.GenerateContentResponse):
+    async def generate_pr_summary(self, git_diff_output: str, diff_analysis: types.GenerateContentResponse):
         """Generate a human-readable summary of the AI's updates to include in the PR.
 
         Args:
@@ -190,7 +767,7 @@ class AIUpdater:
             diff_analysis (types.GenerateContentResponse): The AI's analysis of required changes.
         """
         prompt = GENERATESUMMARY_P.format(git_diff_output=git_diff_output, diff_analysis_text=diff_analysis.text)
-        response = self.client.models.generate_content(
+        response = await self.generate_content(
             model="gemini-2.5-flash-lite",
             contents=prompt,
             config=types.GenerateContentConfig(
@@ -199,20 +776,36 @@ class AIUpdater:
                 seed=42
             )
         )
-        self.total_cost += calculate_cost(response.usage_metadata, response.model_version)
-        write_to_file(os.path.join(self.current_dir, "pr_summary.txt"), response.text, quiet=True)
+        write_to_file(self.output_path("pr_summary.txt"), response.text, quiet=True)
         print(f"Finished generating PR summary. Gemini model used: {response.model_version}")
 
-    def generate_patch(self, file_path: str, implementation_detail: str, ai_file_path: str):
+    async def generate_patch(self, file_path: str, implementation_detail: str, ai_file_path: str):
         """Attemps to apply the AI suggested changes to a single file. If the patch generation fails,
         the file will be completely regenerated as a fallback (via generate_file).
 
         Args:
             file_path: The path to the file that needs to be updated.
             implementation_detail: The details of the changes to be made to the file.
-            ai_file_path: The path where the AI-generated file content will be saved.
+            ai_file_path: The path the AI-generated file content will be flushed to (see OverlayFS).
+        """
+        patched_content = await self.patch_content(file_path=file_path, implementation_detail=implementation_detail)
+        if patched_content is not None:
+            self.overlay.write(os.path.join(self.sdk_root_dir, file_path), patched_content, ai_file_path)
+        else:
+            print(f"Failed to patch {file_path}. Falling back to complete file generation.\n")
+            await self.generate_file(file_path=file_path, implementation_detail=implementation_detail, ai_file_path=ai_file_path, fallback=True)
+
+    async def patch_content(self, file_path: str, implementation_detail: str) -> str | None:
+        """Runs the apply_patch tool-calling loop for a single file and returns the patched content, without writing it.
+
+        Args:
+            file_path: The path to the file that needs to be updated.
+            implementation_detail: The details of the changes to be made to the file.
+
+        Returns:
+            str | None: The patched file content, or None if no valid patch was generated
         """
-        existing_file_content = read_file_content(os.path.join(self.sdk_root_dir, file_path))
+        existing_file_content = self.overlay.read(os.path.join(self.sdk_root_dir, file_path))
         initial_prompt_text = GENERATEPATCH_P.format(implementation_detail=implementation_detail, existing_file_content=f"=== {file_path} ===\n{existing_file_content}")
         system_prompt = GENERATEPATCH_S
 
@@ -221,18 +814,21 @@ class AIUpdater:
         patch_success = False
         stop_trying = False
         attempt_count = 0
-        # Variables to store search/replacement texts for final application
-        final_search_text = []
-        final_replacement_text = []
+        # Working copy with the blocks accepted so far applied (None until a block was accepted)
+        working_content = None
 
-        # Tool-calling feedback loop for applying patches
+        # Tool-calling feedback loop for applying patches. With --patch-candidates, several candidates are sampled per
+        # request and validated locally, and the best one (the first that applies, or else the one with the most
+        # accepted blocks) continues the conversation.
+        candidate_count = self.args.patch_candidates
         while not patch_success and not stop_trying:
             attempt_count += 1
-            response = self.client.models.generate_content(
+            response = await self.generate_content(
                 model="gemini-2.5-flash",
-                contents=contents,
+                contents=list(contents),
                 config=types.GenerateContentConfig(
-                    temperature=0.0,
+                    temperature=0.0 if candidate_count == 1 else PATCH_SAMPLING_TEMPERATURE,
+                    candidate_count=candidate_count if candidate_count > 1 else None,
                     thinking_config=types.ThinkingConfig(thinking_budget=-1),
                     system_instruction=system_prompt,
                     tools=[types.Tool(function_declarations=[apply_patch_declaration])],
@@ -244,90 +840,308 @@ class AIUpdater:
                     seed=42
                 )
             )
-            self.total_cost += calculate_cost(response.usage_metadata, response.model_version)
-
-            # Append model's response to history
-            if response.candidates and response.candidates[0].content:
-                contents.append(response.candidates[0].content)
-
-                if response.candidates[0].content.parts and response.candidates[0].content.parts[0].function_call:
-                    function_call = response.candidates[0].content.parts[0].function_call
-                    if function_call.name == "apply_patch":
-                        tool_result = apply_patch(file_path=file_path,
-                                                    search_text=function_call.args['search_text'],
-                                                    replacement_text=function_call.args['replacement_text'],
-                                                    attempt_number=attempt_count, quiet=not self.args.debug)
-                        patch_success = tool_result['success']
-                        stop_trying = tool_result.get('stop_trying', False)
-
-                        if patch_success:
-                            final_search_text = function_call.args['search_text']
-                            final_replacement_text = function_call.args['replacement_text']
-
-                        # Append function response to history
-                        function_response_part = types.Part.from_function_response(
-                            name=function_call.name,
-                            response={"result": tool_result},
-                        )
-                        contents.append(types.Content(role="user", parts=[function_response_part]))
-                    else:
-                        print(f"Unexpected function call: {function_call.name}. Aborting patch attempts.")
-                        patch_success = False
-                        stop_trying = True
-                else:
-                    print("No function call was made by the AI. Aborting patch attempts.")
-                    patch_success = False
-                    stop_trying = True
-            else:
+
+            candidates = [candidate for candidate in response.candidates or [] if candidate.content]
+            function_calls = [(candidate, candidate.content.parts[0].function_call) for candidate in candidates
+                              if candidate.content.parts and candidate.content.parts[0].function_call]
+            best = None
+            for candidate, function_call in function_calls:
+                if function_call.name != "apply_patch":
+                    continue
+                tool_result = apply_patch(file_path=file_path,
+                                            search_text=function_call.args['search_text'],
+                                            replacement_text=function_call.args['replacement_text'],
+                                            attempt_number=attempt_count, quiet=not self.args.debug,
+                                            sdk_root_dir=self.sdk_root_dir, store=self.overlay, content=working_content)
+                rank = (tool_result['success'], len(tool_result.get('accepted_blocks', [])))
+                if best is None or rank > best[0]:
+                    best = (rank, candidate, function_call, tool_result)
+                if tool_result['success']:
+                    break
+
+            if not candidates:
                 print("No response candidates or content found from AI. Aborting patch attempts.")
-                patch_success = False
                 stop_trying = True
+            elif not function_calls:
+                print("No function call was made by the AI. Aborting patch attempts.")
+                stop_trying = True
+            elif best is None:
+                print(f"Unexpected function call: {function_calls[0][1].name}. Aborting patch attempts.")
+                stop_trying = True
+            else:
+                _, candidate, function_call, tool_result = best
+                if len(function_calls) > 1 and self.args.debug:
+                    print(f"Picked a patch candidate out of {len(function_calls)} for {file_path} (success: {tool_result['success']}, "
+                          f"accepted blocks: {tool_result.get('accepted_blocks', [])})")
+                # Append model's response to history
+                contents.append(candidate.content)
+                patch_success = tool_result['success']
+                stop_trying = tool_result.get('stop_trying', False)
+                # Accepted blocks are locked in, the next attempt only resends the failed ones
+                if 'patched_content' in tool_result:
+                    working_content = tool_result.pop('patched_content')
+
+                # Append function response to history
+                function_response_part = types.Part.from_function_response(
+                    name=function_call.name,
+                    response={"result": tool_result},
+                )
+                contents.append(types.Content(role="user", parts=[function_response_part]))
+
+        if not patch_success:
+            return None
+        print(f"Successfully patched {file_path} in {attempt_count} attempts.\n")
+        return working_content
 
-        if patch_success:
-            patched_content = existing_file_content
-            for search, replace in zip(final_search_text, final_replacement_text):
-                patched_content = patched_content.replace(search, replace)
-            write_to_file(ai_file_path, patched_content, quiet=True)
-            print(f"Successfully patched {file_path} in {attempt_count} attempts.\n")
+    async def generate_line_edits(self, file_path: str, implementation_detail: str, ai_file_path: str):
+        """Asks the AI for the changes to a single file as replacements of line ranges of the original file, and applies
+        them locally. If the edits are invalid (out of range or overlapping), the file will be completely regenerated as
+        a fallback (via generate_file).
+
+        Args:
+            file_path: The path to the file that needs to be updated.
+            implementation_detail: The details of the changes to be made to the file.
+            ai_file_path: The path the AI-generated file content will be flushed to (see OverlayFS).
+        """
+        edited_content = await self.line_edit_content(file_path=file_path, implementation_detail=implementation_detail)
+        if edited_content is not None:
+            self.overlay.write(os.path.join(self.sdk_root_dir, file_path), edited_content, ai_file_path)
         else:
-            print(f"Failed to patch {file_path}. Falling back to complete file generation.\n")
-            self.generate_file(file_path=file_path, implementation_detail=implementation_detail, ai_file_path=ai_file_path, fallback=True)
+            print(f"Falling back to complete file generation for {file_path}.\n")
+            await self.generate_file(file_path=file_path, implementation_detail=implementation_detail, ai_file_path=ai_file_path, fallback=True)
+
+    async def line_edit_content(self, file_path: str, implementation_detail: str) -> str | None:
+        """Asks the AI for line-range edits of a single file and returns the edited content, without writing it.
+
+        Args:
+            file_path: The path to the file that needs to be updated.
+            implementation_detail: The details of the changes to be made to the file.
+
+        Returns:
+            str | None: The edited file content, or None if the edits were invalid
+        """
+        existing_file_content = self.overlay.read(os.path.join(self.sdk_root_dir, file_path))
+        prompt = GENERATELINEEDITS_P.format(implementation_detail=implementation_detail,
+                                            existing_file_content=f"=== {file_path} ===\n{number_lines(existing_file_content)}")
+        response = await self.generate_content(
+            model="gemini-2.5-flash",
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                temperature=0.0,
+                thinking_config=types.ThinkingConfig(thinking_budget=-1),
+                system_instruction=GENERATELINEEDITS_S,
+                response_mime_type="application/json",
+                response_schema=LineEdits,
+                seed=42
+            )
+        )
+        try:
+            if response.parsed is None:
+                raise ValueError("the response could not be parsed")
+            edited_content = apply_line_edits(existing_file_content, response.parsed.edits)
+        except ValueError as e:
+            print(f"Failed to apply line edits to {file_path}: {e}.")
+            return None
+        print(f"Successfully applied {len(response.parsed.edits)} line edits to {file_path}.\n")
+        return edited_content
 
-    def generate_file(self, file_path: str, implementation_detail: str, ai_file_path: str, fallback: bool = False):
+    async def generate_windowed(self, file_path: str, implementation_detail: str, ai_file_path: str, window_plan: WindowPlan):
+        """Edits the windows of a large file concurrently and stitches them back into the file (see windowed_content). If
+        the windows can't be edited, the file will be completely regenerated as a fallback (via generate_file).
+
+        Args:
+            file_path: The path to the file that needs to be updated.
+            implementation_detail: The details of the changes to be made to the file.
+            ai_file_path: The path the AI-generated file content will be flushed to (see OverlayFS).
+            window_plan: The windows of the file, as returned by plan_windows.
+        """
+        edited_content = await self.windowed_content(file_path=file_path, implementation_detail=implementation_detail, window_plan=window_plan)
+        if edited_content is not None:
+            self.overlay.write(os.path.join(self.sdk_root_dir, file_path), edited_content, ai_file_path)
+        else:
+            print(f"Falling back to complete file generation for {file_path}.\n")
+            await self.generate_file(file_path=file_path, implementation_detail=implementation_detail, ai_file_path=ai_file_path, fallback=True)
+
+    async def windowed_content(self, file_path: str, implementation_detail: str, window_plan: WindowPlan) -> str | None:
+        """Sends each window of a large file, with the skeleton of the file, in its own request and stitches the edited
+        windows back into the file, without writing it. Hunks outside of the requested change are reverted like for a
+        full regeneration.
+
+        Args:
+            file_path: The path to the file that needs to be updated.
+            implementation_detail: The details of the changes to be made to the file.
+            window_plan: The windows of the file, as returned by plan_windows.
+
+        Returns:
+            str | None: The edited file content, or None if there are no windows to edit
+        """
+        if window_plan is None or not window_plan.windows:
+            return None
+        existing_file_content = self.overlay.read(os.path.join(self.sdk_root_dir, file_path))
+        requests = []
+        edit_tokens = int(estimate_tokens(implementation_detail) * EDIT_TOKENS_PER_INSTRUCTION_TOKEN)
+        for number, window in enumerate(window_plan.windows, start=1):
+            prompt = GENERATEWINDOW_P.format(implementation_detail=implementation_detail, skeleton=window_plan.skeleton,
+                                             window_number=number, window_count=len(window_plan.windows), file_path=file_path,
+                                             start_line=window.start_line, end_line=window.end_line,
+                                             window_content=window_text(existing_file_content, window))
+            requests.append(self.generate_text(
+                model="gemini-2.5-flash-lite",
+                prompt=prompt,
+                config=types.GenerateContentConfig(
+                    temperature=0.0,
+                    thinking_config=types.ThinkingConfig(thinking_budget=0),
+                    system_instruction=GENERATEWINDOW_S,
+                    max_output_tokens=output_token_limit(estimate_tokens(window_text(existing_file_content, window)) + edit_tokens),
+                    seed=42
+                ),
+                label=f"window {number} of {file_path}"
+            ))
+        texts = await asyncio.gather(*requests)
+        edited_windows = []
+        for text in texts:
+            cleaned_response = text.strip("\n")
+            if cleaned_response.startswith("```") and cleaned_response.endswith("```"): #remove markdown code block formatting if present
+                cleaned_response = "\n".join(cleaned_response.splitlines()[1:-1])
+            edited_windows.append(cleaned_response + "\n")
+        edited_content = stitch_windows(existing_file_content, window_plan.windows, edited_windows)
+        edited_content, reverted_hunks = revert_spurious_hunks(file_path, existing_file_content, edited_content,
+                                                               implementation_detail, self.change_model)
+        if reverted_hunks:
+            print(f"Reverted {len(reverted_hunks)} unintended hunks in {file_path}")
+        print(f"Successfully edited {len(window_plan.windows)} windows ({window_plan.windowed_lines} of {window_plan.line_count} lines) "
+              f"of {file_path}.\n")
+        return edited_content
+
+    async def race_edit(self, file_path: str, implementation_detail: str, ai_file_path: str, strategy: str, window_plan: WindowPlan = None):
+        """Latency mode (--race): runs a targeted edit (patch, line-range or windowed) and a full regeneration of a single file
+        concurrently instead of one after the other. The first result that passes the local syntax check is written and
+        the other strategy is cancelled. If neither result passes, the regenerated content is written and left to
+        validate_changes. The cost of the cancelled strategy is reported (requests it already sent still complete and
+        are billed, and are added to self.speculative_cost as they do).
+
+        Args:
+            file_path: The path to the file that needs to be updated.
+            implementation_detail: The details of the changes to be made to the file.
+            ai_file_path: The path the AI-generated file content will be flushed to (see OverlayFS).
+            strategy: The targeted strategy to race against full regeneration ("patch", "line-range" or "windowed").
+            window_plan: The windows of the file, for the windowed strategy.
+        """
+        abs_path = os.path.join(self.sdk_root_dir, file_path)
+        original_issue = check_syntax(abs_path, self.overlay.read(abs_path))
+        targeted_content = {
+            "patch": self.patch_content,
+            "line-range": self.line_edit_content,
+            "windowed": functools.partial(self.windowed_content, window_plan=window_plan),
+        }[strategy]
+        costs = {strategy: EditCost(), "full": EditCost()}
+
+        async def contender(name: str, produce):
+            # Runs in its own task, so this only affects the requests of this contender
+            EDIT_COST.set(costs[name])
+            return await produce(file_path=file_path, implementation_detail=implementation_detail)
+
+        tasks = {
+            asyncio.create_task(contender(strategy, targeted_content)): strategy,
+            asyncio.create_task(contender("full", functools.partial(self.regenerated_content, fallback=True))): "full",
+        }
+        start = time.monotonic()
+        pending = set(tasks)
+        winner, content, regenerated = None, None, None
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    print(f"Race for {file_path}: {tasks[task]} failed with {task.exception()!r}")
+                    continue
+                result = task.result()
+                if tasks[task] == "full":
+                    regenerated = result
+                if result is not None and (original_issue is not None or check_syntax(abs_path, result) is None):
+                    winner, content = tasks[task], result
+                    break
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        elapsed = time.monotonic() - start
+
+        if winner is None:
+            if regenerated is None:
+                raise RuntimeError(f"Both {strategy} and full regeneration failed for {file_path}")
+            winner, content = "full", regenerated
+            print(f"Race for {file_path}: no result passed the syntax check, keeping the full regeneration.")
+        self.overlay.write(abs_path, content, ai_file_path)
+        loser = "full" if winner == strategy else strategy
+        self.speculative_cost.merge(costs[loser])
+        edit_cost = EDIT_COST.get()
+        if edit_cost is not None:
+            edit_cost.merge(costs[winner])
+            edit_cost.merge(costs[loser])
+        print(f"Race for {file_path}: {winner} won after {elapsed:.1f}s. The losing {loser} attempt cost ${costs[loser].cost:.4f} and "
+              f"{costs[loser].output_tokens} output tokens in {costs[loser].requests} completed requests.\n")
+
+    async def generate_file(self, file_path: str, implementation_detail: str, ai_file_path: str, fallback: bool = False):
+        content = await self.regenerated_content(file_path=file_path, implementation_detail=implementation_detail, fallback=fallback)
+        self.overlay.write(os.path.join(self.sdk_root_dir, file_path), content, ai_file_path)
+        print(f"Successfully generated {file_path}\n")
+
+    async def regenerated_content(self, file_path: str, implementation_detail: str, fallback: bool = False) -> str:
+        """Generates the complete content of a single file, without writing it.
+
+        Args:
+            file_path: The path to the file that needs to be generated.
+            implementation_detail: The details of the changes to be made to the file.
+            fallback: Whether the file already exists and is regenerated (True) or created from scratch (False).
+
+        Returns:
+            str: The generated file content
+        """
         if fallback:
-            existing_file_content = read_file_content(os.path.join(self.sdk_root_dir, file_path))
+            existing_file_content = self.overlay.read(os.path.join(self.sdk_root_dir, file_path))
             prompt = GENERATECOMPLETEFILE_P.format(implementation_detail=implementation_detail, existing_file_content=f"==={file_path}===\n{existing_file_content}")
         else:
             message = f"=== {file_path} ===\nThis file does not exist. Please generate the entire file content from scratch."
             prompt = GENERATECOMPLETEFILE_P.format(implementation_detail=implementation_detail, existing_file_content=message)
-        response = self.client.models.generate_content(
+        # The regenerated file repeats the existing content and adds the change
+        expected_tokens = int(estimate_tokens(implementation_detail) * EDIT_TOKENS_PER_INSTRUCTION_TOKEN)
+        if fallback:
+            expected_tokens += estimate_tokens(existing_file_content)
+        text = await self.generate_text(
             model="gemini-2.5-flash-lite",
-            contents=prompt,
+            prompt=prompt,
             config=types.GenerateContentConfig(
                 temperature=0.0,
                 thinking_config=types.ThinkingConfig(thinking_budget=0),
                 system_instruction=GENERATECOMPLETEFILE_S,
+                max_output_tokens=output_token_limit(expected_tokens),
                 seed=42
-            )
+            ),
+            label=file_path
         )
 
-        self.total_cost += calculate_cost(response.usage_metadata, response.model_version)
-        cleaned_response = response.text.strip()
+        cleaned_response = text.strip()
         if cleaned_response.startswith("```") and cleaned_response.endswith("```"): #remove markdown code block formatting if present
             cleaned_response = "\n".join(cleaned_response.splitlines()[1:-1]) + "\n"
-        write_to_file(ai_file_path, cleaned_response, quiet=True)
-        print(f"Successfully generated {file_path}\n")
+        if fallback:
+            # Full regeneration tends to drift from the original far away from the requested change, so revert those hunks
+            cleaned_response, reverted_hunks = revert_spurious_hunks(file_path, existing_file_content, cleaned_response,
+                                                                     implementation_detail, self.change_model)
+            if reverted_hunks:
+                print(f"Reverted {len(reverted_hunks)} unintended hunks in {file_path}")
+        return cleaned_response
 
-    def apply_changes(self, diff_analysis: types.GenerateContentResponse):
+    async def apply_changes(self, diff_analysis: types.GenerateContentResponse):
         """Apply all code changes suggested by the AI by choosing the appropriate update strategy for each file.
 
         This is the main orchestrator method that determines the best approach for each file:
-        - For new files: uses create_complete_files()
-        - For existing files needing targeted updates: uses create_patches() first
-        - Falls back to create_complete_files() if patching fails
+        - For new files: uses generate_file()
+        - For existing files: picks full regeneration (generate_file), a search/replace patch (generate_patch) or a
+          line-range edit (generate_line_edits) per file, whichever has the lowest expected cost according to the cost
+          model in ai_updater_strategy (or the strategy forced with --edit-strategy), see edit_file
+        - Patches and line-range edits fall back to generate_file() if they fail
+        - An existing file listed several times (once per independent change) is edited by concurrent jobs, see edit_file_jobs
 
-        The method analyzes the diff_analysis response to determine which files need updates
-        and selects the most appropriate generation strategy for each file.
+        The predicted cost of the selected strategy is printed next to the actual cost of the requests made for the file.
 
         Args:
             diff_analysis: LLM response from diff analysis containing file update requirements
@@ -335,89 +1149,414 @@ class AIUpdater:
         # Parse the response from diff analysis (according to defined Pydantic model)
         parsed_response: RequiredChanges = diff_analysis.parsed
 
-        if(len(parsed_response.files_to_update) != len(parsed_response.implementation_details)):
+        if len({len(parsed_response.files_to_update), len(parsed_response.implementation_details), len(parsed_response.requires_creation)}) != 1:
             raise ValueError("ERROR: AI OUTPUT A DIFFERENT NUMBER OF FILENAMES THAN IMPLEMENTATION DETAILS")
         if(len(parsed_response.files_to_update) == 0):
             print("THE AI WORKFLOW DID NOT DETERMINE THAT ANY FILES NEED TO BE UPDATED BASED ON THE GIVEN PROTO UPDATE DIFF")
             return
 
-        for i in range(len(parsed_response.files_to_update)):
-            file_path = parsed_response.files_to_update[i]
-            implementation_detail = parsed_response.implementation_details[i]
-            requires_creation = parsed_response.requires_creation[i]
-
-            original_file_dir = os.path.dirname(os.path.join(self.sdk_root_dir, file_path))
-            original_filename = os.path.basename(file_path)
-            if self.args.test:
-                dir_structure = os.path.relpath(original_file_dir, self.sdk_root_dir)
-                ai_generated_dir = os.path.join(os.path.dirname(self.sdk_root_dir), "ai_generated", dir_structure)
-                os.makedirs(ai_generated_dir, exist_ok=True)
-                ai_file_path = os.path.join(ai_generated_dir, original_filename)
-            elif self.args.work:
-                ai_file_path = os.path.join(original_file_dir, original_filename)
-            if requires_creation:
-                self.generate_file(file_path=file_path, implementation_detail=implementation_detail, ai_file_path=ai_file_path)
-            elif not self.args.patch:
-                self.generate_file(file_path=file_path, implementation_detail=implementation_detail, ai_file_path=ai_file_path, fallback=True)
-            else:
-                self.generate_patch(file_path=file_path, implementation_detail=implementation_detail, ai_file_path=ai_file_path)
+        jobs: dict[str, list[tuple[str, bool]]] = {}
+        for file_path, implementation_detail, requires_creation in zip(parsed_response.files_to_update, parsed_response.implementation_details,
+                                                                       parsed_response.requires_creation):
+            jobs.setdefault(file_path, []).append((implementation_detail, requires_creation))
+
+        for file_path, file_jobs in jobs.items():
+            requires_creation = any(creation for _, creation in file_jobs)
+            if len(file_jobs) > 1 and not requires_creation:
+                await self.edit_file_jobs(file_path=file_path, implementation_details=[detail for detail, _ in file_jobs])
+                continue
+            # A new file is always generated in one go, from the instructions of every change
+            implementation_detail = "\n\n".join(detail for detail, _ in file_jobs)
+            self.implementation_details[os.path.abspath(os.path.join(self.sdk_root_dir, file_path))] = (file_path, implementation_detail)
+            await self.edit_file(file_path=file_path, implementation_detail=implementation_detail, requires_creation=requires_creation)
         print(f"Finished applying changes. Gemini model used: gemini-2.5-flash")
 
+    async def edit_file(self, file_path: str, implementation_detail: str, requires_creation: bool):
+        """Generate a new file, or edit an existing one with the strategy with the lowest expected cost.
+
+        Args:
+            file_path: The path to the file, relative to the SDK root
+            implementation_detail: The details of the changes to be made to the file
+            requires_creation: Whether the file is created from scratch
+        """
+        ai_file_path = self.destination_path(file_path)
+        if requires_creation:
+            await self.generate_file(file_path=file_path, implementation_detail=implementation_detail, ai_file_path=ai_file_path)
+            return
+        existing_file_content = self.overlay.read(os.path.join(self.sdk_root_dir, file_path))
+        window_plan = None
+        if existing_file_content.count("\n") >= WINDOWED_MIN_LINES or self.args.edit_strategy == "windowed":
+            window_plan = plan_windows(file_path, existing_file_content, implementation_detail, self.change_model)
+            if window_plan is None and self.args.edit_strategy == "windowed":
+                print(f"No windows could be located in {file_path}, regenerating it in full.")
+        estimates = estimate_strategies(existing_file_content, implementation_detail, self.change_model,
+                                        patch_candidates=self.args.patch_candidates, window_plan=window_plan)
+        selected = select_strategy(estimates, self.args.edit_strategy)
+        if self.args.debug:
+            print(f"Edit strategy estimates for {file_path}: " + ", ".join(
+                f"{estimate.strategy} ${estimate.expected_cost:.4f} (risk {estimate.failure_risk:.2f})" for estimate in estimates))
+        edit_cost = EditCost()
+        token = EDIT_COST.set(edit_cost)
+        try:
+            if self.args.race and selected.strategy != "full" and selected.failure_risk >= RACE_MIN_RISK:
+                await self.race_edit(file_path=file_path, implementation_detail=implementation_detail, ai_file_path=ai_file_path,
+                                     strategy=selected.strategy, window_plan=window_plan)
+            elif selected.strategy == "patch":
+                await self.generate_patch(file_path=file_path, implementation_detail=implementation_detail, ai_file_path=ai_file_path)
+            elif selected.strategy == "windowed":
+                await self.generate_windowed(file_path=file_path, implementation_detail=implementation_detail, ai_file_path=ai_file_path,
+                                             window_plan=window_plan)
+            elif selected.strategy == "line-range":
+                await self.generate_line_edits(file_path=file_path, implementation_detail=implementation_detail, ai_file_path=ai_file_path)
+            else:
+                await self.generate_file(file_path=file_path, implementation_detail=implementation_detail, ai_file_path=ai_file_path, fallback=True)
+        finally:
+            EDIT_COST.reset(token)
+        print(f"Edit strategy for {file_path}: {selected.strategy} (predicted ${selected.cost:.4f} and {selected.output_tokens} "
+              f"output tokens, actual ${edit_cost.cost:.4f} and {edit_cost.output_tokens} output tokens in {edit_cost.requests} requests)")
+
+    async def edit_file_jobs(self, file_path: str, implementation_details: list[str]):
+        """Edit an existing file with several independent changes concurrently, each in a fork of this updater starting
+        from the same content, and three-way merge the results (see merge_versions).
+
+        Args:
+            file_path: The path to the file, relative to the SDK root
+            implementation_details: The details of each change
+        """
+        print(f"Editing {file_path} with {len(implementation_details)} concurrent jobs.")
+        forks = [self.fork() for _ in implementation_details]
+        try:
+            await asyncio.gather(*[fork.edit_file(file_path=file_path, implementation_detail=implementation_detail, requires_creation=False)
+                                   for fork, implementation_detail in zip(forks, implementation_details)])
+        finally:
+            for fork in forks:
+                self.total_cost += fork.total_cost
+                self.speculative_cost.merge(fork.speculative_cost)
+        abs_path = os.path.abspath(os.path.join(self.sdk_root_dir, file_path))
+        await self.merge_versions(abs_path, [(fork.overlay.read(abs_path), implementation_detail)
+                                             for fork, implementation_detail in zip(forks, implementation_details)],
+                                  destination=self.destination_path(file_path), source="jobs")
+
+    async def merge_versions(self, abs_path: str, versions: list[tuple[str, str]], destination: str, source: str):
+        """Merge several versions of a file edited concurrently from its current overlay content, and stage the result.
+
+        The versions are three-way merged (see ai_updater_merge.merge3). Only the regions they change in incompatible
+        ways are regenerated, each in a focused request given the instructions of every version (see resolve_conflict).
+        A file that didn't exist before is regenerated in full from the instructions of every version instead.
+
+        Args:
+            abs_path: Absolute path of the file in the SDK
+            versions: The content of each version with the implementation details it was generated from
+            destination: The path the merged file will be flushed to (see OverlayFS)
+            source: What produced the versions, for the log (e.g. clusters or jobs)
+        """
+        file_path = os.path.relpath(abs_path, self.sdk_root_dir)
+        implementation_details = list(dict.fromkeys(detail for _, detail in versions if detail))
+        self.implementation_details[abs_path] = (file_path, "\n\n".join(implementation_details))
+        if len(versions) == 1:
+            self.overlay.write(abs_path, versions[0][0], destination)
+            return
+        if not self.overlay.exists(abs_path):
+            print(f"{len(versions)} {source} created {file_path}. Regenerating it with the instructions of every one of them.")
+            await self.generate_file(file_path=file_path, implementation_detail="\n\n".join(implementation_details), ai_file_path=destination)
+            return
+        merge_result = merge3(self.overlay.read(abs_path), [content for content, _ in versions])
+        resolutions = None
+        if merge_result.conflicts:
+            print(f"The edits of {len(versions)} {source} to {file_path} conflict in {len(merge_result.conflicts)} regions. Regenerating them.")
+            resolutions = await asyncio.gather(*[self.resolve_conflict(file_path, merge_result.base, conflict, implementation_details)
+                                                 for conflict in merge_result.conflicts])
+        else:
+            print(f"Merged the edits of {len(versions)} {source} to {file_path} without conflicts.")
+        self.overlay.write(abs_path, merge_result.content(resolutions), destination)
+
+    async def resolve_conflict(self, file_path: str, base: str, conflict: MergeConflict, implementation_details: list[str]) -> str:
+        """Regenerate a region of a file that concurrent edits changed in incompatible ways.
+
+        Args:
+            file_path: The path to the file, relative to the SDK root
+            base: The content the edits started from
+            conflict: The conflicting region
+            implementation_details: The details of every edit of the file
+
+        Returns:
+            str: The content replacing the region
+        """
+        base_lines = base.splitlines(keepends=True)
+        before = base_lines[max(0, conflict.base_start - CONFLICT_CONTEXT_LINES):conflict.base_start]
+        after = base_lines[conflict.base_end:conflict.base_end + CONFLICT_CONTEXT_LINES]
+        prompt = MERGECONFLICT_P.format(
+            file_path=file_path, start_line=conflict.base_start + 1, end_line=conflict.base_end,
+            implementation_details="\n".join(f"Change {number}: {detail}" for number, detail in enumerate(implementation_details, start=1)),
+            context_before="".join(before) or "(start of file)", base_region="".join(conflict.base_lines) or "(empty: the changes insert here)",
+            context_after="".join(after) or "(end of file)",
+            versions="\n".join(f"Version {number}:\n{''.join(lines) or '(removed)'}" for number, lines in enumerate(conflict.versions, start=1)))
+        response = await self.generate_content(
+            model="gemini-2.5-flash-lite",
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                temperature=0.0,
+                thinking_config=types.ThinkingConfig(thinking_budget=0),
+                system_instruction=MERGECONFLICT_S,
+                seed=42
+            )
+        )
+        resolution = response.text.strip("\n")
+        if resolution.startswith("```") and resolution.endswith("```"): #remove markdown code block formatting if present
+            resolution = "\n".join(resolution.splitlines()[1:-1])
+        return resolution + "\n" if resolution else ""
+
+    def apply_templates(self) -> TemplateResult:
+        """Emit the edits of routine changes (e.g. a common RPC added to an existing component) directly from the per-SDK
+        templates in ai_updater_templates, without any AI calls. The edits are staged in the overlay.
+
+        Returns:
+            TemplateResult: The emitted edits and the changes that still need the AI pipeline
+        """
+        template_result = apply_templates(self.sdk, self.sdk_root_dir, self.change_model, self.topology, self.overlay.read_text)
+        for edit in template_result.edits:
+            abs_path = os.path.join(self.sdk_root_dir, edit.file_path)
+            self.overlay.write(abs_path, edit.content, self.destination_path(edit.file_path))
+            self.implementation_details[os.path.abspath(abs_path)] = (edit.file_path, edit.summary)
+            print(f"Applied template edit to {edit.file_path}: {edit.summary}")
+        print(f"Finished applying templates. Matched changes: {[shape.describe() for shape in template_result.matched]}, "
+              f"unmatched changes: {[shape.describe() for shape in template_result.unmatched]}")
+        return template_result
+
+    async def validate_changes(self):
+        """Check every generated file for syntax errors locally and regenerate only the files that fail.
+
+        Python files are parsed with ast, typescript, C++ and dart files get a lightweight bracket/string/comment
+        check (see ai_updater_validation). Files whose original version already fails the check are skipped, since the
+        failure is then not caused by the AI. Each failing file is regenerated with the error location included in its
+        instructions, up to MAX_SYNTAX_FIX_ATTEMPTS times. Files that pass are kept as they are.
+        """
+        files = self.overlay.files()
+        for attempt in range(MAX_SYNTAX_FIX_ATTEMPTS + 1):
+            issues = await asyncio.to_thread(check_files, files)
+            for abs_path in list(issues):
+                if os.path.exists(abs_path) and check_syntax(abs_path, self.store.read(abs_path)) is not None:
+                    del issues[abs_path]
+            if not issues:
+                print(f"All {len(self.overlay.files())} generated files passed the syntax check.")
+                return
+            if attempt == MAX_SYNTAX_FIX_ATTEMPTS:
+                break
+
+            regenerations = []
+            for abs_path, issue in issues.items():
+                file_path, implementation_detail = self.implementation_details.get(abs_path, (os.path.relpath(abs_path, self.sdk_root_dir), ""))
+                print(f"Syntax check failed for {file_path} at {issue.describe()}. Regenerating.")
+                fix_detail = FIXSYNTAX_P.format(implementation_detail=implementation_detail, error_location=issue.describe(),
+                                                error_context=error_context(files[abs_path], issue))
+                regenerations.append(self.generate_file(file_path=file_path, implementation_detail=fix_detail,
+                                                        ai_file_path=self.overlay.destination(abs_path), fallback=True))
+            await asyncio.gather(*regenerations)
+            files = {abs_path: self.overlay.read(abs_path) for abs_path in issues}
+
+        for abs_path, issue in issues.items():
+            print(f"WARNING: {os.path.relpath(abs_path, self.sdk_root_dir)} still fails the syntax check at {issue.describe()}")
+
     def configure_sdk_specifics(self, sdk: str) -> dict:
         """Configure the AI updater for a specific SDK.
 
         Args:
             sdk: The SDK that is being updated (currently supports python, cpp, typescript, flutter)
 
+        With --proto-repo, the semantic diff of the .proto sources of that repository replaces the diff of the SDK's
+        generated code, so no generated code is diffed (or, for typescript, regenerated).
+
         Returns:
             dict: A dictionary containing the SDK-specific configuration
         """
         git_diff_output = ""
         sdk_tree_output = ""
         tests_tree_output = ""
+        proto_diff = None
+        if sdk not in DIFF_RULES:
+            raise ValueError(f"Invalid SDK: {sdk}. The AI updater currently only supports python, cpp, typescript, and flutter.")
+        if self.args.proto_repo:
+            proto_diff, _ = semantic_diff(self.args.proto_repo)
+            git_diff_output = proto_diff.describe()
+        # Generated files that only clutter the diff are excluded per SDK (see DIFF_RULES and --diff-exclude)
+        git_diff_command = ["git", "diff", "HEAD~1", "HEAD", "--", DIFF_RULES[sdk]["diff_dir"]] + exclude_pathspecs(sdk, self.args.diff_exclude)
         if sdk == "python":
-            git_diff_dir = os.path.join("src", "viam", "gen")
-            git_diff_output = subprocess.check_output(["git", "diff", "HEAD~1", "HEAD", "--", git_diff_dir, ":!*_pb2.py"], text=True, cwd=self.sdk_root_dir)
+            if proto_diff is None:
+                git_diff_output = subprocess.check_output(git_diff_command, text=True, cwd=self.sdk_root_dir)
             sdk_tree_output = subprocess.check_output(["tree", os.path.join("src", "viam")], text=True, cwd=self.sdk_root_dir)
             tests_tree_output = subprocess.check_output(["tree", "tests"], text=True, cwd=self.sdk_root_dir)
         elif sdk == "cpp":
-            git_diff_dir = os.path.join("src", "viam", "api")
-            diff_exclude_files = [":!*.cc", ":!src/viam/api/api_proto_tag.lock", ":!src/viam/api/buf.lock", ":!src/viam/api/buf.yaml", ":!src/viam/api/CMakeLists.txt", ":!src/viam/api/viamcppsdk_replace_switch.cmake"]
-            git_diff_command = ["git", "diff", "HEAD~1", "HEAD", "--", git_diff_dir] + diff_exclude_files
-            git_diff_output = subprocess.check_output(git_diff_command, text=True, cwd=self.sdk_root_dir)
+            if proto_diff is None:
+                git_diff_output = subprocess.check_output(git_diff_command, text=True, cwd=self.sdk_root_dir)
             sdk_tree_output = subprocess.check_output(["tree", os.path.join("src", "viam", "sdk")], text=True, cwd=self.sdk_root_dir)
             tests_tree_output = "\nFor the C++ SDK, the tests are included in the sdk/tests directory so the tree will not be resupplied here."
         elif sdk == "flutter":
-            git_diff_dir = os.path.join("lib", "src", "gen")
-            git_diff_output = subprocess.check_output(["git", "diff", "HEAD~1", "HEAD", "--", git_diff_dir], text=True, cwd=self.sdk_root_dir)
+            if proto_diff is None:
+                git_diff_output = subprocess.check_output(git_diff_command, text=True, cwd=self.sdk_root_dir)
             sdk_tree_output = subprocess.check_output(["tree", os.path.join("lib", "src"), "-I", "gen"], text=True, cwd=self.sdk_root_dir)
             tests_tree_output = subprocess.check_output(["tree", "test"], text=True, cwd=self.sdk_root_dir)
         elif sdk == "typescript":
-            current_commit = subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, cwd=self.sdk_root_dir).strip()
-            subprocess.check_output(["git", "checkout", "HEAD~1"], cwd=self.sdk_root_dir)
-            subprocess.check_output(["make", "build-buf"], cwd=self.sdk_root_dir)
-            subprocess.check_output(["mv", "src/gen", "../HEAD-1"], cwd=self.sdk_root_dir)
-            subprocess.check_output(["git", "checkout", current_commit], cwd=self.sdk_root_dir)
-            subprocess.check_output(["make", "build-buf"], cwd=self.sdk_root_dir)
-            subprocess.check_output(["mv", "src/gen", "../HEAD"], cwd=self.sdk_root_dir)
-            git_diff_output = subprocess.run(["diff", "-r", "-u", "--exclude='.*'", "../HEAD-1", "../HEAD"], text=True, capture_output=True, cwd=self.sdk_root_dir).stdout
+            if proto_diff is None:
+                current_commit = subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, cwd=self.sdk_root_dir).strip()
+                subprocess.check_output(["git", "checkout", "HEAD~1"], cwd=self.sdk_root_dir)
+                subprocess.check_output(["make", "build-buf"], cwd=self.sdk_root_dir)
+                subprocess.check_output(["mv", "src/gen", "../HEAD-1"], cwd=self.sdk_root_dir)
+                subprocess.check_output(["git", "checkout", current_commit], cwd=self.sdk_root_dir)
+                subprocess.check_output(["make", "build-buf"], cwd=self.sdk_root_dir)
+                subprocess.check_output(["mv", "src/gen", "../HEAD"], cwd=self.sdk_root_dir)
+                git_diff_output = subprocess.run(["diff", "-r", "-u", "--exclude='.*'", "../HEAD-1", "../HEAD"], text=True, capture_output=True, cwd=self.sdk_root_dir).stdout
+                git_diff_output = filter_diff(git_diff_output, DIFF_RULES[sdk]["exclude"] + list(self.args.diff_exclude or []))
+                subprocess.check_output(["rm", "-rf", "../HEAD-1", "../HEAD"], cwd=self.sdk_root_dir)
             sdk_tree_output = subprocess.check_output(["tree", "src"], text=True, cwd=self.sdk_root_dir)
             tests_tree_output = "\nFor the Typescript SDK, the tests are included within the src directory (as .spec.ts files)."
-            subprocess.check_output(["rm", "-rf", "../HEAD-1", "../HEAD"], cwd=self.sdk_root_dir)
-        else:
-            raise ValueError(f"Invalid SDK: {sdk}. The AI updater currently only supports python, cpp, typescript, and flutter.")
-        return {"git_diff_output": git_diff_output, "sdk_tree_output": sdk_tree_output, "tests_tree_output": tests_tree_output}
+        return {"git_diff_output": git_diff_output, "sdk_tree_output": sdk_tree_output, "tests_tree_output": tests_tree_output,
+                "proto_diff": proto_diff}
 
-    async def run(self):
-        """Main execution method for the AI updater."""
+    def prompt_diff(self, git_diff_output: str, compress: bool) -> str:
+        """Prepare a proto diff for the prompts: the change model summary, followed by the diff (compressed unless
+        --no-diff-compression is set or the diff is a semantic proto diff).
+
+        Args:
+            git_diff_output: The raw proto diff
+            compress: Whether the diff is compressed (see ai_updater_diff.compress_diff)
+
+        Returns:
+            str: The diff as sent to the prompts
+        """
+        if compress:
+            compressed_diff = compress_diff(git_diff_output)
+            print(f"Compressed the proto diff from {compressed_diff.original_tokens} to {compressed_diff.compressed_tokens} tokens.")
+            git_diff_output = compressed_diff.text
+        return self.change_model.describe() + git_diff_output
+
+    async def analyze_diff(self, git_diff_output: str, sdk_tree_output: str, tests_tree_output: str) -> types.GenerateContentResponse:
+        """Gather the relevant context of a proto diff and analyze which files it requires to change.
+
+        Args:
+            git_diff_output: The proto diff as sent to the prompts (see prompt_diff)
+            sdk_tree_output: Tree structure of the SDK
+            tests_tree_output: Tree structure of the tests
+
+        Returns:
+            GenerateContentResponse: The diff analysis, parsed as RequiredChanges
+        """
+        if self.args.debug:
+            if self.args.work:
+                print(f"Git diff output: {git_diff_output}")
+            elif self.args.test:
+                write_to_file(self.output_path("gitdifftest.txt"), git_diff_output, quiet=True)
+        relevant_context = await self.get_relevant_context(git_diff_output, sdk_tree_output, tests_tree_output)
+        return await self.get_diff_analysis(git_diff_output, relevant_context)
+
+    def fork(self, cluster: DiffCluster = None, cluster_number: int = None) -> "AIUpdater":
+        """Create an updater running part of this updater's work concurrently: the pipeline of one cluster of a
+        clustered diff (see run_clusters) or one of several edits of the same file (see edit_file_jobs).
+
+        The fork shares the request budget, cache, content store, relevance memo, topology and index of this updater.
+        Its overlay starts from the files staged so far and its edits stay in it until they are merged back (see
+        merge_versions).
+
+        Args:
+            cluster: The cluster processed by the fork. Without it, the fork works on this updater's change
+            cluster_number: 1-based number of the cluster, appended to the names of its output files
+
+        Returns:
+            AIUpdater: The fork
+        """
+        fork = AIUpdater(args=self.args, sdk=self.sdk, sdk_root_dir=self.sdk_root_dir, budget=self.budget, cache=self.cache,
+                         store=self.store, memo=self.memo)
+        fork.client = self.client
+        fork.cluster_number = cluster_number if cluster is not None else self.cluster_number
+        fork.change_model = cluster.change_model if cluster is not None else self.change_model
+        fork.raw_git_diff = cluster.diff if cluster is not None else self.raw_git_diff
+        fork.topology = self.topology
+        fork.index = self.index
+        fork.dependency_graph = self.dependency_graph
+        fork.overlay = self.overlay.fork()
+        fork.implementation_details = dict(self.implementation_details)
+        return fork
+
+    async def run_clusters(self, clusters: list[DiffCluster], template_description: str, sdk_tree_output: str,
+                           tests_tree_output: str, compress: bool) -> types.GenerateContentResponse:
+        """Run the context, analysis and apply stages of every cluster of a clustered diff concurrently, each in its
+        own fork of this updater, and merge their edits into this updater's overlay (see merge_clusters).
+
+        Args:
+            clusters: The clusters of the diff (see ai_updater_clusters.cluster_diff)
+            template_description: Description of the template edits, prepended to the diff of every cluster
+            sdk_tree_output: Tree structure of the SDK
+            tests_tree_output: Tree structure of the tests
+            compress: Whether the diffs are compressed for the prompts
+
+        Returns:
+            GenerateContentResponse: The diff analyses of every cluster, combined into one RequiredChanges
+        """
+        forks = [self.fork(cluster, number) for number, cluster in enumerate(clusters, start=1)]
+        for number, cluster in enumerate(clusters, start=1):
+            print(f"Cluster {number}: {', '.join(package or '(no package)' for package in cluster.packages)} "
+                  f"({estimate_tokens(cluster.diff)} tokens of diff)")
+
+        async def run_cluster(fork: AIUpdater, cluster: DiffCluster) -> types.GenerateContentResponse:
+            diff_analysis = await fork.analyze_diff(template_description + fork.prompt_diff(cluster.diff, compress),
+                                                    sdk_tree_output, tests_tree_output)
+            if not self.args.noai:
+                await fork.apply_changes(diff_analysis)
+            return diff_analysis
+
+        try:
+            diff_analyses = await asyncio.gather(*[run_cluster(fork, cluster) for fork, cluster in zip(forks, clusters)])
+        finally:
+            for fork in forks:
+                self.total_cost += fork.total_cost
+                self.speculative_cost.merge(fork.speculative_cost)
+        if not self.args.noai:
+            await self.merge_clusters(forks)
+
+        required_changes = RequiredChanges(files_to_update=[], implementation_details=[], requires_creation=[])
+        for diff_analysis in diff_analyses:
+            required_changes.files_to_update += diff_analysis.parsed.files_to_update
+            required_changes.implementation_details += diff_analysis.parsed.implementation_details
+            required_changes.requires_creation += diff_analysis.parsed.requires_creation
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=required_changes.model_dump_json())]))],
+            model_version=diff_analyses[0].model_version,
+            parsed=required_changes,
+        )
+
+    async def merge_clusters(self, forks: list["AIUpdater"]):
+        """Merge the edits of the cluster forks into this updater's overlay, three-way merging the files edited by several
+        clusters (see merge_versions).
+
+        Args:
+            forks: The forks that ran the clusters
+        """
+        edits: dict[str, list[tuple[str, str]]] = {}
+        destinations: dict[str, str] = {}
+        for fork in forks:
+            for abs_path, content in fork.overlay.files().items():
+                base = self.overlay.read(abs_path) if self.overlay.exists(abs_path) else None
+                if content != base:
+                    _, implementation_detail = fork.implementation_details.get(abs_path, (None, ""))
+                    edits.setdefault(abs_path, []).append((content, implementation_detail))
+                    destinations[abs_path] = fork.overlay.destination(abs_path)
+        await asyncio.gather(*[self.merge_versions(abs_path, versions, destination=destinations[abs_path], source="clusters")
+                               for abs_path, versions in edits.items()])
+
+    async def run(self, sdk_config: dict = None, change_model: ChangeModel = None):
+        """Main execution method for the AI updater.
+
+        Args:
+            sdk_config: Precomputed output of configure_sdk_specifics (used by --sdks mode)
+            change_model: Language-neutral change model shared between SDKs (used by --sdks mode)
+        """
         # Get diff and output (and write to file for debugging)
-        # Note: the way I am currently doing git diff excludes the _pb2.py files because it clutters the diff and confuses the LLM
-        sdk_config = self.configure_sdk_specifics(self.args.sdk)
+        if sdk_config is None:
+            sdk_config = self.configure_sdk_specifics(self.sdk)
         git_diff_output = sdk_config["git_diff_output"]
         sdk_tree_output = sdk_config["sdk_tree_output"]
         tests_tree_output = sdk_config["tests_tree_output"]
 
-        if self.args.test:
+        if self.args.test and not self.multi_sdk:
             # Check if specific proto diff file was specified for testing reasons
             scenario_dir = os.path.dirname(self.sdk_root_dir)
             if os.path.exists(os.path.join(scenario_dir, "proto_diff.txt")):
@@ -425,37 +1564,189 @@ class AIUpdater:
                     git_diff_output = f.read()
         if git_diff_output == "":
             print("There were no proto changes detected that required an update to the SDK. Exiting.")
-            write_to_file(os.path.join(self.current_dir, "pr_summary.txt"), "No changes were needed to the SDK.", quiet=True)
+            write_to_file(self.output_path("pr_summary.txt"), "No changes were needed to the SDK.", quiet=True)
             return
-        if self.args.debug:
-            if self.args.work:
-                print(f"Git diff output: {git_diff_output}")
-            elif self.args.test:
-                write_to_file(os.path.join(self.current_dir, "gitdifftest.txt"), git_diff_output, quiet=True)
+        if change_model is None:
+            proto_diff = sdk_config.get("proto_diff")
+            change_model = proto_diff.to_change_model() if proto_diff is not None else build_change_model(git_diff_output)
+        self.change_model = change_model
+        # The uncompressed diff is kept for the local analyses (retrieval), the prompts get the compressed one
+        self.raw_git_diff = git_diff_output
+        compress = not self.args.no_diff_compression and sdk_config.get("proto_diff") is None
+        self.topology = SdkTopology.scan(self.sdk_root_dir, self.sdk)
+        self.index = SdkIndex(self.sdk_root_dir, self.sdk, self.index_path())
+        await asyncio.to_thread(self.index.update, self.store)
 
-        relevant_context = await self.get_relevant_context(git_diff_output, sdk_tree_output, tests_tree_output)
-
-        diff_analysis = self.get_diff_analysis(git_diff_output, relevant_context)
+        template_description = ""
+        if self.args.templates != "off":
+            template_result = self.apply_templates()
+            if self.args.templates == "only" and template_result.edits and not template_result.unmatched:
+                print("Every change was handled by templates. Skipping the AI pipeline.")
+                summary = "The following routine changes were applied from templates:\n" + "\n".join(
+                    f"- `{edit.file_path}`: {edit.summary}" for edit in template_result.edits)
+                write_to_file(self.output_path("pr_summary.txt"), summary, quiet=True)
+                if not self.args.noai:
+                    await self.validate_changes()
+                    written_files = self.overlay.flush()
+                    print(f"Wrote {len(written_files)} generated files.")
+                return
+            template_description = template_result.describe()
 
-        self.generate_pr_summary(git_diff_output, diff_analysis)
+        clusters = cluster_diff(git_diff_output, sdk_config.get("proto_diff"), self.args.max_clusters)
+        if len(clusters) > 1:
+            diff_analysis = await self.run_clusters(clusters, template_description, sdk_tree_output, tests_tree_output, compress)
+            await self.generate_pr_summary(template_description + self.prompt_diff(git_diff_output, compress), diff_analysis)
+        else:
+            git_diff_output = template_description + self.prompt_diff(git_diff_output, compress)
+            diff_analysis = await self.analyze_diff(git_diff_output, sdk_tree_output, tests_tree_output)
+            await self.generate_pr_summary(git_diff_output, diff_analysis)
+            if not self.args.noai:
+                await self.apply_changes(diff_analysis)
 
         if not self.args.noai:
-            self.apply_changes(diff_analysis)
+            await self.validate_changes()
+            # Generated files are only written to disk once every file was generated successfully
+            written_files = self.overlay.flush()
+            print(f"Wrote {len(written_files)} generated files.")
+
+        sdk_label = f" ({self.sdk})" if self.multi_sdk else ""
+        if self.speculative_cost.requests:
+            print(f"Cancelled --race attempts cost ${self.speculative_cost.cost:.4f} ({self.speculative_cost.requests} requests).")
+        print(f"\nTotal estimated cost for this run{sdk_label}: ${self.total_cost:.4f}")
+        if not self.multi_sdk:
+            print(self.store.summary())
+
+def format_plan(file_paths: list[str], intents: list[str], creations: list[bool]) -> str:
+    """Render a change plan for the per-file instructions prompt, one line per file."""
+    return "\n".join(f"- {file_path} ({'new file' if creation else 'existing file'}): "
+                     f"{intent.strip().splitlines()[0][:MAX_PLAN_INTENT_LENGTH] if intent.strip() else '(no details)'}"
+                     for file_path, intent, creation in zip(file_paths, intents, creations))
+
+
+def instructions_text(response: types.GenerateContentResponse) -> str:
+    """Return the implementation details of a per-file instructions response. A response that is not JSON is taken as
+    the instructions themselves."""
+    data = parse_structured(response, FileInstructions)
+    if data is None:
+        return (response.text or "").strip()
+    return str(data.get("implementation_details") or "").strip()
+
 
-        print(f"\nTotal estimated cost for this run: ${self.total_cost:.4f}")
+def open_relevance_memo(args, current_dir: str) -> RelevanceMemo:
+    """Open the relevance memo selected by --relevance-memo (a file next to this script by default, in memory with "off"),
+    serving verdicts once --memo-min-observations of them agree.
+
+    Args:
+        args: Command line arguments
+        current_dir: Directory of the ai_updater scripts
+
+    Returns:
+        RelevanceMemo: The relevance memo
+    """
+    if args.relevance_memo == "off":
+        return RelevanceMemo(min_observations=args.memo_min_observations)
+    return RelevanceMemo(args.relevance_memo or os.path.join(current_dir, ".relevance_memo.json"), min_observations=args.memo_min_observations)
+
+async def run_multi_sdk(args, sdks: list[str]):
+    """Update several SDKs from a single proto change in one process.
+
+    Every SDK checkout is expected in its own directory (see SDK_CHECKOUT_DIRS) under the --test/--work path.
+    The SDK diffs are gathered in parallel, a single language-neutral change model is derived from the first
+    non-empty diff, and the per-SDK pipelines then run concurrently under one shared request budget and cache.
+
+    Args:
+        args: Command line arguments
+        sdks: The SDKs to update
+    """
+    parent_dir = args.test or args.work
+    budget = RequestBudget(args.max_concurrency, args.rpm)
+    cache = ResponseCache()
+    store = ContentStore()
+    memo = open_relevance_memo(args, os.path.dirname(os.path.abspath(__file__)))
+    updaters = [AIUpdater(args=args, sdk=sdk, sdk_root_dir=os.path.join(parent_dir, SDK_CHECKOUT_DIRS[sdk]), budget=budget, cache=cache,
+                          store=store, memo=memo)
+                for sdk in sdks]
+
+    sdk_configs = await asyncio.gather(*[asyncio.to_thread(updater.configure_sdk_specifics, updater.sdk) for updater in updaters])
+
+    change_model = ChangeModel()
+    for sdk_config in sdk_configs:
+        if sdk_config.get("proto_diff") is not None:
+            change_model = sdk_config["proto_diff"].to_change_model()
+            break
+        if sdk_config["git_diff_output"]:
+            change_model = build_change_model(sdk_config["git_diff_output"])
+            break
+
+    await asyncio.gather(*[updater.run(sdk_config=sdk_config, change_model=change_model)
+                           for updater, sdk_config in zip(updaters, sdk_configs)])
+    print(f"\nTotal estimated cost for all SDKs: ${sum(updater.total_cost for updater in updaters):.4f} "
+          f"(cache hits: {cache.hits})")
+    print(store.summary())
 
 def main():
     """Main entry point for the AI updater script."""
     parser = argparse.ArgumentParser(description="Viam SDK AI Updater")
     parser.add_argument("--debug", action="store_true", help="Enable debug mode to print various helpful files")
     parser.add_argument("--noai", action="store_true", help="Disable AI (for testing)")
-    parser.add_argument("--patch", action="store_true", help="Attempt to apply patches to existing files")
+    parser.add_argument("--race", action="store_true",
+                        help="Latency mode: regenerate risky files in full concurrently with their patch or line-range edit, keeping the first valid result")
+    parser.add_argument("--patch-candidates", type=int, default=1,
+                        help="Number of patch candidates sampled per request and validated locally (default: 1)")
+    parser.add_argument("--edit-strategy", choices=["auto", "full", "patch", "line-range", "windowed"], default="auto",
+                        help="How existing files are edited: picked per file from a cost model (auto, default), regenerated in full, "
+                             "patched with search/replace blocks, edited by line ranges, or edited in windows (large files)")
+    parser.add_argument("--analysis", choices=["single", "planned"], default="single",
+                        help="How the diff is analyzed: in a single call with every context file (single, default), or in a planning call "
+                             "followed by concurrent per-file calls given only the context related to each file (planned)")
+    parser.add_argument("--max-clusters", type=int, default=1,
+                        help="Split large proto diffs into up to this many clusters of proto packages, processed by concurrent pipelines (default: 1, no clustering)")
+    parser.add_argument("--no-minify", action="store_true", help="Send reference-only context files to the diff analysis verbatim")
+    parser.add_argument("--proto-repo", type=str,
+                        help="Checkout of the API repository holding the .proto sources. Its HEAD~1..HEAD semantic diff replaces the generated code diff")
+    parser.add_argument("--no-diff-compression", action="store_true", help="Send the proto diff to the prompts uncompressed")
+    parser.add_argument("--diff-exclude", action="append", default=[],
+                        help="Additional pattern of generated files to leave out of the proto diff (can be repeated)")
     parser.add_argument("--sdk", type=str, help="The SDK that is being updated (currently supports python, cpp, typescript, flutter)")
+    parser.add_argument("--sdks", type=str, help="Comma separated list of SDKs to update together from one proto change (e.g. python,typescript,cpp,flutter)")
+    parser.add_argument("--topology", choices=["seed", "replace", "off"], default="seed",
+                        help="Use the SDK topology map to add (seed) or exclusively provide (replace) the stage 1 context files")
+    parser.add_argument("--graph-depth", type=int, default=2,
+                        help="Add the imports and base classes of the topology files up to this many edges away (0 to disable)")
+    parser.add_argument("--retrieval-k", type=int, default=8,
+                        help="Add the files of the k SDK chunks that best match the identifiers of the diff (0 to disable)")
+    parser.add_argument("--near-duplicate-threshold", type=float, default=NEAR_DUPLICATE_THRESHOLD,
+                        help=f"Similarity from which candidate context files are collapsed as near-duplicates "
+                             f"(default: {NEAR_DUPLICATE_THRESHOLD}, 0 to disable)")
+    parser.add_argument("--templates", choices=["off", "assist", "only"], default="off",
+                        help="Apply routine changes from templates before (assist) or instead of (only) the AI pipeline")
+    parser.add_argument("--relevance-memo", type=str, default=None,
+                        help="JSON file storing past context relevance verdicts (defaults to .relevance_memo.json next to this script, 'off' to disable)")
+    parser.add_argument("--memo-min-observations", type=int, default=MIN_OBSERVATIONS,
+                        help=f"Agreeing relevance verdicts needed before the memo serves a file's verdict (default: {MIN_OBSERVATIONS})")
+    parser.add_argument("--sdk-index", type=str, default=None,
+                        help="Directory of the persisted SDK symbol/import index (defaults to .sdk_index next to this script, 'off' to disable)")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="Maximum number of concurrent model requests across all SDKs")
+    parser.add_argument("--rpm", type=int, default=0, help="Maximum number of model requests per minute across all SDKs (0 for no limit)")
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument("--test", type=str, help="Enable when running tests. Supply path to root directory of desired test repo")
     group.add_argument("--work", type=str, help="Enable when running in workflow. Supply path to root direcory repo to be updated")
 
     args = parser.parse_args()
+    if args.patch_candidates < 1:
+        parser.error("--patch-candidates must be at least 1.")
+    if args.max_clusters < 1:
+        parser.error("--max-clusters must be at least 1.")
+    if args.memo_min_observations < 1:
+        parser.error("--memo-min-observations must be at least 1.")
+
+    if args.sdks:
+        sdks = [sdk.strip() for sdk in args.sdks.split(",") if sdk.strip()]
+        for sdk in sdks:
+            if sdk not in SUPPORTED_SDKS:
+                parser.error(f"Invalid SDK: {sdk}. The AI updater currently only supports {', '.join(SUPPORTED_SDKS)}.")
+        asyncio.run(run_multi_sdk(args, sdks))
+        return
 
     # Create and run the updater
     updater = AIUpdater(args=args)
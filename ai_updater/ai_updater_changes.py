@@ -0,0 +1,98 @@
+import re
+
+from pydantic import BaseModel
+
+# Matches the proto package directory of a generated file, e.g. src/viam/gen/component/gripper/v1/gripper_grpc.py
+GENERATED_PACKAGE_PATTERN = re.compile(r"(?:^|/)(?:gen|api|HEAD|HEAD-1)/((?:[a-z0-9_]+/)*v\d+[a-z0-9]*)/[^/]+$")
+# Matches fully qualified gRPC method paths, e.g. /viam.component.gripper.v1.GripperService/GetKinematics
+RPC_PATH_PATTERN = re.compile(r"/((?:[a-z0-9_]+\.)+v\d+[a-z0-9]*)\.([A-Z]\w*)/([A-Z]\w*)")
+MESSAGE_PATTERN = re.compile(r"\b([A-Z][A-Za-z0-9]*(?:Request|Response))\b")
+DIFF_FILE_PATTERN = re.compile(r"^\+\+\+ (?:b/)?(\S+)")
+
+
+class ChangeModel(BaseModel):
+    """Language-neutral description of a proto change, shared by every SDK pipeline.
+    packages: The proto packages touched by the change (e.g. viam.component.gripper.v1).
+    services: The fully qualified gRPC services touched by the change.
+    rpcs_added: Fully qualified RPCs (package.Service/Method) added by the change.
+    rpcs_removed: Fully qualified RPCs removed by the change.
+    messages_added: Request/response messages added by the change.
+    messages_removed: Request/response messages removed by the change.
+    fields_added: Fields added to existing messages (package.Message.field), with their label and type (e.g. optional
+        double). Only the semantic .proto diff (see ai_updater_proto) reports fields.
+    """
+    packages: list[str] = []
+    services: list[str] = []
+    rpcs_added: list[str] = []
+    rpcs_removed: list[str] = []
+    messages_added: list[str] = []
+    messages_removed: list[str] = []
+    fields_added: dict[str, str] = {}
+
+    def is_empty(self) -> bool:
+        """Whether the change model contains no information at all."""
+        return not (self.packages or self.services or self.rpcs_added or self.rpcs_removed
+                    or self.messages_added or self.messages_removed or self.fields_added)
+
+    def describe(self) -> str:
+        """Render the change model as a short text block suitable for inclusion in prompts.
+
+        Returns:
+            str: Human readable summary, or an empty string if the model is empty.
+        """
+        if self.is_empty():
+            return ""
+        lines = ["Language-neutral summary of the proto changes:"]
+        for label, values in (("Packages", self.packages), ("Services", self.services),
+                              ("Added RPCs", self.rpcs_added), ("Removed RPCs", self.rpcs_removed),
+                              ("Added messages", self.messages_added), ("Removed messages", self.messages_removed),
+                              ("Added fields", [f"{name} ({declaration})" for name, declaration in self.fields_added.items()])):
+            if values:
+                lines.append(f"- {label}: {', '.join(values)}")
+        return "\n".join(lines) + "\n"
+
+
+def build_change_model(git_diff_output: str) -> ChangeModel:
+    """Derive a language-neutral ChangeModel from a diff of generated proto code.
+
+    gRPC method paths and request/response message names are identical in the generated code of every SDK,
+    so the same proto change yields the same model regardless of which SDK's diff it is built from.
+
+    Args:
+        git_diff_output: Unified diff of the generated proto code.
+
+    Returns:
+        ChangeModel: The derived change model.
+    """
+    packages = set()
+    services = set()
+    added_rpcs, removed_rpcs = set(), set()
+    added_messages, removed_messages = set(), set()
+
+    for line in git_diff_output.splitlines():
+        file_match = DIFF_FILE_PATTERN.match(line)
+        if file_match:
+            package_match = GENERATED_PACKAGE_PATTERN.search(file_match.group(1))
+            if package_match:
+                packages.add("viam." + package_match.group(1).replace("/", "."))
+            continue
+        if line.startswith("+") and not line.startswith("+++"):
+            rpcs, messages = added_rpcs, added_messages
+        elif line.startswith("-") and not line.startswith("---"):
+            rpcs, messages = removed_rpcs, removed_messages
+        else:
+            continue
+        for package, service, method in RPC_PATH_PATTERN.findall(line):
+            packages.add(package)
+            services.add(f"{package}.{service}")
+            rpcs.add(f"{package}.{service}/{method}")
+        messages.update(MESSAGE_PATTERN.findall(line))
+
+    return ChangeModel(
+        packages=sorted(packages),
+        services=sorted(services),
+        rpcs_added=sorted(added_rpcs - removed_rpcs),
+        rpcs_removed=sorted(removed_rpcs - added_rpcs),
+        messages_added=sorted(added_messages - removed_messages),
+        messages_removed=sorted(removed_messages - added_messages),
+    )
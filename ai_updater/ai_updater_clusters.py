@@ -0,0 +1,117 @@
+from pydantic import BaseModel
+
+from ai_updater_changes import GENERATED_PACKAGE_PATTERN, RPC_PATH_PATTERN, ChangeModel, build_change_model
+from ai_updater_diff import DIFF_FILE_PATTERN
+from ai_updater_proto import ProtoDiff
+from ai_updater_utils import estimate_tokens
+
+# Diffs with fewer tokens are processed by a single pipeline, splitting them costs more context than it saves
+CLUSTER_MIN_TOKENS = 6000
+
+
+class DiffCluster(BaseModel):
+    """A group of proto packages whose changes are processed by a pipeline of their own.
+    packages: The proto packages of the cluster ("" stands for the changes that belong to no package).
+    diff: The part of the diff (or of the semantic proto diff) covering those packages.
+    change_model: The change model of that part of the diff.
+    proto_diff: The part of the semantic proto diff covering those packages, with --proto-repo.
+    """
+    packages: list[str]
+    diff: str
+    change_model: ChangeModel
+    proto_diff: ProtoDiff | None = None
+
+
+def _file_package(file_path: str, section: list[str]) -> str:
+    """Proto package of one file of a generated code diff: from its path, or from the gRPC paths it mentions."""
+    package_match = GENERATED_PACKAGE_PATTERN.search(file_path)
+    if package_match:
+        return "viam." + package_match.group(1).replace("/", ".")
+    for line in section:
+        rpc_match = RPC_PATH_PATTERN.search(line)
+        if rpc_match:
+            return rpc_match.group(1)
+    return ""
+
+
+def split_diff(git_diff_output: str) -> dict[str, str]:
+    """Split a diff of generated proto code by proto package.
+
+    Args:
+        git_diff_output: Unified diff of the generated code (git diff or diff -r -u)
+
+    Returns:
+        dict[str, str]: The diff of the files of each package, keyed by package ("" for files of no package and for
+            anything before the first file header)
+    """
+    sections: list[tuple[str, list[str]]] = [("", [])]
+    for line in git_diff_output.splitlines(keepends=True):
+        file_match = DIFF_FILE_PATTERN.match(line.rstrip("\n"))
+        if file_match:
+            sections.append((file_match.group(1), []))
+        sections[-1][1].append(line)
+    packages: dict[str, str] = {}
+    for file_path, section in sections:
+        if not section:
+            continue
+        package = _file_package(file_path, section) if file_path else ""
+        packages[package] = packages.get(package, "") + "".join(section)
+    return packages
+
+
+def _split_proto_diff(proto_diff: ProtoDiff) -> dict[str, ProtoDiff]:
+    """Split a semantic proto diff by the package declaring each changed element."""
+    parts: dict[str, ProtoDiff] = {}
+    for change in proto_diff.changes:
+        name = change.name.split("/")[0]
+        matches = [package for package in proto_diff.packages if name == package or name.startswith(package + ".")]
+        package = max(matches, key=len) if matches else ""
+        part = parts.setdefault(package, ProtoDiff(packages=[package] if package else []))
+        part.changes.append(change)
+    return parts
+
+
+def cluster_diff(git_diff_output: str, proto_diff: ProtoDiff = None, max_clusters: int = 4) -> list[DiffCluster]:
+    """Group the changes of a large proto diff into clusters of packages that can be processed independently.
+
+    The diff is split by proto package (by file for a diff of generated code, by changed element for a semantic proto
+    diff), and the packages are spread over at most max_clusters clusters of about the same size, largest package
+    first. Each cluster gets the change model of its part of the diff, so that its pipeline only gathers the context
+    of its own packages.
+
+    Args:
+        git_diff_output: The proto diff (the description of proto_diff if it is given)
+        proto_diff: The semantic proto diff, with --proto-repo
+        max_clusters: Maximum number of clusters (see --max-clusters)
+
+    Returns:
+        list[DiffCluster]: The clusters, largest first. A single cluster if the diff is too small to be worth splitting
+            or touches a single package
+    """
+    if proto_diff is not None:
+        proto_parts = _split_proto_diff(proto_diff)
+        parts = {package: part.describe() for package, part in proto_parts.items()}
+    else:
+        proto_parts = {}
+        parts = split_diff(git_diff_output)
+    if max_clusters < 2 or len(parts) < 2 or estimate_tokens(git_diff_output) < CLUSTER_MIN_TOKENS:
+        change_model = proto_diff.to_change_model() if proto_diff is not None else build_change_model(git_diff_output)
+        return [DiffCluster(packages=sorted(parts), diff=git_diff_output, change_model=change_model, proto_diff=proto_diff)]
+
+    bins: list[list[str]] = [[] for _ in range(min(max_clusters, len(parts)))]
+    sizes = [0] * len(bins)
+    for package in sorted(parts, key=lambda package: -estimate_tokens(parts[package])):
+        smallest = sizes.index(min(sizes))
+        bins[smallest].append(package)
+        sizes[smallest] += estimate_tokens(parts[package])
+
+    clusters = []
+    for packages in sorted(bins, key=lambda packages: -sum(estimate_tokens(parts[package]) for package in packages)):
+        if proto_diff is not None:
+            part = ProtoDiff(changes=[change for package in packages for change in proto_parts[package].changes],
+                             packages=sorted(package for package in packages if package))
+            clusters.append(DiffCluster(packages=sorted(packages), diff=part.describe(), change_model=part.to_change_model(), proto_diff=part))
+        else:
+            diff = "".join(parts[package] for package in packages)
+            clusters.append(DiffCluster(packages=sorted(packages), diff=diff, change_model=build_change_model(diff)))
+    return clusters
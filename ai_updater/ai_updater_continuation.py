@@ -0,0 +1,65 @@
+# Output token cap of gemini-2.5-flash-lite, which regenerates whole files and windows
+MODEL_MAX_OUTPUT_TOKENS = 65536
+# Output limit of the requests whose expected output is smaller than this
+MIN_OUTPUT_TOKENS = 8192
+# Headroom of the output limit over the expected output (code the estimate misses, code fences)
+OUTPUT_TOKEN_HEADROOM = 1.5
+# Continuation requests sent for a single generation before it is given up as truncated
+MAX_CONTINUATIONS = 3
+# Lines at the end of the generated text that a continuation may repeat before resuming
+MAX_OVERLAP_LINES = 20
+# Lines at the end of the generated text quoted in a continuation request
+CONTINUATION_TAIL_LINES = 5
+
+
+def output_token_limit(expected_tokens: int) -> int:
+    """Return the max_output_tokens of a request from the size of its expected output.
+
+    The limit leaves OUTPUT_TOKEN_HEADROOM over the expected output, so a file of the expected size is generated in a
+    single request, while a generation that runs away (e.g. repeating a block) is cut off early. It never exceeds the
+    cap of the model.
+
+    Args:
+        expected_tokens: Expected output tokens of the request (e.g. the file tokens plus the tokens of the change)
+
+    Returns:
+        int: The output limit of the request
+    """
+    return min(MODEL_MAX_OUTPUT_TOKENS, max(MIN_OUTPUT_TOKENS, int(expected_tokens * OUTPUT_TOKEN_HEADROOM)))
+
+
+def complete_lines(text: str) -> str:
+    """Return the text up to and including its last newline, dropping the line a truncated generation was cut off in."""
+    return text[:text.rfind("\n") + 1]
+
+
+def strip_opening_fence(text: str) -> str:
+    """Remove the code fence a continuation may open with, since the fence of the first part is already open."""
+    stripped = text.lstrip("\n")
+    if stripped.startswith("```"):
+        return stripped.split("\n", 1)[1] if "\n" in stripped else ""
+    return text
+
+
+def splice(previous: str, continuation: str) -> str:
+    """Append a continuation to the complete lines generated before it.
+
+    Continuations often repeat the last lines they were asked to continue from. The longest run of up to
+    MAX_OVERLAP_LINES lines ending the previous text that also starts the continuation is dropped from the
+    continuation. Blank lines alone don't count as an overlap.
+
+    Args:
+        previous: The text generated so far, ending with a complete line
+        continuation: The text of the continuation request
+
+    Returns:
+        str: The spliced text
+    """
+    continuation = strip_opening_fence(continuation)
+    previous_lines = previous.splitlines()
+    continuation_lines = continuation.splitlines()
+    for count in range(min(MAX_OVERLAP_LINES, len(previous_lines), len(continuation_lines)), 0, -1):
+        overlap = previous_lines[-count:]
+        if overlap == continuation_lines[:count] and any(line.strip() for line in overlap):
+            return previous + "".join(continuation.splitlines(keepends=True)[count:])
+    return previous + continuation
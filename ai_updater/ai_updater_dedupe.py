@@ -0,0 +1,120 @@
+import re
+import heapq
+import hashlib
+import posixpath
+
+from pydantic import BaseModel
+
+from ai_updater_topology import file_stem, normalize_name
+
+WORD_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+# Number of consecutive tokens in a shingle
+SHINGLE_SIZE = 5
+# Number of smallest shingle hashes kept in a MinHash signature
+SIGNATURE_SIZE = 64
+# Maximum number of files kept per cluster of near-duplicates (files of the changed resources are always kept)
+MAX_EXEMPLARS = 2
+# Generic file names that don't name a resource
+GENERIC_STEMS = {"client", "service", "server", "__init__", "index", "main", "api", "types", "register"}
+# Estimated similarity from which two files are near-duplicates. Calibrated on the expected files of the test
+# scenarios: sibling components (switch and button) have a Jaccard similarity of 0.31 to 0.52 for their client,
+# service, abstract class and tests, and 0.14 to 0.29 against the larger gripper, while files that only share
+# boilerplate (a client and a service, a header and its source) stay at or below 0.12
+DEFAULT_THRESHOLD = 0.3
+
+
+class DuplicateCluster(BaseModel):
+    """A group of near-duplicate candidate files.
+    kept: Files kept as exemplars of the pattern the cluster shares.
+    dropped: Files dropped because they repeat the pattern of the kept files.
+    """
+    kept: list[str]
+    dropped: list[str]
+
+
+def _resource_names(file_path: str) -> set[str]:
+    names = {normalize_name(posixpath.basename(posixpath.dirname(file_path))), normalize_name(file_stem(file_path))}
+    return {name for name in names if len(name) > 2 and name not in GENERIC_STEMS}
+
+
+def shingles(file_path: str, content: str) -> set[int]:
+    """Hash the token shingles of a file. The names of the resource the file belongs to are replaced by a placeholder
+    first, so that e.g. arm/client.py and gripper/client.py only differ by their resource specific code.
+
+    Args:
+        file_path: Path of the file relative to the SDK root
+        content: Content of the file
+
+    Returns:
+        set[int]: The hashed shingles
+    """
+    names = _resource_names(file_path)
+    tokens = []
+    for word in WORD_PATTERN.findall(content):
+        token = normalize_name(word)
+        for name in names:
+            token = token.replace(name, "\0")
+        tokens.append(token)
+    if len(tokens) < SHINGLE_SIZE:
+        tokens += [""] * (SHINGLE_SIZE - len(tokens))
+    return {int.from_bytes(hashlib.blake2b(" ".join(tokens[i:i + SHINGLE_SIZE]).encode("utf-8"), digest_size=8).digest(), "big")
+            for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def minhash(shingle_hashes: set[int]) -> frozenset[int]:
+    """Compute the bottom-k MinHash signature of a set of shingles: its SIGNATURE_SIZE smallest hashes. The shingle
+    hashes are already uniform, so a single pass replaces hashing every shingle once per permutation."""
+    return frozenset(heapq.nsmallest(SIGNATURE_SIZE, shingle_hashes))
+
+
+def similarity(signature_a: frozenset[int], signature_b: frozenset[int]) -> float:
+    """Estimate the Jaccard similarity of two files from their MinHash signatures: the fraction of the smallest hashes
+    of their union that both files share. It is exact for files with fewer than SIGNATURE_SIZE shingles."""
+    union = heapq.nsmallest(SIGNATURE_SIZE, signature_a | signature_b)
+    return sum(shingle in signature_a and shingle in signature_b for shingle in union) / len(union)
+
+
+def collapse_near_duplicates(files: dict[str, str], keep: set[str], threshold: float = DEFAULT_THRESHOLD) -> tuple[list[str], list[DuplicateCluster]]:
+    """Cluster near-duplicate files and keep only a few exemplars of each cluster.
+
+    Args:
+        files: Mapping of candidate file path to content, in candidate order
+        keep: Files that must never be dropped (e.g. the files of the changed resources)
+        threshold: Estimated Jaccard similarity from which two files are near-duplicates
+
+    Returns:
+        tuple[list[str], list[DuplicateCluster]]: The remaining files in candidate order, and the clusters that had
+            files dropped
+    """
+    paths = list(files)
+    signatures = [minhash(shingles(file_path, files[file_path])) for file_path in paths]
+    parent = list(range(len(paths)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in range(len(paths)):
+        for j in range(i + 1, len(paths)):
+            if similarity(signatures[i], signatures[j]) >= threshold:
+                parent[find(j)] = find(i)
+
+    members: dict[int, list[str]] = {}
+    for i, file_path in enumerate(paths):
+        members.setdefault(find(i), []).append(file_path)
+
+    dropped = set()
+    clusters = []
+    for cluster in members.values():
+        if len(cluster) <= MAX_EXEMPLARS:
+            continue
+        kept = [file_path for file_path in cluster if file_path in keep]
+        others = [file_path for file_path in cluster if file_path not in keep]
+        exemplars = max(1, MAX_EXEMPLARS - len(kept))
+        kept += others[:exemplars]
+        if others[exemplars:]:
+            clusters.append(DuplicateCluster(kept=[file_path for file_path in cluster if file_path in kept], dropped=others[exemplars:]))
+            dropped.update(others[exemplars:])
+    return [file_path for file_path in paths if file_path not in dropped], clusters
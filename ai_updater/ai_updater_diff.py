@@ -0,0 +1,228 @@
+import re
+import fnmatch
+import difflib
+
+from pydantic import BaseModel
+
+from ai_updater_utils import estimate_tokens
+
+# Generated code diffed for each SDK, and the files of it left out of the diff (git pathspec globs relative to the SDK
+# root, where * also matches /). Extra patterns can be added with --diff-exclude.
+DIFF_RULES = {
+    "python": {
+        "diff_dir": "src/viam/gen",
+        "exclude": ["*_pb2.py"],
+    },
+    "cpp": {
+        "diff_dir": "src/viam/api",
+        "exclude": ["*.cc", "src/viam/api/api_proto_tag.lock", "src/viam/api/buf.lock", "src/viam/api/buf.yaml",
+                    "src/viam/api/CMakeLists.txt", "src/viam/api/viamcppsdk_replace_switch.cmake"],
+    },
+    "flutter": {
+        "diff_dir": "lib/src/gen",
+        "exclude": [],
+    },
+    "typescript": {
+        "diff_dir": "src/gen",
+        "exclude": [],
+    },
+}
+# Changed lines at least this long are rewritten as token-level changes
+LONG_LINE_LENGTH = 200
+# Number of tokens of unchanged text kept around each token-level change
+CONTEXT_TOKENS = 6
+# Number of unchanged context lines kept before and after each change within a hunk
+CONTEXT_LINES = 1
+# Unchanged context lines are cut to this many characters
+MAX_CONTEXT_LINE_LENGTH = 160
+DESCRIBED_LINES_LEGEND = ("(This diff is compressed: a line starting with ~ describes the change of a long line, with removed text in [-...-], "
+                          "added text in {+...+} and ... in place of unchanged text.)")
+TOKEN_PATTERN = re.compile(r"\w+|\s+|[^\w\s]")
+DIFF_FILE_PATTERN = re.compile(r"^(?:diff -r -u .* |diff --git a/\S+ b/)(\S+)$")
+
+
+class CompressedDiff(BaseModel):
+    """A diff after compression.
+    text: The compressed diff.
+    original_tokens: Estimated tokens of the original diff.
+    compressed_tokens: Estimated tokens of the compressed diff.
+    """
+    text: str
+    original_tokens: int
+    compressed_tokens: int
+
+
+def exclude_pathspecs(sdk: str, extra_patterns: list[str] = None) -> list[str]:
+    """Build the git pathspecs excluding the files of the generated code that are not diffed for an SDK.
+
+    Args:
+        sdk: The SDK being updated
+        extra_patterns: Additional exclude patterns (from --diff-exclude)
+
+    Returns:
+        list[str]: Pathspecs to append to a git diff command
+    """
+    return [f":!{pattern}" for pattern in DIFF_RULES[sdk]["exclude"] + list(extra_patterns or [])]
+
+
+def filter_diff(git_diff_output: str, patterns: list[str]) -> str:
+    """Drop the files matching any of the exclude patterns from a diff that wasn't produced by git (e.g. diff -r).
+
+    Args:
+        git_diff_output: Unified diff of several files
+        patterns: Exclude patterns, matched against the path of each file with fnmatch
+
+    Returns:
+        str: The diff without the excluded files
+    """
+    if not patterns:
+        return git_diff_output
+    result = []
+    excluded = False
+    for line in git_diff_output.splitlines(keepends=True):
+        match = DIFF_FILE_PATTERN.match(line.rstrip("\n"))
+        if match:
+            excluded = any(fnmatch.fnmatch(match.group(1), pattern) for pattern in patterns)
+        if not excluded:
+            result.append(line)
+    return "".join(result)
+
+
+def describe_line_change(old: str, new: str) -> str:
+    """Describe the change between two versions of a long line at token level, e.g.
+    `... GetGeometriesResponse){+, '/viam.component.gripper.v1.GripperService/GetKinematics': ...+}}`.
+
+    Args:
+        old: The removed line (without the leading -)
+        new: The added line (without the leading +)
+
+    Returns:
+        str: The change description, with removed tokens in [-...-] and added tokens in {+...+}
+    """
+    old_tokens = TOKEN_PATTERN.findall(old)
+    new_tokens = TOKEN_PATTERN.findall(new)
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+    opcodes = matcher.get_opcodes()
+    parts = []
+    for i, (tag, i1, i2, j1, j2) in enumerate(opcodes):
+        if tag == "equal":
+            equal = old_tokens[i1:i2]
+            first, last = i == 0, i == len(opcodes) - 1
+            if len(equal) <= 2 * CONTEXT_TOKENS and not first and not last:
+                parts.append("".join(equal))
+                continue
+            head = [] if first else equal[:CONTEXT_TOKENS]
+            tail = [] if last else equal[-CONTEXT_TOKENS:]
+            parts.append("".join(head) + "..." + "".join(tail))
+            continue
+        if i2 > i1:
+            parts.append("[-" + "".join(old_tokens[i1:i2]) + "-]")
+        if j2 > j1:
+            parts.append("{+" + "".join(new_tokens[j1:j2]) + "+}")
+    return "".join(parts)
+
+
+def _compress_changes(removed: list[str], added: list[str]) -> list[str]:
+    """Align the removed and added lines of a change block. Lines that are identical on both sides (e.g. only their
+    missing newline at end of file changed) become context, and pairs of similar long lines become ~ lines describing
+    the change at token level."""
+    result = []
+    matcher = difflib.SequenceMatcher(None, [line[1:] for line in removed], [line[1:] for line in added], autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            result += [" " + line[1:] for line in removed[i1:i2]]
+        elif tag == "replace" and i2 - i1 == j2 - j1:
+            plain_removed, plain_added = [], []
+            for old, new in zip(removed[i1:i2], added[j1:j2]):
+                if len(old) >= LONG_LINE_LENGTH and len(new) >= LONG_LINE_LENGTH and \
+                        difflib.SequenceMatcher(None, old, new, autojunk=False).quick_ratio() > 0.5:
+                    plain_removed.append(None)
+                    plain_added.append("~" + describe_line_change(old[1:], new[1:]))
+                else:
+                    plain_removed.append(old)
+                    plain_added.append(new)
+            result += [line for line in plain_removed if line is not None] + plain_added
+        else:
+            result += removed[i1:i2] + added[j1:j2]
+    return result
+
+
+def _collapse_context(lines: list[str]) -> list[str]:
+    """Keep CONTEXT_LINES unchanged lines around each change of a hunk, replace longer runs of unchanged lines by a
+    marker and cut long unchanged lines."""
+    changed = [i for i, line in enumerate(lines) if not line.startswith(" ")]
+    dropped = [line.startswith(" ") and not any(abs(i - j) <= CONTEXT_LINES for j in changed) for i, line in enumerate(lines)]
+    result = []
+    i = 0
+    while i < len(lines):
+        if dropped[i]:
+            end = i
+            while end < len(lines) and dropped[end]:
+                end += 1
+            if end - i > 2:
+                result.append(f" ... ({end - i} unchanged lines)")
+                i = end
+                continue
+        line = lines[i]
+        if line.startswith(" ") and len(line) > MAX_CONTEXT_LINE_LENGTH:
+            line = line[:MAX_CONTEXT_LINE_LENGTH] + "..."
+        result.append(line)
+        i += 1
+    return result
+
+
+def compress_diff(git_diff_output: str) -> CompressedDiff:
+    """Shrink a diff of generated code for the prompts.
+
+    Pairs of long changed lines (e.g. the one-line __mapping__ dicts of generated grpclib code, where a single handler
+    is appended to a dict of several kilobytes) are replaced by one ~ line describing the change at token level, the
+    "\\ No newline at end of file" markers are dropped and unchanged context is collapsed to CONTEXT_LINES lines around
+    each change. The hunk headers are kept as they are, so line numbers still refer to the original files.
+
+    Args:
+        git_diff_output: Unified diff
+
+    Returns:
+        CompressedDiff: The compressed diff with the token estimates before and after
+    """
+    output = []
+    hunk = []
+    removed, added = [], []
+
+    def flush_changes():
+        hunk.extend(_compress_changes(removed, added))
+        removed.clear()
+        added.clear()
+
+    def flush_hunk():
+        flush_changes()
+        output.extend(_collapse_context(hunk))
+        hunk.clear()
+
+    in_hunk = False
+    for line in git_diff_output.splitlines():
+        if line.startswith("\\"):
+            continue
+        if line.startswith("@@"):
+            flush_hunk()
+            output.append(line)
+            in_hunk = True
+        elif in_hunk and line.startswith("-"):
+            if added:
+                flush_changes()
+            removed.append(line)
+        elif in_hunk and line.startswith("+"):
+            added.append(line)
+        elif in_hunk and (line.startswith(" ") or line == ""):
+            flush_changes()
+            hunk.append(line if line else " ")
+        else:
+            flush_hunk()
+            in_hunk = False
+            output.append(line)
+    flush_hunk()
+
+    if any(line.startswith("~") for line in output):
+        output.insert(0, DESCRIBED_LINES_LEGEND)
+    text = "\n".join(output) + ("\n" if git_diff_output.endswith("\n") else "")
+    return CompressedDiff(text=text, original_tokens=estimate_tokens(git_diff_output), compressed_tokens=estimate_tokens(text))
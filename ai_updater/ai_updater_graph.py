@@ -0,0 +1,151 @@
+import os
+import posixpath
+
+from pydantic import BaseModel
+
+from ai_updater_index import SdkIndex
+from ai_updater_validation import LANGUAGE_BY_EXTENSION
+
+# Extensions tried, in order, when an import doesn't spell out the extension of the imported file
+IMPORT_EXTENSIONS = {
+    "python": [".py", "/__init__.py"],
+    "typescript": [".ts", ".tsx", "/index.ts", ""],
+    "cpp": [""],
+    "dart": [""],
+}
+
+
+class GraphFile(BaseModel):
+    """A file reached by expanding the dependency graph from the seed files.
+    path: Path of the file relative to the SDK root.
+    distance: Number of import or inheritance edges between the closest seed file and this file (0 for seeds).
+    score: Relevance of the file derived from its distance, 1 / (1 + distance).
+    """
+    path: str
+    distance: int
+    score: float
+
+
+class DependencyGraph:
+    """Import and inheritance graph over the files of an SdkIndex.
+
+    A file depends on the SDK files it imports (python modules, typescript/dart relative imports and package: URIs,
+    C++ includes) and on the files defining its base classes, so that e.g. gripper/client.py reaches gripper.py,
+    which reaches component_base.py, which reaches resource/rpc_service_base.py.
+    """
+
+    def __init__(self, index: SdkIndex):
+        """Build the graph from an up to date index.
+
+        Args:
+            index: The SDK index
+        """
+        self.index = index
+        # Lookup of every indexed file by each of its path suffixes (a/b/c.py, b/c.py, c.py)
+        self._by_suffix: dict[str, list[str]] = {}
+        for file_path in index.files:
+            parts = file_path.split("/")
+            for i in range(len(parts)):
+                self._by_suffix.setdefault("/".join(parts[i:]), []).append(file_path)
+        # Top-level python packages of the SDK (e.g. viam for src/viam/__init__.py). Absolute imports of any other
+        # package (logging, grpclib) are third party, even when an SDK module shares their name
+        self.python_packages = set()
+        for file_path in index.files:
+            if posixpath.basename(file_path) == "__init__.py":
+                package_dir = posixpath.dirname(file_path)
+                if package_dir and posixpath.join(posixpath.dirname(package_dir), "__init__.py") not in index.files:
+                    self.python_packages.add(posixpath.basename(package_dir))
+        definitions: dict[str, list[str]] = {}
+        for entry in index.files.values():
+            for symbol in entry.symbols:
+                if "." not in symbol.name:
+                    definitions.setdefault(symbol.name, []).append(entry.path)
+
+        self.edges: dict[str, set[str]] = {}
+        for entry in index.files.values():
+            targets = set()
+            for module in entry.imports:
+                targets.update(self.resolve_import(entry.path, module))
+            for symbol in entry.symbols:
+                for base in symbol.bases:
+                    targets.update(definitions.get(base, []))
+            targets.discard(entry.path)
+            self.edges[entry.path] = targets
+
+    def _lookup(self, candidate: str, exact: bool) -> list[str]:
+        """Find the indexed files matching a candidate path, either exactly or by path suffix."""
+        candidate = posixpath.normpath(candidate)
+        if exact:
+            return [candidate] if candidate in self.index.files else []
+        return self._by_suffix.get(candidate, [])
+
+    def resolve_import(self, file_path: str, module: str) -> list[str]:
+        """Resolve an import of a file to the indexed files it refers to.
+
+        Args:
+            file_path: Path of the importing file relative to the SDK root
+            module: The import as recorded in the index
+
+        Returns:
+            list[str]: The imported SDK files (empty for third party or unresolvable imports)
+        """
+        language = LANGUAGE_BY_EXTENSION.get(os.path.splitext(file_path)[1])
+        directory = posixpath.dirname(file_path)
+        if language == "python":
+            if module.startswith("."):
+                level = len(module) - len(module.lstrip("."))
+                base = directory
+                for _ in range(level - 1):
+                    base = posixpath.dirname(base)
+                relative = module[level:].replace(".", "/")
+                candidate, exact = posixpath.join(base, relative) if relative else base, True
+            elif module.partition(".")[0] not in self.python_packages:
+                return []
+            else:
+                candidate, exact = module.replace(".", "/"), False
+        elif language == "dart":
+            # package:viam_sdk/src/x.dart lives at lib/src/x.dart, other package: and dart: URIs are third party
+            if module.startswith("package:"):
+                candidate, exact = "lib/" + module[len("package:"):].partition("/")[2], True
+            elif module.startswith("dart:"):
+                return []
+            else:
+                candidate, exact = posixpath.join(directory, module), True
+        elif language == "typescript":
+            if not module.startswith("."):
+                return []
+            candidate, exact = posixpath.join(directory, module), True
+        elif language == "cpp":
+            resolved = self._lookup(posixpath.join(directory, module), exact=True)
+            return resolved or self._lookup(module, exact=False)
+        else:
+            return []
+
+        for extension in IMPORT_EXTENSIONS[language]:
+            resolved = self._lookup(candidate + extension, exact)
+            if resolved:
+                return resolved
+        return []
+
+    def expand(self, seeds: list[str], max_depth: int = 2) -> list[GraphFile]:
+        """Collect the transitive dependencies of the seed files by breadth-first search.
+
+        Args:
+            seeds: Paths of the seed files relative to the SDK root
+            max_depth: Maximum number of edges followed from a seed
+
+        Returns:
+            list[GraphFile]: The seeds and every file reached, closest first
+        """
+        distances = {seed: 0 for seed in seeds}
+        frontier = [seed for seed in seeds if seed in self.edges]
+        for depth in range(1, max_depth + 1):
+            next_frontier = []
+            for file_path in frontier:
+                for target in sorted(self.edges.get(file_path, ())):
+                    if target not in distances:
+                        distances[target] = depth
+                        next_frontier.append(target)
+            frontier = next_frontier
+        return [GraphFile(path=file_path, distance=distance, score=1 / (1 + distance))
+                for file_path, distance in sorted(distances.items(), key=lambda item: (item[1], item[0]))]
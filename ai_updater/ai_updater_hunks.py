@@ -0,0 +1,170 @@
+import re
+import difflib
+
+from pydantic import BaseModel
+
+from ai_updater_changes import ChangeModel
+from ai_updater_validation import check_syntax
+
+# Identifiers that are distinctive enough to be used as anchors (contain an underscore or an inner capital letter)
+DISTINCTIVE_IDENTIFIER_PATTERN = re.compile(r"\b(?:[A-Za-z]\w*_\w+|[a-z]+[A-Z]\w*|[A-Z][a-z0-9]+[A-Z]\w*)\b")
+BACKTICK_PATTERN = re.compile(r"`([^`\n]+)`")
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_]\w*")
+# Number of unchanged lines between a hunk and an instructed hunk for it to count as part of the same edit
+ADJACENCY_LINES = 3
+
+
+class Hunk(BaseModel):
+    """A contiguous change between an original and an updated file.
+    original_start: 0-based index of the first original line of the hunk.
+    original_lines: The lines of the original file replaced by the hunk.
+    updated_start: 0-based index of the first updated line of the hunk.
+    updated_lines: The lines of the updated file that replace them.
+    instructed: Whether the hunk was classified as part of the requested change.
+    """
+    original_start: int
+    original_lines: list[str]
+    updated_start: int
+    updated_lines: list[str]
+    instructed: bool = True
+
+    @property
+    def original_end(self) -> int:
+        return self.original_start + len(self.original_lines)
+
+    def is_whitespace_only(self) -> bool:
+        """Whether the hunk only changes whitespace (indentation, trailing spaces or blank lines)."""
+        return "".join(self.original_lines).split() == "".join(self.updated_lines).split()
+
+
+def compute_hunks(original: str, updated: str) -> list[Hunk]:
+    """Split the line diff between two versions of a file into hunks.
+
+    Args:
+        original: Original file content
+        updated: Updated file content
+
+    Returns:
+        list[Hunk]: The changed regions, in file order
+    """
+    original_lines = original.splitlines(keepends=True)
+    updated_lines = updated.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, original_lines, updated_lines, autojunk=False)
+    return [Hunk(original_start=i1, original_lines=original_lines[i1:i2], updated_start=j1, updated_lines=updated_lines[j1:j2])
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"]
+
+
+def _normalize(identifier: str) -> str:
+    return identifier.replace("_", "").lower()
+
+
+def extract_anchors(implementation_detail: str, change_model: ChangeModel = None) -> set[str]:
+    """Collect the identifiers an edit is expected to touch, normalized so that GetKinematics, get_kinematics and
+    getKinematics all match.
+
+    Args:
+        implementation_detail: The implementation instructions for the file
+        change_model: The change model of the proto change, if available
+
+    Returns:
+        set[str]: The normalized anchors
+    """
+    anchors = set()
+    for snippet in BACKTICK_PATTERN.findall(implementation_detail):
+        anchors.update(IDENTIFIER_PATTERN.findall(snippet))
+    anchors.update(DISTINCTIVE_IDENTIFIER_PATTERN.findall(implementation_detail))
+    if change_model is not None:
+        for rpc in change_model.rpcs_added + change_model.rpcs_removed:
+            anchors.add(rpc.rsplit("/", 1)[-1])
+        anchors.update(change_model.messages_added + change_model.messages_removed)
+        anchors.update(field.rsplit(".", 1)[-1] for field in change_model.fields_added)
+    return {_normalize(anchor) for anchor in anchors if len(anchor) > 2}
+
+
+def classify_hunks(hunks: list[Hunk], anchors: set[str]) -> list[Hunk]:
+    """Mark every hunk as instructed or spurious.
+
+    A hunk is instructed if it mentions an anchor, if it only inserts new code, or if it lies within ADJACENCY_LINES
+    of an instructed hunk. Whitespace-only hunks and hunks that modify or delete existing code without mentioning any
+    anchor are spurious, unless they are next to an instructed hunk. If no hunk mentions an anchor at all, the anchors
+    can't be trusted and only whitespace-only hunks are marked spurious.
+
+    Args:
+        hunks: Hunks as returned by compute_hunks
+        anchors: Anchors as returned by extract_anchors
+
+    Returns:
+        list[Hunk]: The same hunks with `instructed` set
+    """
+    mentions_anchor = []
+    for hunk in hunks:
+        identifiers = IDENTIFIER_PATTERN.findall("".join(hunk.original_lines + hunk.updated_lines))
+        mentions_anchor.append(any(_normalize(identifier) in anchors for identifier in identifiers))
+    trust_anchors = any(mentions_anchor)
+
+    for hunk, anchored in zip(hunks, mentions_anchor):
+        if hunk.is_whitespace_only():
+            hunk.instructed = False
+        elif anchored or not hunk.original_lines or not trust_anchors:
+            hunk.instructed = True
+        else:
+            hunk.instructed = False
+
+    # Spurious-looking hunks next to an instructed one are part of the same edit (e.g. a reworded docstring or the
+    # blank line separating a new method). Whitespace-only hunks must directly touch the instructed hunk.
+    instructed_ranges = [(hunk.original_start, hunk.original_end) for hunk in hunks if hunk.instructed]
+    for hunk in hunks:
+        if hunk.instructed:
+            continue
+        distance = 1 if hunk.is_whitespace_only() else ADJACENCY_LINES
+        if any(hunk.original_start - distance <= end and start - distance <= hunk.original_end
+               for start, end in instructed_ranges):
+            hunk.instructed = True
+    return hunks
+
+
+def apply_hunks(original: str, hunks: list[Hunk]) -> str:
+    """Rebuild a file from its original content, applying only the instructed hunks.
+
+    Args:
+        original: Original file content
+        hunks: Classified hunks computed against original
+
+    Returns:
+        str: The original content with every instructed hunk applied
+    """
+    original_lines = original.splitlines(keepends=True)
+    result = []
+    position = 0
+    for hunk in hunks:
+        result.extend(original_lines[position:hunk.original_start])
+        result.extend(hunk.updated_lines if hunk.instructed else hunk.original_lines)
+        position = hunk.original_end
+    result.extend(original_lines[position:])
+    return "".join(result)
+
+
+def revert_spurious_hunks(file_path: str, original: str, updated: str, implementation_detail: str,
+                          change_model: ChangeModel = None) -> tuple[str, list[Hunk]]:
+    """Revert the hunks of a regenerated file that were not part of the requested change.
+
+    The reverted content is only used if it passes the same syntax check as the regenerated file.
+
+    Args:
+        file_path: Path of the file (used to choose the syntax check)
+        original: Content of the file before regeneration
+        updated: Content of the regenerated file
+        implementation_detail: The implementation instructions the file was regenerated from
+        change_model: The change model of the proto change, if available
+
+    Returns:
+        tuple[str, list[Hunk]]: The guarded content and the hunks that were reverted
+    """
+    hunks = classify_hunks(compute_hunks(original, updated), extract_anchors(implementation_detail, change_model))
+    reverted = [hunk for hunk in hunks if not hunk.instructed]
+    if not reverted:
+        return updated, []
+    guarded = apply_hunks(original, hunks)
+    if check_syntax(file_path, guarded) is not None and check_syntax(file_path, updated) is None:
+        return updated, []
+    return guarded, reverted
@@ -0,0 +1,301 @@
+import os
+import re
+import ast
+import json
+import time
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from pydantic import BaseModel
+
+from ai_updater_store import ContentStore, git_blob_sha
+from ai_updater_topology import SDK_LAYOUTS, SOURCE_EXTENSIONS
+from ai_updater_validation import LANGUAGE_BY_EXTENSION
+
+# Version of the index file format and of the extraction rules. Bump it when parse_source changes to force a rebuild.
+INDEX_VERSION = 1
+# Number of files to parse from which a process pool is used instead of parsing in-process
+PARALLEL_THRESHOLD = 64
+
+TS_IMPORT_PATTERN = re.compile(r"""^\s*(?:import|export)\b[^'"]*?from\s*['"]([^'"]+)['"]|^\s*import\s*['"]([^'"]+)['"]""", re.MULTILINE)
+TS_CLASS_PATTERN = re.compile(r"^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?(class|interface)\s+(\w+)(?:<[^{]*?>)?"
+                              r"(?:\s+extends\s+([\w.,\s<>]+?))?(?:\s+implements\s+([\w.,\s<>]+?))?\s*\{", re.MULTILINE)
+TS_FUNCTION_PATTERN = re.compile(r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*(\w+)", re.MULTILINE)
+CPP_INCLUDE_PATTERN = re.compile(r"^\s*#\s*include\s*[<\"]([^>\"]+)[>\"]", re.MULTILINE)
+CPP_CLASS_PATTERN = re.compile(r"^\s*(?:template\s*<[^;{]*>\s*)?(class|struct)\s+(?:\w+\s+)*?(\w+)\s*(?:final\s*)?(?::\s*([^{;]+))?\{",
+                               re.MULTILINE)
+DART_IMPORT_PATTERN = re.compile(r"""^\s*(?:import|export|part)\s+['"]([^'"]+)['"]""", re.MULTILINE)
+DART_CLASS_PATTERN = re.compile(r"^\s*(?:abstract\s+|base\s+|final\s+|sealed\s+|interface\s+|mixin\s+)*(class|mixin)\s+(\w+)(?:<[^{]*?>)?"
+                                r"(?:\s+extends\s+([\w.<>, ]+?))?(?:\s+with\s+([\w.<>, ]+?))?(?:\s+implements\s+([\w.<>, ]+?))?\s*\{",
+                                re.MULTILINE)
+CPP_ACCESS_PATTERN = re.compile(r"\b(?:public|protected|private|virtual)\b")
+
+
+class Symbol(BaseModel):
+    """A definition found in an SDK file.
+    name: Name of the definition (methods are qualified with their class, e.g. GripperClient.open).
+    kind: One of class, interface, struct, mixin, function or method.
+    line: 1-based line of the definition.
+    bases: Names of the base classes, interfaces and mixins of a class.
+    """
+    name: str
+    kind: str
+    line: int
+    bases: list[str] = []
+
+
+class FileIndex(BaseModel):
+    """Index entry of one SDK file.
+    path: Path of the file relative to the SDK root.
+    blob_sha: Git blob SHA-1 of the content the entry was built from.
+    symbols: Definitions found in the file.
+    imports: Modules, files or headers imported by the file, as written in the source (relative python imports keep
+        their leading dots).
+    """
+    path: str
+    blob_sha: str
+    symbols: list[Symbol] = []
+    imports: list[str] = []
+
+
+def _line_of(content: str, position: int) -> int:
+    return content.count("\n", 0, position) + 1
+
+
+def _split_names(names: str | None) -> list[str]:
+    """Split a comma separated list of type names, dropping generic arguments (Base<T>, Mixin -> Base, Mixin)."""
+    if not names:
+        return []
+    depth = 0
+    cleaned = ""
+    for char in names:
+        if char == "<":
+            depth += 1
+        elif char == ">":
+            depth -= 1
+        elif depth == 0:
+            cleaned += char
+    return [name.strip().rsplit(".", 1)[-1].rsplit("::", 1)[-1] for name in cleaned.split(",") if name.strip()]
+
+
+def _parse_python(content: str) -> tuple[list[Symbol], list[str]]:
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return [], []
+    symbols = []
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            imports.append("." * node.level + (node.module or ""))
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            bases = [ast.unparse(base).rsplit(".", 1)[-1].split("[")[0] for base in node.bases]
+            symbols.append(Symbol(name=node.name, kind="class", line=node.lineno, bases=bases))
+            for child in node.body:
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    symbols.append(Symbol(name=f"{node.name}.{child.name}", kind="method", line=child.lineno))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            symbols.append(Symbol(name=node.name, kind="function", line=node.lineno))
+    return symbols, imports
+
+
+def _parse_typescript(content: str) -> tuple[list[Symbol], list[str]]:
+    imports = [match.group(1) or match.group(2) for match in TS_IMPORT_PATTERN.finditer(content)]
+    symbols = [Symbol(name=match.group(2), kind=match.group(1), line=_line_of(content, match.start(2)),
+                      bases=_split_names(match.group(3)) + _split_names(match.group(4)))
+               for match in TS_CLASS_PATTERN.finditer(content)]
+    symbols += [Symbol(name=match.group(1), kind="function", line=_line_of(content, match.start(1)))
+                for match in TS_FUNCTION_PATTERN.finditer(content)]
+    return sorted(symbols, key=lambda symbol: symbol.line), imports
+
+
+def _parse_cpp(content: str) -> tuple[list[Symbol], list[str]]:
+    imports = CPP_INCLUDE_PATTERN.findall(content)
+    symbols = [Symbol(name=match.group(2), kind=match.group(1), line=_line_of(content, match.start(2)),
+                      bases=_split_names(CPP_ACCESS_PATTERN.sub("", match.group(3) or "")))
+               for match in CPP_CLASS_PATTERN.finditer(content)]
+    return symbols, imports
+
+
+def _parse_dart(content: str) -> tuple[list[Symbol], list[str]]:
+    imports = DART_IMPORT_PATTERN.findall(content)
+    symbols = [Symbol(name=match.group(2), kind=match.group(1), line=_line_of(content, match.start(2)),
+                      bases=_split_names(match.group(3)) + _split_names(match.group(4)) + _split_names(match.group(5)))
+               for match in DART_CLASS_PATTERN.finditer(content)]
+    return symbols, imports
+
+
+PARSERS = {
+    "python": _parse_python,
+    "typescript": _parse_typescript,
+    "cpp": _parse_cpp,
+    "dart": _parse_dart,
+}
+
+
+def parse_source(file_path: str, content: str) -> tuple[list[Symbol], list[str]]:
+    """Extract the definitions and imports of a source file.
+
+    Python files are parsed with ast, typescript, C++ and dart files with line-anchored regular expressions.
+
+    Args:
+        file_path: Path of the file (used to determine the language)
+        content: Content of the file
+
+    Returns:
+        tuple[list[Symbol], list[str]]: The definitions and the imports of the file
+    """
+    parser = PARSERS.get(LANGUAGE_BY_EXTENSION.get(os.path.splitext(file_path)[1]))
+    if parser is None:
+        return [], []
+    return parser(content)
+
+
+def _index_file(item: tuple[str, str]) -> FileIndex | None:
+    rel_path, abs_path = item
+    try:
+        with open(abs_path, "rb") as f:
+            data = f.read()
+        content = data.decode("utf-8")
+    except (OSError, UnicodeDecodeError):
+        return None
+    symbols, imports = parse_source(rel_path, content)
+    return FileIndex(path=rel_path, blob_sha=git_blob_sha(data), symbols=symbols, imports=imports)
+
+
+class SdkIndex:
+    """Persistent index of the definitions and imports of every hand-written source file of an SDK checkout.
+
+    Entries are keyed by path and validated by git blob SHA. update() lists the checkout with `git ls-files -s`,
+    hashes only the files `git diff --name-only` reports as modified in the working tree, and reparses only the files
+    whose blob changed, so a warm update of an unchanged SDK costs two git calls. Cold builds parse in a process pool.
+    """
+
+    def __init__(self, sdk_root_dir: str, sdk: str, path: str = None):
+        """Initialize the index, loading the entries stored at path if it exists.
+
+        Args:
+            sdk_root_dir: Root directory of the SDK checkout
+            sdk: The SDK of the checkout
+            path: JSON file the index is persisted to (None keeps it in memory only)
+        """
+        self.sdk_root_dir = sdk_root_dir
+        self.sdk = sdk
+        self.path = path
+        self.files: dict[str, FileIndex] = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable SDK index {path}: {str(e)}")
+                data = {}
+            if data.get("version") == INDEX_VERSION and data.get("sdk") == sdk:
+                self.files = {entry["path"]: FileIndex(**entry) for entry in data.get("files", [])}
+
+    def _is_indexed(self, file_path: str) -> bool:
+        layout = SDK_LAYOUTS[self.sdk]
+        if not file_path.startswith(tuple(root + "/" for root in layout["roots"])):
+            return False
+        if file_path.startswith(tuple(directory + "/" for directory in layout["exclude"])):
+            return False
+        return os.path.splitext(file_path)[1] in SOURCE_EXTENSIONS
+
+    def _list_blobs(self, store: ContentStore = None) -> dict[str, str]:
+        """Return the current blob SHA of every indexed file of the checkout."""
+        git = lambda *args: subprocess.check_output(["git", *args], text=True, cwd=self.sdk_root_dir, stderr=subprocess.DEVNULL)
+        blobs = {}
+        for line in git("ls-files", "-s").splitlines():
+            meta, _, file_path = line.partition("\t")
+            if self._is_indexed(file_path):
+                blobs[file_path] = meta.split()[1]
+        # Files edited in the working tree differ from the index, so their blob is computed from their content
+        dirty = set(git("diff", "--name-only").splitlines()) | set(git("ls-files", "--others", "--exclude-standard").splitlines())
+        for file_path in dirty:
+            if not self._is_indexed(file_path):
+                continue
+            abs_path = os.path.join(self.sdk_root_dir, file_path)
+            if not os.path.isfile(abs_path):
+                blobs.pop(file_path, None)
+                continue
+            if store is not None:
+                try:
+                    blobs[file_path] = store.get(abs_path).blob_sha
+                    continue
+                except (OSError, UnicodeDecodeError):
+                    pass
+            with open(abs_path, "rb") as f:
+                blobs[file_path] = git_blob_sha(f.read())
+        return blobs
+
+    def update(self, store: ContentStore = None, max_workers: int = None) -> dict[str, int]:
+        """Bring the index up to date with the checkout and persist it.
+
+        Args:
+            store: Content store used to hash files modified in the working tree (optional)
+            max_workers: Number of worker processes of a cold build (defaults to the number of CPUs)
+
+        Returns:
+            dict[str, int]: Number of reused, reparsed and removed entries
+        """
+        start = time.perf_counter()
+        try:
+            blobs = self._list_blobs(store)
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            print(f"Could not list the files of {self.sdk_root_dir} with git. The SDK index was not updated.")
+            return {"reused": len(self.files), "reparsed": 0, "removed": 0}
+
+        removed = [file_path for file_path in self.files if file_path not in blobs]
+        for file_path in removed:
+            del self.files[file_path]
+        stale = [(file_path, os.path.join(self.sdk_root_dir, file_path)) for file_path, blob_sha in blobs.items()
+                 if file_path not in self.files or self.files[file_path].blob_sha != blob_sha]
+
+        if len(stale) >= PARALLEL_THRESHOLD:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                entries = list(executor.map(_index_file, stale, chunksize=32))
+        else:
+            entries = [_index_file(item) for item in stale]
+        for entry in entries:
+            if entry is not None:
+                self.files[entry.path] = entry
+
+        stats = {"reused": len(blobs) - len(stale), "reparsed": len(stale), "removed": len(removed)}
+        if stale or removed:
+            self.save()
+        print(f"Updated SDK index in {time.perf_counter() - start:.3f}s ({stats['reused']} files reused, "
+              f"{stats['reparsed']} reparsed, {stats['removed']} removed)")
+        return stats
+
+    def save(self):
+        """Atomically write the index to its file (no-op for an in-memory index)."""
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".sdk_index.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"version": INDEX_VERSION, "sdk": self.sdk,
+                           "files": [entry.model_dump() for entry in self.files.values()]}, f)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def defining_files(self, name: str) -> list[str]:
+        """Return the files that define a class, function or method with the given (unqualified) name.
+
+        Args:
+            name: Name of the definition
+
+        Returns:
+            list[str]: Paths relative to the SDK root
+        """
+        return [entry.path for entry in self.files.values()
+                if any(symbol.name == name or symbol.name.endswith("." + name) for symbol in entry.symbols)]
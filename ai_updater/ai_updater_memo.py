@@ -0,0 +1,171 @@
+import os
+import json
+import hashlib
+import tempfile
+
+from pydantic import BaseModel
+
+from ai_updater_changes import ChangeModel
+from ai_updater_topology import PACKAGE_PATTERN
+
+# Version of the memo file format. Bump it to discard every stored verdict.
+MEMO_VERSION = 1
+# Agreeing verdicts needed before a decision is served locally. A single verdict may be a fluke of the model, so by
+# default the model is asked until a second one confirms it
+MIN_OBSERVATIONS = 2
+
+
+class Verdict(BaseModel):
+    """Past relevance verdicts of one file for one kind of change.
+    included: Number of times the file was judged relevant.
+    excluded: Number of times the file was judged irrelevant.
+    reasoning: Reasoning of the latest verdict.
+    """
+    included: int = 0
+    excluded: int = 0
+    reasoning: str = ""
+
+    def decision(self, min_observations: int) -> bool | None:
+        """Return the memoized decision, or None if the past verdicts are too few or disagree.
+
+        Args:
+            min_observations: Number of agreeing verdicts needed before the decision is served locally
+
+        Returns:
+            bool | None: Whether the file should be included as context, or None if the model must be asked
+        """
+        if self.included and self.excluded:
+            return None
+        if self.included + self.excluded < min_observations:
+            return None
+        return self.included > 0
+
+
+def change_signature(change_model: ChangeModel) -> str:
+    """Normalize a proto change to the kind of change and the resource families it touches, e.g.
+    "component:rpc_added" for an RPC added to any component. Changes of different resources of the same family
+    share a signature, so the verdict for a shared file like rpc_service_base.py is reused across them.
+
+    Args:
+        change_model: The change model of the proto change
+
+    Returns:
+        str: The change signature
+    """
+    kinds = []
+    if change_model.rpcs_added:
+        kinds.append("rpc_added")
+    if change_model.rpcs_removed:
+        kinds.append("rpc_removed")
+    if change_model.messages_added:
+        kinds.append("message_added")
+    if change_model.messages_removed:
+        kinds.append("message_removed")
+    if change_model.fields_added:
+        kinds.append("field_added")
+    if not kinds:
+        kinds.append("modified")
+
+    families = set()
+    for package in change_model.packages:
+        match = PACKAGE_PATTERN.match(package)
+        families.add(match.group(1) if match else "other")
+    return f"{'+'.join(sorted(families)) or 'other'}:{'+'.join(kinds)}"
+
+
+def prompt_fingerprint(*prompts: str) -> str:
+    """Short hash of the prompts a verdict was made with, so that rewording them invalidates stored verdicts."""
+    return hashlib.sha256("\0".join(prompts).encode("utf-8")).hexdigest()[:12]
+
+
+class RelevanceMemo:
+    """Persistent store of past ContextInclusion verdicts.
+
+    Verdicts are keyed by the git blob SHA of the file, the change signature (see change_signature), whether the
+    file belongs to one of the changed resources and the fingerprint of the prompts. An unchanged file asked about
+    for the same kind of change gets the stored verdict instead of a new model call, once min_observations verdicts
+    agree. Until then (or when they disagree) the model keeps being asked and each answer is recorded. Editing the
+    file changes its blob SHA, so its old verdicts are never served again.
+    """
+
+    def __init__(self, path: str = None, min_observations: int = MIN_OBSERVATIONS):
+        """Initialize the memo, loading the stored verdicts from path if it exists.
+
+        Args:
+            path: JSON file the verdicts are persisted to (None keeps them in memory only)
+            min_observations: Number of agreeing verdicts needed before a decision is served locally
+        """
+        self.path = path
+        self.min_observations = min_observations
+        self._verdicts: dict[str, Verdict] = {}
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable relevance memo {path}: {str(e)}")
+                data = {}
+            if data.get("version") == MEMO_VERSION:
+                self._verdicts = {key: Verdict(**verdict) for key, verdict in data.get("verdicts", {}).items()}
+
+    @staticmethod
+    def make_key(blob_sha: str, signature: str, target: bool, fingerprint: str) -> str:
+        """Build the key of a verdict.
+
+        Args:
+            blob_sha: Git blob SHA of the file content
+            signature: Change signature as returned by change_signature
+            target: Whether the file belongs to one of the changed resources
+            fingerprint: Prompt fingerprint as returned by prompt_fingerprint
+
+        Returns:
+            str: The memo key
+        """
+        return f"{blob_sha}:{signature}:{'target' if target else 'context'}:{fingerprint}"
+
+    def lookup(self, key: str) -> Verdict | None:
+        """Return the stored verdict for a key if it is confident enough to be served, counting hits and misses."""
+        verdict = self._verdicts.get(key)
+        if verdict is not None and verdict.decision(self.min_observations) is not None:
+            self.hits += 1
+            return verdict
+        self.misses += 1
+        return None
+
+    def observations(self, key: str) -> int:
+        """Return the number of verdicts recorded for a key."""
+        verdict = self._verdicts.get(key)
+        return verdict.included + verdict.excluded if verdict is not None else 0
+
+    def record(self, key: str, inclusion: bool, reasoning: str):
+        """Record a verdict returned by the model.
+
+        Args:
+            key: Key as returned by make_key
+            inclusion: Whether the model judged the file relevant
+            reasoning: The model's reasoning
+        """
+        verdict = self._verdicts.setdefault(key, Verdict())
+        if inclusion:
+            verdict.included += 1
+        else:
+            verdict.excluded += 1
+        verdict.reasoning = reasoning
+
+    def save(self):
+        """Atomically write the verdicts to the memo file (no-op for an in-memory memo)."""
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".relevance_memo.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"version": MEMO_VERSION, "verdicts": {key: verdict.model_dump() for key, verdict in self._verdicts.items()}}, f)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
@@ -0,0 +1,113 @@
+from pydantic import BaseModel
+
+from ai_updater_hunks import Hunk, apply_hunks, compute_hunks
+
+
+class MergeConflict(BaseModel):
+    """A region of the base that several versions changed differently.
+    base_start: 0-based index of the first base line of the region.
+    base_lines: The lines of the base in the region (empty if the versions insert at the same place).
+    versions: The lines each version that changed the region puts in its place, in version order.
+    """
+    base_start: int
+    base_lines: list[str]
+    versions: list[list[str]]
+
+    @property
+    def base_end(self) -> int:
+        return self.base_start + len(self.base_lines)
+
+
+class MergeResult(BaseModel):
+    """The three-way merge of several versions of a file edited from the same base.
+    base: The content every version was edited from.
+    hunks: The changes merged without conflict, in file order.
+    conflicts: The regions changed by several versions in incompatible ways, in file order.
+    """
+    base: str
+    hunks: list[Hunk]
+    conflicts: list[MergeConflict]
+
+    def content(self, resolutions: list[str] = None) -> str:
+        """Build the merged file.
+
+        Args:
+            resolutions: The content replacing each conflict region. Defaults to the first version of every conflict
+
+        Returns:
+            str: The base with every merged hunk and conflict resolution applied
+        """
+        hunks = list(self.hunks)
+        for index, conflict in enumerate(self.conflicts):
+            lines = resolutions[index].splitlines(keepends=True) if resolutions is not None else conflict.versions[0]
+            if lines and not lines[-1].endswith("\n"):
+                lines[-1] += "\n"
+            hunks.append(Hunk(original_start=conflict.base_start, original_lines=conflict.base_lines, updated_start=0, updated_lines=lines))
+        hunks.sort(key=lambda hunk: (hunk.original_start, hunk.original_end))
+        return apply_hunks(self.base, hunks)
+
+
+def _add_hunk(hunks: list[tuple[Hunk, int]], hunk: Hunk, version: int):
+    """Add the hunk of a version unless another version made the same change, keeping the longer of two insertions at
+    the same place when one contains the other (e.g. the same import added by two edits, one of them with more imports)."""
+    for position, (other, _) in enumerate(hunks):
+        if other.original_start != hunk.original_start or other.original_lines != hunk.original_lines:
+            continue
+        if other.updated_lines == hunk.updated_lines:
+            return
+        if not hunk.original_lines:
+            if "".join(hunk.updated_lines) in "".join(other.updated_lines):
+                return
+            if "".join(other.updated_lines) in "".join(hunk.updated_lines):
+                hunks[position] = (hunk, version)
+                return
+    hunks.append((hunk, version))
+
+
+def merge3(base: str, versions: list[str]) -> MergeResult:
+    """Three-way merge of several versions of a file that were edited concurrently from the same base.
+
+    The hunks of every version against the base are combined. Changes made identically by several versions are
+    applied once, and insertions of different versions at the same place are all kept, in version order. Only
+    hunks of different versions that replace overlapping lines of the base (or insert inside lines another version
+    replaces) are conflicts: each conflict covers the union of the overlapping hunks, with the content every
+    involved version puts in its place. Versions missing the final newline of the base get it back first.
+
+    Args:
+        base: The content every version was edited from
+        versions: The edited versions
+
+    Returns:
+        MergeResult: The merged hunks and the conflicts
+    """
+    tagged: list[tuple[Hunk, int]] = []
+    for version, content in enumerate(versions):
+        # A missing final newline would otherwise make every version change the last line of the file
+        if base.endswith("\n") and content and not content.endswith("\n"):
+            content += "\n"
+        for hunk in compute_hunks(base, content):
+            _add_hunk(tagged, hunk, version)
+    tagged.sort(key=lambda item: (item[0].original_start, item[0].original_end))
+
+    groups: list[list[tuple[Hunk, int]]] = []
+    for hunk, version in tagged:
+        if groups and hunk.original_start < max(other.original_end for other, _ in groups[-1]):
+            groups[-1].append((hunk, version))
+        else:
+            groups.append([(hunk, version)])
+
+    base_lines = base.splitlines(keepends=True)
+    hunks, conflicts = [], []
+    for group in groups:
+        if len({version for _, version in group}) == 1:
+            hunks.extend(hunk for hunk, _ in group)
+            continue
+        start = group[0][0].original_start
+        end = max(hunk.original_end for hunk, _ in group)
+        region = "".join(base_lines[start:end])
+        conflict_versions = []
+        for version in sorted({version for _, version in group}):
+            shifted = [hunk.model_copy(update={"original_start": hunk.original_start - start}) for hunk, other in group if other == version]
+            conflict_versions.append(apply_hunks(region, shifted).splitlines(keepends=True))
+        conflicts.append(MergeConflict(base_start=start, base_lines=base_lines[start:end], versions=conflict_versions))
+    return MergeResult(base=base, hunks=hunks, conflicts=conflicts)
@@ -0,0 +1,241 @@
+import io
+import os
+import re
+import ast
+import tokenize
+
+from pydantic import BaseModel
+
+from ai_updater_utils import estimate_tokens
+from ai_updater_validation import LANGUAGE_BY_EXTENSION
+
+# Maximum length of the first sentence kept from an abbreviated docstring or doc comment
+SUMMARY_LENGTH = 120
+BLANK_LINES_PATTERN = re.compile(r"\n{2,}")
+SENTENCE_END_PATTERN = re.compile(r"(?<=[.!?])\s")
+LICENSE_PATTERN = re.compile(r"copyright|license", re.IGNORECASE)
+# Characters and keywords after which a / in typescript starts a regex literal rather than a division
+REGEX_PRECEDING_CHARS = "(,=:[!&|?{};+-*%<>~^"
+REGEX_PRECEDING_KEYWORDS = {"return", "typeof", "instanceof", "in", "of", "case", "throw", "delete", "void", "yield", "await"}
+# Fraction of the code lines of a typescript, C++ or dart file that minification must keep. Below it the comment
+# scanner went out of sync with the code (e.g. a comment marker inside a literal it doesn't recognize) and the original
+# content is used instead
+MIN_KEPT_CODE_LINES = 0.9
+COMMENT_LINE_PATTERN = re.compile(r"^\s*(//|/\*|\*)")
+
+
+class MinifiedFile(BaseModel):
+    """A context file after minification.
+    content: The minified content.
+    original_tokens: Estimated tokens of the original content.
+    minified_tokens: Estimated tokens of the minified content.
+    """
+    content: str
+    original_tokens: int
+    minified_tokens: int
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.minified_tokens
+
+
+def _summary(text: str) -> str:
+    """Return the first sentence of a docstring or comment, shortened to SUMMARY_LENGTH characters."""
+    text = " ".join(text.split())
+    text = SENTENCE_END_PATTERN.split(text, maxsplit=1)[0]
+    if len(text) > SUMMARY_LENGTH:
+        text = text[:SUMMARY_LENGTH - 3].rstrip() + "..."
+    return text
+
+
+def _minify_python(content: str) -> str | None:
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return None
+    lines = content.splitlines(keepends=True)
+
+    # Docstrings are abbreviated to their first sentence
+    replacements = {}
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)) or not node.body:
+            continue
+        first = node.body[0]
+        if isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant) and isinstance(first.value.value, str):
+            if not isinstance(node, ast.Module) and first.lineno == node.lineno:
+                continue
+            line = lines[first.lineno - 1]
+            indent = line[:len(line) - len(line.lstrip())]
+            summary = _summary(first.value.value).replace("\\", "\\\\").replace('"""', '\\"\\"\\"') or "..."
+            replacements[first.lineno - 1] = (first.end_lineno, f'{indent}"""{summary}"""\n')
+
+    # Comments are dropped (comment-only lines entirely)
+    comments = {}
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(content).readline):
+            if token.type == tokenize.COMMENT:
+                comments[token.start[0] - 1] = token.start[1]
+    except (tokenize.TokenError, IndentationError):
+        return None
+
+    result = []
+    index = 0
+    while index < len(lines):
+        if index in replacements:
+            end, replacement = replacements[index]
+            result.append(replacement)
+            index = end
+            continue
+        line = lines[index]
+        if index in comments:
+            code = line[:comments[index]].rstrip()
+            line = code + "\n" if code else ""
+        result.append(line)
+        index += 1
+    return "".join(result)
+
+
+def _minify_c_like(content: str, language: str) -> str | None:
+    """Drop comments from typescript, C++ and dart code, abbreviating doc comments (/** */ and ///) to their first
+    sentence. String literals (and typescript regex literals) are skipped so that comment markers inside them are left
+    alone. Returns None when the result lost more code lines than MIN_KEPT_CODE_LINES allows."""
+    result = []
+    pos = 0
+    length = len(content)
+    while pos < length:
+        char = content[pos]
+        two = content[pos:pos + 2]
+        if two == "//":
+            end = content.find("\n", pos)
+            end = length if end == -1 else end
+            if content.startswith("///", pos):
+                # Keep only the first line of a run of /// doc comments
+                previous = content.rfind("\n", 0, pos)
+                previous_line = content[content.rfind("\n", 0, previous) + 1:previous].strip() if previous != -1 else ""
+                if not previous_line.startswith("///"):
+                    summary = _summary(content[pos + 3:end])
+                    if summary:
+                        result.append(f"/// {summary}")
+            pos = end
+            continue
+        if two == "/*":
+            end = content.find("*/", pos + 2)
+            end = length if end == -1 else end + 2
+            is_license_header = not content[:pos].strip() and LICENSE_PATTERN.search(content[pos:end])
+            if content.startswith("/**", pos) and not content.startswith("/**/", pos) and not is_license_header:
+                summary = _summary(re.sub(r"^\s*\*+", "", content[pos + 3:end - 2], flags=re.MULTILINE))
+                if summary:
+                    result.append(f"/** {summary} */")
+            pos = end
+            continue
+        if char in "\"'`":
+            end = _skip_string(content, pos, language)
+            result.append(content[pos:end])
+            pos = end
+            continue
+        if char == "/" and language == "typescript" and _starts_regex("".join(result[-16:])):
+            end = _skip_regex(content, pos)
+            if end is not None:
+                result.append(content[pos:end])
+                pos = end
+                continue
+        result.append(char)
+        pos += 1
+    minified = "".join(result)
+    if _code_lines(minified) < MIN_KEPT_CODE_LINES * _code_lines(content):
+        return None
+    return minified
+
+
+def _code_lines(content: str) -> int:
+    """Return the number of non-blank lines that don't start with a comment marker."""
+    return sum(1 for line in content.splitlines() if line.strip() and not COMMENT_LINE_PATTERN.match(line))
+
+
+def _starts_regex(preceding: str) -> bool:
+    """Return whether a / following the given (comment-free) code starts a regex literal: it does after an operator,
+    an opening bracket, a separator or a keyword like return, and at the start of the file."""
+    preceding = preceding.rstrip()
+    if not preceding or preceding[-1] in REGEX_PRECEDING_CHARS:
+        return True
+    word = re.search(r"[\w$]+$", preceding)
+    return word is not None and word.group() in REGEX_PRECEDING_KEYWORDS
+
+
+def _skip_regex(content: str, pos: int) -> int | None:
+    """Return the position right after the regex literal (and its flags) starting at pos, or None if the line ends
+    before the literal does."""
+    in_class = False
+    pos += 1
+    while pos < len(content):
+        char = content[pos]
+        if char == "\n":
+            return None
+        if char == "\\":
+            pos += 2
+            continue
+        if char == "[":
+            in_class = True
+        elif char == "]":
+            in_class = False
+        elif char == "/" and not in_class:
+            pos += 1
+            while pos < len(content) and content[pos].isalpha():
+                pos += 1
+            return pos
+        pos += 1
+    return None
+
+
+def _skip_string(content: str, pos: int, language: str) -> int:
+    """Return the position right after the string literal starting at pos."""
+    char = content[pos]
+    if language == "cpp" and char == '"' and content[max(0, pos - 1):pos] == "R":
+        open_paren = content.find("(", pos)
+        if open_paren != -1:
+            terminator = ")" + content[pos + 1:open_paren] + '"'
+            end = content.find(terminator, open_paren)
+            if end != -1:
+                return end + len(terminator)
+    quote = char * 3 if language == "dart" and content.startswith(char * 3, pos) else char
+    raw = language == "dart" and content[max(0, pos - 1):pos] == "r"
+    multiline = quote == "`" or len(quote) == 3
+    pos += len(quote)
+    while pos < len(content):
+        if content[pos] == "\\" and not raw:
+            pos += 2
+            continue
+        if content.startswith(quote, pos):
+            return pos + len(quote)
+        if content[pos] == "\n" and not multiline:
+            return pos
+        pos += 1
+    return pos
+
+
+def minify(file_path: str, content: str) -> MinifiedFile:
+    """Minify a reference-only context file: comments and license headers are dropped, docstrings and doc comments are
+    abbreviated to their first sentence, trailing whitespace and blank lines are removed. Code is left untouched.
+
+    Files in unsupported languages, python files that can't be parsed, and files whose minification would drop code
+    lines (see MIN_KEPT_CODE_LINES) are returned as they are.
+
+    Args:
+        file_path: Path of the file (used to determine the language)
+        content: Content of the file
+
+    Returns:
+        MinifiedFile: The minified content with the token estimates before and after
+    """
+    language = LANGUAGE_BY_EXTENSION.get(os.path.splitext(file_path)[1])
+    minified = None
+    if language == "python":
+        minified = _minify_python(content)
+    elif language is not None:
+        minified = _minify_c_like(content, language)
+    if minified is None:
+        minified = content
+    else:
+        minified = "\n".join(line.rstrip() for line in minified.splitlines())
+        minified = BLANK_LINES_PATTERN.sub("\n", minified).strip("\n") + "\n"
+    return MinifiedFile(content=minified, original_tokens=estimate_tokens(content), minified_tokens=estimate_tokens(minified))
@@ -0,0 +1,658 @@
+import re
+import subprocess
+
+from pydantic import BaseModel
+
+from ai_updater_changes import ChangeModel
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<string>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+  | (?P<number>[-+]?(?:0[xX][0-9a-fA-F]+|\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?|inf|nan)(?![\w.]))
+  | (?P<ident>\.?[A-Za-z_][\w]*(?:\.[A-Za-z_][\w]*)*)
+  | (?P<symbol>[{}\[\]()<>;,=:/-])
+  | (?P<space>\s+)
+""", re.VERBOSE | re.DOTALL)
+# Integer literals of the proto grammar: decimal, octal (leading 0) and hexadecimal (0x), with an optional sign
+INT_PATTERN = re.compile(r"([-+]?)(?:0[xX]([0-9a-fA-F]+)|(0[0-7]*)|([1-9]\d*))")
+# Directories of an API checkout that hold vendored third party protos rather than the API itself
+THIRD_PARTY_PREFIXES = ("google/", "third_party/", "vendor/", "node_modules/")
+
+
+class ProtoParseError(Exception):
+    """Raised when a .proto file can't be parsed."""
+
+
+def parse_int(token: str) -> int:
+    """Convert an integer literal of the proto grammar (e.g. 10, 010 or 0x0A) to an int.
+
+    Raises:
+        ProtoParseError: If the token is not an integer literal
+    """
+    match = INT_PATTERN.fullmatch(token)
+    if match is None:
+        raise ProtoParseError(f"Expected an integer, found {token!r}")
+    sign, hexadecimal, octal, decimal = match.groups()
+    value = int(hexadecimal, 16) if hexadecimal else int(octal, 8) if octal else int(decimal)
+    return -value if sign == "-" else value
+
+
+class ProtoField(BaseModel):
+    """A field of a message.
+    name: Name of the field.
+    type: Type of the field as written (map<string, Value> for maps).
+    number: Field number.
+    label: repeated, optional, or an empty string.
+    oneof: Name of the oneof the field belongs to, if any.
+    options: Field options (e.g. deprecated), as written.
+    comment: Leading comment of the field.
+    """
+    name: str
+    type: str
+    number: int
+    label: str = ""
+    oneof: str = ""
+    options: dict[str, str] = {}
+    comment: str = ""
+
+
+class ProtoMessage(BaseModel):
+    """A message, keyed in the schema by its fully qualified name.
+    fields: Fields by name.
+    options: Message options.
+    comment: Leading comment of the message.
+    """
+    fields: dict[str, ProtoField] = {}
+    options: dict[str, str] = {}
+    comment: str = ""
+
+
+class ProtoEnum(BaseModel):
+    """An enum, keyed in the schema by its fully qualified name.
+    values: Value numbers by name.
+    options: Enum options.
+    comment: Leading comment of the enum.
+    """
+    values: dict[str, int] = {}
+    options: dict[str, str] = {}
+    comment: str = ""
+
+
+class ProtoRpc(BaseModel):
+    """A method of a service.
+    request: Request message type as written.
+    response: Response message type as written.
+    client_streaming: Whether the request is a stream.
+    server_streaming: Whether the response is a stream.
+    options: Method options (e.g. (google.api.http)), as written.
+    comment: Leading comment of the method.
+    """
+    request: str
+    response: str
+    client_streaming: bool = False
+    server_streaming: bool = False
+    options: dict[str, str] = {}
+    comment: str = ""
+
+    def signature(self) -> str:
+        request = ("stream " if self.client_streaming else "") + self.request
+        response = ("stream " if self.server_streaming else "") + self.response
+        return f"({request}) returns ({response})"
+
+
+class ProtoService(BaseModel):
+    """A service, keyed in the schema by its fully qualified name.
+    package: Proto package of the service.
+    rpcs: Methods by name.
+    options: Service options.
+    comment: Leading comment of the service.
+    """
+    package: str
+    rpcs: dict[str, ProtoRpc] = {}
+    options: dict[str, str] = {}
+    comment: str = ""
+
+
+class ProtoSchema(BaseModel):
+    """Every definition of a set of .proto files, merged across files and keyed by fully qualified name.
+    packages: Packages declared by the files.
+    services: Services by fully qualified name.
+    messages: Messages (including nested ones) by fully qualified name.
+    enums: Enums (including nested ones) by fully qualified name.
+    """
+    packages: set[str] = set()
+    services: dict[str, ProtoService] = {}
+    messages: dict[str, ProtoMessage] = {}
+    enums: dict[str, ProtoEnum] = {}
+
+
+class _Parser:
+    """Recursive descent parser for proto2/proto3 files. Extensions and custom option definitions are skipped."""
+
+    def __init__(self, content: str, schema: ProtoSchema):
+        self.tokens: list[tuple[str, str]] = []
+        self.comments: list[str] = []
+        comment = []
+        position = 0
+        # Comments on the line of the previous token are trailing comments of that token, not leading comments
+        same_line = False
+        while position < len(content):
+            match = TOKEN_PATTERN.match(content, position)
+            if not match:
+                raise ProtoParseError(f"Unexpected character {content[position]!r} at offset {position}")
+            position = match.end()
+            kind = match.lastgroup
+            if kind == "comment":
+                if not (same_line and self.tokens):
+                    comment.append(_comment_text(match.group()))
+                same_line = same_line and "\n" not in match.group()
+            elif kind == "space":
+                if match.group().count("\n") > 1:
+                    comment = []
+                if "\n" in match.group():
+                    same_line = False
+            else:
+                self.tokens.append((kind, match.group()))
+                self.comments.append("\n".join(comment))
+                comment = []
+                same_line = True
+        self.position = 0
+        self.schema = schema
+        self.package = ""
+
+    def peek(self, offset: int = 0) -> str:
+        index = self.position + offset
+        return self.tokens[index][1] if index < len(self.tokens) else ""
+
+    def next(self) -> str:
+        if self.position >= len(self.tokens):
+            raise ProtoParseError("Unexpected end of file")
+        value = self.tokens[self.position][1]
+        self.position += 1
+        return value
+
+    def expect(self, value: str):
+        token = self.next()
+        if token != value:
+            raise ProtoParseError(f"Expected {value!r}, found {token!r}")
+
+    def comment(self) -> str:
+        return self.comments[self.position] if self.position < len(self.comments) else ""
+
+    def skip_statement(self):
+        """Skip a statement up to its semicolon, or a block up to its closing brace."""
+        depth = 0
+        while True:
+            token = self.next()
+            if token == "{":
+                depth += 1
+            elif token == "}":
+                depth -= 1
+                if depth == 0:
+                    return
+            elif token == ";" and depth == 0:
+                return
+
+    def peek_kind(self) -> str:
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else ""
+
+    def parse_option_value(self) -> str:
+        """Parse an option value: a constant or an aggregate {...} value, returned as written. Adjacent string literals
+        ("a" "b") are concatenated into a single double quoted literal."""
+        if self.peek_kind() == "string":
+            parts = []
+            while self.peek_kind() == "string":
+                parts.append(self.next())
+            return parts[0] if len(parts) == 1 else '"' + "".join(part[1:-1] for part in parts) + '"'
+        if self.peek() != "{":
+            return self.next()
+        parts = []
+        depth = 0
+        while True:
+            token = self.next()
+            parts.append(token)
+            if token == "{":
+                depth += 1
+            elif token == "}":
+                depth -= 1
+                if depth == 0:
+                    return " ".join(parts)
+
+    def parse_option_name(self) -> str:
+        parts = []
+        while self.peek() not in ("=", ""):
+            parts.append(self.next())
+        return "".join(parts)
+
+    def parse_option(self, options: dict[str, str]):
+        self.expect("option")
+        name = self.parse_option_name()
+        self.expect("=")
+        options[name] = self.parse_option_value()
+        self.expect(";")
+
+    def parse_field_options(self) -> dict[str, str]:
+        options = {}
+        if self.peek() != "[":
+            return options
+        self.next()
+        while True:
+            name = self.parse_option_name()
+            self.expect("=")
+            options[name] = self.parse_option_value()
+            token = self.next()
+            if token == "]":
+                return options
+            if token != ",":
+                raise ProtoParseError(f"Expected ',' or ']', found {token!r}")
+
+    def parse(self):
+        while self.position < len(self.tokens):
+            token = self.peek()
+            if token == "package":
+                self.next()
+                self.package = self.next()
+                self.expect(";")
+                self.schema.packages.add(self.package)
+            elif token == "option":
+                self.parse_option({})
+            elif token == "message":
+                self.parse_message(self.package)
+            elif token == "enum":
+                self.parse_enum(self.package)
+            elif token == "service":
+                self.parse_service()
+            elif token == ";":
+                self.next()
+            else:
+                # syntax, edition, import and extend statements don't define API elements
+                self.skip_statement()
+
+    def _qualify(self, scope: str, name: str) -> str:
+        return f"{scope}.{name}" if scope else name
+
+    def parse_message(self, scope: str):
+        comment = self.comment()
+        self.expect("message")
+        name = self._qualify(scope, self.next())
+        message = ProtoMessage(comment=comment)
+        self.schema.messages[name] = message
+        self.expect("{")
+        self.parse_message_body(message, name, oneof="")
+
+    def parse_message_body(self, message: ProtoMessage, name: str, oneof: str):
+        while True:
+            token = self.peek()
+            if token == "}":
+                self.next()
+                return
+            if token == "message":
+                self.parse_message(name)
+            elif token == "enum":
+                self.parse_enum(name)
+            elif token == "option":
+                self.parse_option(message.options)
+            elif token == "oneof":
+                self.next()
+                oneof_name = self.next()
+                self.expect("{")
+                self.parse_message_body(message, name, oneof=oneof_name)
+            elif token in ("reserved", "extensions", "extend"):
+                self.skip_statement()
+            elif token == ";":
+                self.next()
+            else:
+                self.parse_field(message, oneof)
+
+    def parse_field(self, message: ProtoMessage, oneof: str):
+        comment = self.comment()
+        label = ""
+        if self.peek() in ("repeated", "optional", "required"):
+            label = self.next()
+        if self.peek() == "map":
+            self.next()
+            self.expect("<")
+            key_type = self.next()
+            self.expect(",")
+            value_type = self.next()
+            self.expect(">")
+            field_type = f"map<{key_type}, {value_type}>"
+        elif self.peek() == "group":
+            self.skip_statement()
+            return
+        else:
+            field_type = self.next()
+        field_name = self.next()
+        self.expect("=")
+        number = self.next()
+        options = self.parse_field_options()
+        self.expect(";")
+        message.fields[field_name] = ProtoField(name=field_name, type=field_type, number=parse_int(number), label=label,
+                                                oneof=oneof, options=options, comment=comment)
+
+    def parse_enum(self, scope: str):
+        comment = self.comment()
+        self.expect("enum")
+        name = self._qualify(scope, self.next())
+        enum = ProtoEnum(comment=comment)
+        self.schema.enums[name] = enum
+        self.expect("{")
+        while True:
+            token = self.peek()
+            if token == "}":
+                self.next()
+                return
+            if token == "option":
+                self.parse_option(enum.options)
+            elif token == "reserved":
+                self.skip_statement()
+            elif token == ";":
+                self.next()
+            else:
+                value_name = self.next()
+                self.expect("=")
+                number = self.next()
+                self.parse_field_options()
+                self.expect(";")
+                enum.values[value_name] = parse_int(number)
+
+    def parse_service(self):
+        comment = self.comment()
+        self.expect("service")
+        name = self._qualify(self.package, self.next())
+        service = ProtoService(package=self.package, comment=comment)
+        self.schema.services[name] = service
+        self.expect("{")
+        while True:
+            token = self.peek()
+            if token == "}":
+                self.next()
+                return
+            if token == "option":
+                self.parse_option(service.options)
+            elif token == "rpc":
+                self.parse_rpc(service)
+            elif token == ";":
+                self.next()
+            else:
+                self.skip_statement()
+
+    def parse_rpc(self, service: ProtoService):
+        comment = self.comment()
+        self.expect("rpc")
+        name = self.next()
+        self.expect("(")
+        client_streaming = self.peek() == "stream" and self.peek(1) != ")"
+        if client_streaming:
+            self.next()
+        request = self.next()
+        self.expect(")")
+        self.expect("returns")
+        self.expect("(")
+        server_streaming = self.peek() == "stream" and self.peek(1) != ")"
+        if server_streaming:
+            self.next()
+        response = self.next()
+        self.expect(")")
+        rpc = ProtoRpc(request=request, response=response, client_streaming=client_streaming, server_streaming=server_streaming,
+                       comment=comment)
+        if self.peek() == "{":
+            self.next()
+            while self.peek() != "}":
+                if self.peek() == "option":
+                    self.parse_option(rpc.options)
+                elif self.peek() == ";":
+                    self.next()
+                else:
+                    self.skip_statement()
+            self.next()
+        else:
+            self.expect(";")
+        service.rpcs[name] = rpc
+
+
+def _comment_text(comment: str) -> str:
+    if comment.startswith("//"):
+        return comment[2:].strip()
+    lines = [line.strip().lstrip("*").strip() for line in comment[2:-2].splitlines()]
+    return "\n".join(line for line in lines if line)
+
+
+def parse_proto(content: str, schema: ProtoSchema = None) -> ProtoSchema:
+    """Parse a .proto file into a schema.
+
+    Args:
+        content: Content of the .proto file
+        schema: Schema to add the definitions to (a new one by default)
+
+    Returns:
+        ProtoSchema: The schema with the definitions of the file
+
+    Raises:
+        ProtoParseError: If the file can't be parsed
+    """
+    schema = schema if schema is not None else ProtoSchema()
+    _Parser(content, schema).parse()
+    return schema
+
+
+def load_schema(repo_root: str, revision: str) -> ProtoSchema:
+    """Parse every .proto file of a git repository at a revision, without checking it out.
+
+    Files under third party directories (see THIRD_PARTY_PREFIXES) are skipped, and files that fail to parse are
+    reported and skipped.
+
+    Args:
+        repo_root: Root directory of the git repository holding the .proto sources
+        revision: Git revision to load (e.g. HEAD~1)
+
+    Returns:
+        ProtoSchema: The merged schema of every file
+    """
+    listing = subprocess.check_output(["git", "ls-tree", "-r", "--name-only", revision], text=True, cwd=repo_root)
+    paths = [path for path in listing.splitlines() if path.endswith(".proto") and not path.startswith(THIRD_PARTY_PREFIXES)]
+    schema = ProtoSchema()
+    if not paths:
+        return schema
+    # Read every file with a single git process
+    batch = subprocess.run(["git", "cat-file", "--batch"], input="".join(f"{revision}:{path}\n" for path in paths).encode("utf-8"),
+                           capture_output=True, check=True, cwd=repo_root).stdout
+    position = 0
+    for path in paths:
+        header_end = batch.index(b"\n", position)
+        size = int(batch[position:header_end].split()[2])
+        content = batch[header_end + 1:header_end + 1 + size].decode("utf-8", errors="replace")
+        position = header_end + 1 + size + 1
+        try:
+            parse_proto(content, schema)
+        except ProtoParseError as e:
+            print(f"Skipping {path} at {revision}: {str(e)}")
+    return schema
+
+
+class ProtoChange(BaseModel):
+    """One semantic change between two schemas.
+    action: added, removed or changed.
+    kind: Kind of the element (package, service, rpc, message, field, enum, enum value).
+    name: Fully qualified name of the element (rpcs as package.Service/Method, fields as package.Message.field).
+    detail: What changed, for changed elements (e.g. type int32 -> int64).
+    """
+    action: str
+    kind: str
+    name: str
+    detail: str = ""
+
+    def describe(self) -> str:
+        return f"{self.action} {self.kind} {self.name}" + (f": {self.detail}" if self.detail else "")
+
+
+def _diff_options(old: dict[str, str], new: dict[str, str]) -> list[str]:
+    details = []
+    for name in sorted(old.keys() | new.keys()):
+        if old.get(name) != new.get(name):
+            details.append(f"option {name} {old.get(name, '(unset)')} -> {new.get(name, '(unset)')}")
+    return details
+
+
+def _diff_comment(old: str, new: str) -> list[str]:
+    return [f"comment changed to: {' '.join(new.split()) or '(none)'}"] if old != new else []
+
+
+def _short_name(name: str) -> str:
+    return name.rsplit(".", 1)[-1]
+
+
+class ProtoDiff(BaseModel):
+    """Semantic diff between the .proto sources of two revisions.
+    changes: The changes, grouped by kind of element.
+    packages: The packages declaring at least one changed element.
+    """
+    changes: list[ProtoChange] = []
+    packages: list[str] = []
+
+    def is_empty(self) -> bool:
+        return not self.changes
+
+    def describe(self) -> str:
+        """Render the diff as a compact text block for the prompts."""
+        if not self.changes:
+            return ""
+        lines = ["Semantic diff of the .proto sources (HEAD~1 -> HEAD):"]
+        lines += [f"- {change.describe()}" for change in self.changes]
+        return "\n".join(lines) + "\n"
+
+    def to_change_model(self) -> ChangeModel:
+        """Convert the diff to the language-neutral change model used by the pipeline.
+
+        Returns:
+            ChangeModel: The change model
+        """
+        services = sorted({change.name.split("/")[0] for change in self.changes if change.kind == "rpc"}
+                          | {change.name for change in self.changes if change.kind == "service"})
+        pick = lambda action, kind: sorted(change.name for change in self.changes if change.action == action and change.kind == kind)
+        return ChangeModel(
+            packages=self.packages,
+            services=services,
+            rpcs_added=pick("added", "rpc"),
+            rpcs_removed=pick("removed", "rpc"),
+            messages_added=sorted({_short_name(name) for name in pick("added", "message")}),
+            messages_removed=sorted({_short_name(name) for name in pick("removed", "message")}),
+            fields_added={change.name: change.detail.rsplit(" = ", 1)[0] for change in self.changes
+                          if change.action == "added" and change.kind == "field"},
+        )
+
+
+def diff_schemas(old: ProtoSchema, new: ProtoSchema) -> ProtoDiff:
+    """Compute the semantic diff between two schemas: packages, services, RPCs (signature, options, comments), messages
+    and their fields (type, number, label, oneof, options, comments), and enums and their values.
+
+    Args:
+        old: Schema at the old revision
+        new: Schema at the new revision
+
+    Returns:
+        ProtoDiff: The changes
+    """
+    changes = []
+    packages = set()
+
+    def package_of(name: str) -> str:
+        candidates = [package for package in old.packages | new.packages if name.startswith(package + ".")]
+        return max(candidates, key=len) if candidates else ""
+
+    def record(action: str, kind: str, name: str, detail: str = "", package: str = None):
+        changes.append(ProtoChange(action=action, kind=kind, name=name, detail=detail))
+        packages.add(package if package is not None else package_of(name.split("/")[0]))
+
+    for package in sorted(new.packages - old.packages):
+        record("added", "package", package, package=package)
+    for package in sorted(old.packages - new.packages):
+        record("removed", "package", package, package=package)
+
+    for name in sorted(old.services.keys() | new.services.keys()):
+        old_service, new_service = old.services.get(name), new.services.get(name)
+        if old_service is None or new_service is None:
+            service = new_service or old_service
+            record("added" if old_service is None else "removed", "service", name, package=service.package)
+            for rpc_name in service.rpcs:
+                record("added" if old_service is None else "removed", "rpc", f"{name}/{rpc_name}", package=service.package)
+            continue
+        details = _diff_options(old_service.options, new_service.options) + _diff_comment(old_service.comment, new_service.comment)
+        if details:
+            record("changed", "service", name, "; ".join(details), package=new_service.package)
+        for rpc_name in sorted(old_service.rpcs.keys() | new_service.rpcs.keys()):
+            old_rpc, new_rpc = old_service.rpcs.get(rpc_name), new_service.rpcs.get(rpc_name)
+            full_name = f"{name}/{rpc_name}"
+            if old_rpc is None:
+                record("added", "rpc", full_name, new_rpc.signature(), package=new_service.package)
+            elif new_rpc is None:
+                record("removed", "rpc", full_name, package=new_service.package)
+            else:
+                details = []
+                if old_rpc.signature() != new_rpc.signature():
+                    details.append(f"signature {old_rpc.signature()} -> {new_rpc.signature()}")
+                details += _diff_options(old_rpc.options, new_rpc.options) + _diff_comment(old_rpc.comment, new_rpc.comment)
+                if details:
+                    record("changed", "rpc", full_name, "; ".join(details), package=new_service.package)
+
+    for name in sorted(old.messages.keys() | new.messages.keys()):
+        old_message, new_message = old.messages.get(name), new.messages.get(name)
+        if old_message is None or new_message is None:
+            message = new_message or old_message
+            fields = ", ".join(f"{field.label + ' ' if field.label else ''}{field.type} {field.name} = {field.number}"
+                               for field in message.fields.values())
+            record("added" if old_message is None else "removed", "message", name, fields if old_message is None else "")
+            continue
+        details = _diff_options(old_message.options, new_message.options) + _diff_comment(old_message.comment, new_message.comment)
+        if details:
+            record("changed", "message", name, "; ".join(details))
+        for field_name in sorted(old_message.fields.keys() | new_message.fields.keys()):
+            old_field, new_field = old_message.fields.get(field_name), new_message.fields.get(field_name)
+            full_name = f"{name}.{field_name}"
+            if old_field is None:
+                label = new_field.label + " " if new_field.label else ""
+                record("added", "field", full_name, f"{label}{new_field.type} = {new_field.number}")
+            elif new_field is None:
+                record("removed", "field", full_name)
+            else:
+                details = []
+                for attribute in ("type", "number", "label", "oneof"):
+                    if getattr(old_field, attribute) != getattr(new_field, attribute):
+                        details.append(f"{attribute} {getattr(old_field, attribute) or '(none)'} -> {getattr(new_field, attribute) or '(none)'}")
+                details += _diff_options(old_field.options, new_field.options) + _diff_comment(old_field.comment, new_field.comment)
+                if details:
+                    record("changed", "field", full_name, "; ".join(details))
+
+    for name in sorted(old.enums.keys() | new.enums.keys()):
+        old_enum, new_enum = old.enums.get(name), new.enums.get(name)
+        if old_enum is None or new_enum is None:
+            record("added" if old_enum is None else "removed", "enum", name)
+            continue
+        details = _diff_options(old_enum.options, new_enum.options) + _diff_comment(old_enum.comment, new_enum.comment)
+        if details:
+            record("changed", "enum", name, "; ".join(details))
+        for value in sorted(old_enum.values.keys() | new_enum.values.keys()):
+            if value not in old_enum.values:
+                record("added", "enum value", f"{name}.{value}", f"= {new_enum.values[value]}")
+            elif value not in new_enum.values:
+                record("removed", "enum value", f"{name}.{value}")
+            elif old_enum.values[value] != new_enum.values[value]:
+                record("changed", "enum value", f"{name}.{value}", f"number {old_enum.values[value]} -> {new_enum.values[value]}")
+
+    return ProtoDiff(changes=changes, packages=sorted(package for package in packages if package))
+
+
+def semantic_diff(repo_root: str, old_revision: str = "HEAD~1", new_revision: str = "HEAD") -> tuple[ProtoDiff, ProtoSchema]:
+    """Load the .proto sources of a repository at two revisions and diff them.
+
+    Args:
+        repo_root: Root directory of the git repository holding the .proto sources
+        old_revision: The old revision
+        new_revision: The new revision
+
+    Returns:
+        tuple[ProtoDiff, ProtoSchema]: The semantic diff and the schema at the new revision
+    """
+    old = load_schema(repo_root, old_revision)
+    new = load_schema(repo_root, new_revision)
+    return diff_schemas(old, new), new
@@ -0,0 +1,196 @@
+import os
+import re
+import json
+import typing
+
+from pydantic import BaseModel
+
+# Keys the models use in place of the field names of the response schemas (e.g. the create_new_files of DIFFPARSER_P)
+FIELD_ALIASES = {
+    "create_new_files": "requires_creation",
+    "files": "files_to_update",
+    "file_paths_to_update": "files_to_update",
+    "instructions": "implementation_details",
+    "file_path": "filename",
+    "include": "inclusion",
+    "reason": "reasoning",
+}
+JSON_OBJECT_PATTERN = re.compile(r"\{.*\}", re.DOTALL)
+TRUE_WORDS = ("true", "yes", "1", "include", "included", "relevant")
+FALSE_WORDS = ("false", "no", "0", "exclude", "excluded", "irrelevant")
+
+
+class EntryRepair(BaseModel):
+    """The entries of a file list response (RequiredChanges or ChangePlan) after local repair.
+    paths: The file paths, normalized against the SDK.
+    texts: The instructions (or intents) of each file, empty where the response gave none.
+    creations: Whether each file needs to be created, from whether it exists.
+    notes: What was repaired, for the log.
+    """
+    paths: list[str] = []
+    texts: list[str] = []
+    creations: list[bool] = []
+    notes: list[str] = []
+
+    @property
+    def missing(self) -> list[int]:
+        """Indices of the entries without instructions, which can only be repaired by asking the model again."""
+        return [index for index, text in enumerate(self.texts) if not text.strip()]
+
+
+def _as_bool(value) -> bool | None:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return bool(value)
+    if isinstance(value, str):
+        word = value.strip().strip(".").lower()
+        if word in TRUE_WORDS:
+            return True
+        if word in FALSE_WORDS:
+            return False
+    return None
+
+
+def parse_structured(response, schema: type[BaseModel]) -> dict | None:
+    """Return the structured output of a response as a dict of the fields of a schema.
+
+    The output parsed by the SDK is used when there is one. Otherwise the text of the response is parsed leniently:
+    code fences and text around the JSON object are ignored, keys in FIELD_ALIASES are renamed, and a single value in
+    place of a list is wrapped in a list. Fields are not validated, see repair_entries and repair_inclusion.
+
+    Args:
+        response: The model response
+        schema: The response schema of the request
+
+    Returns:
+        dict | None: The fields of the output, or None if no JSON object could be found
+    """
+    if isinstance(response.parsed, BaseModel):
+        return response.parsed.model_dump()
+    match = JSON_OBJECT_PATTERN.search(response.text or "")
+    if match is None:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    fields = {}
+    for key, value in data.items():
+        key = FIELD_ALIASES.get(key, key)
+        if key not in schema.model_fields:
+            continue
+        if typing.get_origin(schema.model_fields[key].annotation) is list and not isinstance(value, list):
+            value = [value]
+        fields[key] = value
+    return fields
+
+
+def normalize_path(path: str, sdk_root_dir: str, known_files: set[str]) -> str:
+    """Normalize a file path written by the model to a path relative to the SDK root.
+
+    Quotes, backticks, leading ./ and the SDK root are stripped. A path that matches no known file but is the unique
+    suffix of one (e.g. viam/components/arm/arm.py for src/viam/components/arm/arm.py) is completed.
+
+    Args:
+        path: The path as written by the model
+        sdk_root_dir: Root directory of the SDK checkout
+        known_files: Paths of the files of the SDK, relative to its root
+
+    Returns:
+        str: The normalized path
+    """
+    path = str(path).strip().strip("`'\"").strip().replace("\\", "/")
+    if os.path.isabs(path) and os.path.abspath(path).startswith(os.path.abspath(sdk_root_dir) + os.sep):
+        path = os.path.relpath(path, sdk_root_dir)
+    while path.startswith("./"):
+        path = path[2:]
+    path = path.lstrip("/")
+    if path in known_files or os.path.exists(os.path.join(sdk_root_dir, path)):
+        return path
+    matches = [known for known in known_files if known.endswith("/" + path)]
+    return matches[0] if len(matches) == 1 else path
+
+
+def repair_entries(paths: list, texts: list, creations: list, sdk_root_dir: str, known_files: set[str],
+                   generated_dir: str = None, exists: typing.Callable[[str], bool] = None) -> EntryRepair:
+    """Repair the parallel lists of a file list response locally.
+
+    - the lists are aligned on the paths: texts beyond the last path can't be attributed and are dropped, paths
+      without a text get an empty one (see EntryRepair.missing)
+    - paths are normalized (see normalize_path), empty paths and files of the generated code are dropped
+    - duplicate entries (same path and text) are dropped, and so are entries without a text for a path that has one.
+      A path listed with different texts is kept once per text (independent changes, see AIUpdater.edit_file_jobs)
+    - whether a file needs to be created is inferred from whether it exists, whatever the response said
+
+    Args:
+        paths: The file paths of the response
+        texts: The instructions (or intents) of the response
+        creations: The creation flags of the response
+        sdk_root_dir: Root directory of the SDK checkout
+        known_files: Paths of the files of the SDK, relative to its root (see normalize_path)
+        generated_dir: Directory of the generated code, relative to the SDK root (see ai_updater_diff.DIFF_RULES)
+        exists: Whether a file (relative to the SDK root) exists. Defaults to checking the disk
+
+    Returns:
+        EntryRepair: The repaired entries
+    """
+    repair = EntryRepair()
+    if len(texts) > len(paths):
+        repair.notes.append(f"dropped {len(texts) - len(paths)} instructions without a file")
+    if len(texts) < len(paths):
+        repair.notes.append(f"{len(paths) - len(texts)} files had no instructions")
+    if len(creations) != len(paths):
+        repair.notes.append(f"{len(creations)} creation flags for {len(paths)} files")
+
+    exists = exists or (lambda path: os.path.exists(os.path.join(sdk_root_dir, path)))
+    entries: list[tuple[str, str, bool | None]] = []
+    for index, raw_path in enumerate(paths):
+        path = normalize_path(raw_path, sdk_root_dir, known_files) if raw_path is not None else ""
+        text = str(texts[index]).strip() if index < len(texts) and texts[index] is not None else ""
+        if not path:
+            repair.notes.append("dropped an entry without a file path")
+            continue
+        if path != str(raw_path):
+            repair.notes.append(f"normalized {raw_path!r} to {path}")
+        if generated_dir and path.startswith(generated_dir.rstrip("/") + "/"):
+            repair.notes.append(f"dropped {path} (generated code)")
+            continue
+        if any(path == other and text == other_text for other, other_text, _ in entries):
+            repair.notes.append(f"dropped a duplicate entry of {path}")
+            continue
+        entries.append((path, text, _as_bool(creations[index]) if index < len(creations) else None))
+
+    for path, text, creation in entries:
+        if not text and any(path == other and other_text for other, other_text, _ in entries):
+            repair.notes.append(f"dropped an entry of {path} without instructions")
+            continue
+        file_exists = exists(path)
+        if creation is not None and creation == file_exists:
+            repair.notes.append(f"{path} {'exists' if file_exists else 'does not exist'}, so it is {'edited' if file_exists else 'created'}")
+        repair.paths.append(path)
+        repair.texts.append(text)
+        repair.creations.append(not file_exists)
+    return repair
+
+
+def repair_inclusion(data: dict | None, file_path: str) -> dict | None:
+    """Repair a relevance verdict (ContextInclusion) locally.
+
+    The file name is always the one that was asked about, and a verdict given as text (e.g. "yes") is converted.
+
+    Args:
+        data: The fields of the verdict (see parse_structured)
+        file_path: The file the verdict was asked for
+
+    Returns:
+        dict | None: The fields of the repaired verdict, or None if it has no usable inclusion decision
+    """
+    if data is None:
+        return None
+    inclusion = _as_bool(data.get("inclusion"))
+    if inclusion is None:
+        return None
+    return {"filename": file_path, "inclusion": inclusion, "reasoning": str(data.get("reasoning") or "")}
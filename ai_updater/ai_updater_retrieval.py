@@ -0,0 +1,167 @@
+import re
+import math
+from collections import Counter
+
+from pydantic import BaseModel
+
+from ai_updater_changes import ChangeModel
+from ai_updater_index import SdkIndex
+
+WORD_PATTERN = re.compile(r"[A-Za-z][A-Za-z0-9_]*")
+# Splits camelCase/PascalCase words, keeping acronyms together (HTTPServer -> HTTP, Server)
+CAMEL_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z]|[0-9]|$)|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+# Identifiers of a diff that are distinctive enough to search for (CamelCase or snake_case)
+DIFF_IDENTIFIER_PATTERN = re.compile(r"\b(?:[A-Z][a-z0-9]+[A-Z]\w*|[a-z][a-z0-9]*_[a-z0-9_]+|[a-z]+[A-Z]\w*)\b")
+# Lines of the chunks of files without any indexed definition
+FALLBACK_CHUNK_LINES = 60
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def split_identifier(identifier: str) -> list[str]:
+    """Split an identifier into lowercase terms. The whole identifier (without underscores) is kept as an extra term
+    so that an exact match outranks matches of its parts.
+
+    Args:
+        identifier: A camelCase, PascalCase or snake_case identifier (e.g. GetKinematicsRequest, data_pipelines)
+
+    Returns:
+        list[str]: The terms, e.g. [getkinematicsrequest, get, kinematics, request]
+    """
+    parts = [part.lower() for word in identifier.split("_") for part in CAMEL_PATTERN.findall(word)]
+    whole = identifier.replace("_", "").lower()
+    return [whole] + parts if len(parts) > 1 else [whole]
+
+
+def tokenize(text: str) -> list[str]:
+    """Tokenize source code into identifier terms (see split_identifier)."""
+    return [term for word in WORD_PATTERN.findall(text) for term in split_identifier(word)]
+
+
+class Chunk(BaseModel):
+    """A function or class sized piece of an SDK file.
+    path: Path of the file relative to the SDK root.
+    name: Name of the definition the chunk starts with (<module> for the top of the file).
+    start_line: 1-based first line of the chunk.
+    end_line: 1-based last line of the chunk.
+    score: BM25 score of the chunk for the last query (0 until searched).
+    """
+    path: str
+    name: str
+    start_line: int
+    end_line: int
+    score: float = 0.0
+
+
+def split_chunks(file_path: str, content: str, index: SdkIndex) -> list[tuple[Chunk, str]]:
+    """Split a file at the definitions recorded in the SDK index.
+
+    Args:
+        file_path: Path of the file relative to the SDK root
+        content: Content of the file
+        index: The SDK index
+
+    Returns:
+        list[tuple[Chunk, str]]: Each chunk with its text
+    """
+    lines = content.splitlines()
+    entry = index.files.get(file_path)
+    starts = sorted({symbol.line: symbol.name for symbol in entry.symbols}.items()) if entry else []
+    if not starts:
+        starts = [(line, "<module>") for line in range(1, len(lines) + 1, FALLBACK_CHUNK_LINES)]
+    elif starts[0][0] > 1:
+        starts.insert(0, (1, "<module>"))
+    chunks = []
+    for i, (start, name) in enumerate(starts):
+        end = starts[i + 1][0] - 1 if i + 1 < len(starts) else len(lines)
+        if end >= start:
+            chunks.append((Chunk(path=file_path, name=name, start_line=start, end_line=end), "\n".join(lines[start - 1:end])))
+    return chunks
+
+
+class ChunkRetriever:
+    """Inverted index over the chunks of every indexed SDK and test file, ranked with Okapi BM25."""
+
+    def __init__(self, chunks: list[tuple[Chunk, str]]):
+        """Build the inverted index.
+
+        Args:
+            chunks: Chunks with their text, as returned by split_chunks
+        """
+        self.chunks = [chunk for chunk, _ in chunks]
+        self._postings: dict[str, list[tuple[int, int]]] = {}
+        self._lengths = []
+        for chunk_id, (_, text) in enumerate(chunks):
+            terms = tokenize(text)
+            self._lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                self._postings.setdefault(term, []).append((chunk_id, frequency))
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+
+    @classmethod
+    def from_index(cls, index: SdkIndex, read) -> "ChunkRetriever":
+        """Build the retriever over every file of an SDK index.
+
+        Args:
+            index: The SDK index
+            read: Function returning the content of a file from its path relative to the SDK root (raising on failure)
+
+        Returns:
+            ChunkRetriever: The retriever
+        """
+        chunks = []
+        for file_path in index.files:
+            try:
+                content = read(file_path)
+            except (OSError, UnicodeDecodeError):
+                continue
+            chunks += split_chunks(file_path, content, index)
+        return cls(chunks)
+
+    def search(self, terms: list[str], top_k: int = 10) -> list[Chunk]:
+        """Rank the chunks for a query.
+
+        Args:
+            terms: Query terms (see tokenize). Repeated terms are counted once
+            top_k: Number of chunks to return
+
+        Returns:
+            list[Chunk]: The best matching chunks, best first, with their score set
+        """
+        scores: dict[int, float] = {}
+        total = len(self.chunks)
+        for term in set(terms):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, frequency in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[chunk_id] / self._average_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:top_k]
+        return [self.chunks[chunk_id].model_copy(update={"score": score}) for chunk_id, score in ranked]
+
+
+def diff_query(git_diff_output: str, change_model: ChangeModel = None) -> list[str]:
+    """Build a query from the distinctive identifiers of a diff and the change model. Only identifiers that occur a
+    different number of times on the added and removed lines are used, so that a rewritten line listing every RPC of a
+    service only contributes the RPCs that actually changed.
+
+    Args:
+        git_diff_output: Diff of the generated proto code
+        change_model: The change model of the diff, if available
+
+    Returns:
+        list[str]: The query terms
+    """
+    added, removed = Counter(), Counter()
+    for line in git_diff_output.splitlines():
+        if line.startswith("+") and not line.startswith("+++"):
+            added.update(DIFF_IDENTIFIER_PATTERN.findall(line))
+        elif line.startswith("-") and not line.startswith("---"):
+            removed.update(DIFF_IDENTIFIER_PATTERN.findall(line))
+    identifiers = {identifier for identifier in added.keys() | removed.keys() if added[identifier] != removed[identifier]}
+    if change_model is not None:
+        identifiers.update(rpc.rsplit("/", 1)[-1] for rpc in change_model.rpcs_added + change_model.rpcs_removed)
+        identifiers.update(change_model.messages_added + change_model.messages_removed)
+    return [term for identifier in sorted(identifiers) for term in split_identifier(identifier)]
@@ -0,0 +1,89 @@
+import asyncio
+import hashlib
+import time
+
+
+class RequestBudget:
+    """Global concurrency and rate budget shared by every model call made in a process.
+
+    Used as an async context manager around each request so that several SDK pipelines running
+    concurrently cannot exceed the limits together.
+    """
+
+    def __init__(self, max_concurrency: int = 8, requests_per_minute: int = 0):
+        """Initialize the budget.
+
+        Args:
+            max_concurrency: Maximum number of model requests in flight at once.
+            requests_per_minute: Maximum number of requests started per minute (0 disables rate limiting).
+        """
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._lock = asyncio.Lock()
+        self._next_slot = 0.0
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        if self._interval:
+            async with self._lock:
+                now = time.monotonic()
+                wait = self._next_slot - now
+                self._next_slot = max(now, self._next_slot) + self._interval
+            if wait > 0:
+                await asyncio.sleep(wait)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._semaphore.release()
+
+
+class ResponseCache:
+    """In-memory cache of model responses keyed by the full request.
+
+    Identical requests (same model, contents and config) are only sent once per process, including
+    requests that are issued concurrently by different SDK pipelines while the first is still in flight.
+    """
+
+    def __init__(self):
+        self._entries: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, contents, config) -> str:
+        """Build a stable cache key for a request.
+
+        Args:
+            model: The name of the model the request is sent to.
+            contents: The request contents (a prompt string or a list of Content objects).
+            config: The GenerateContentConfig of the request.
+
+        Returns:
+            str: A hex digest identifying the request.
+        """
+        return hashlib.sha256(repr((model, contents, config)).encode("utf-8")).hexdigest()
+
+    async def get_or_create(self, key: str, factory):
+        """Return the cached response for key, awaiting factory() to create it on a miss.
+
+        Args:
+            key: Cache key as returned by make_key.
+            factory: Zero-argument coroutine function producing the response.
+
+        Returns:
+            The cached or newly created response.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            return await asyncio.shield(entry)
+        self.misses += 1
+        entry = asyncio.ensure_future(factory())
+        self._entries[key] = entry
+        try:
+            return await asyncio.shield(entry)
+        except Exception:
+            self._entries.pop(key, None)
+            raise
@@ -0,0 +1,261 @@
+import os
+import hashlib
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from pydantic import BaseModel
+
+from ai_updater_utils import estimate_tokens
+
+
+class FileEntry(BaseModel):
+    """A file held in the ContentStore.
+    path: Absolute path of the file.
+    text: Decoded content of the file.
+    blob_sha: Git blob SHA-1 of the content (identical to what `git hash-object` reports).
+    tokens: Estimated number of model tokens of the content.
+    mtime_ns: Modification time of the file when it was read.
+    size: Size of the file in bytes when it was read.
+    """
+    path: str
+    text: str
+    blob_sha: str
+    tokens: int
+    mtime_ns: int
+    size: int
+
+
+def git_blob_sha(data: bytes) -> str:
+    """Compute the git blob SHA-1 of raw file content.
+
+    Args:
+        data: Raw bytes of the file
+
+    Returns:
+        str: Hex digest matching `git hash-object`
+    """
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class ContentStore:
+    """Shared in-memory store of SDK file contents keyed by absolute path.
+
+    Each file is read, decoded, hashed and token-counted once per run. An entry is reloaded when the file's
+    mtime or size changes on disk.
+    """
+
+    def __init__(self):
+        self._entries: dict[str, FileEntry] = {}
+        self.disk_reads = 0
+        self.lookups = 0
+
+    def get(self, file_path: str) -> FileEntry:
+        """Return the entry for a file, reading it from disk only if it is new or has changed.
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            FileEntry: The cached file entry
+
+        Raises:
+            OSError: If the file can't be read
+            UnicodeDecodeError: If the file is not valid UTF-8
+        """
+        file_path = os.path.abspath(file_path)
+        self.lookups += 1
+        stat = os.stat(file_path)
+        entry = self._entries.get(file_path)
+        if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+            return entry
+
+        with open(file_path, "rb") as f:
+            data = f.read()
+        self.disk_reads += 1
+        text = data.decode("utf-8")
+        entry = FileEntry(path=file_path, text=text, blob_sha=git_blob_sha(data), tokens=estimate_tokens(text),
+                          mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        self._entries[file_path] = entry
+        return entry
+
+    def summary(self) -> str:
+        """Describe the disk reads of the run, for the run log.
+
+        Returns:
+            str: The number of files read from disk and of the lookups they served
+        """
+        return (f"Content store: {self.disk_reads} disk reads for {len(self._entries)} files, "
+                f"{self.lookups - self.disk_reads} of {self.lookups} lookups served from memory.")
+
+    def read_text(self, file_path: str) -> str:
+        """Return the content of a file, raising if it can't be read.
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            str: Content of the file
+        """
+        return self.get(file_path).text
+
+    def read(self, file_path: str) -> str:
+        """Read and return the content of a file through the store.
+
+        Args:
+            file_path: Path to the file to read
+
+        Returns:
+            str: Content of the file or error message if reading fails
+        """
+        try:
+            return self.get(file_path).text
+        except Exception as e:
+            print(f"Error reading file: {str(e)}")
+            return f"Error reading file: {str(e)}"
+
+    def invalidate(self, file_path: str):
+        """Drop a file from the store so that the next access reads it from disk again.
+
+        Args:
+            file_path: Path to the file
+        """
+        self._entries.pop(os.path.abspath(file_path), None)
+
+
+class OverlayFS:
+    """In-memory overlay holding generated SDK files on top of a ContentStore.
+
+    Generated content is kept in memory until flush() so later stages (and later edits of the same file) see earlier
+    edits, and a run that fails half way through leaves the SDK untouched. Files are keyed by their absolute path
+    in the SDK and remember the destination they will be flushed to (the file itself in work mode, a copy under
+    ai_generated/ in test mode).
+    """
+
+    def __init__(self, store: ContentStore):
+        self.store = store
+        self._files: dict[str, tuple[str, str]] = {}
+
+    def write(self, file_path: str, content: str, destination: str = None):
+        """Stage generated content for a file.
+
+        Args:
+            file_path: Path of the file in the SDK
+            content: Generated content of the file
+            destination: Path the content will be flushed to. Defaults to the file's previous destination, or file_path
+        """
+        file_path = os.path.abspath(file_path)
+        if destination is None:
+            destination = self._files[file_path][1] if file_path in self._files else file_path
+        self._files[file_path] = (content, os.path.abspath(destination))
+
+    def read_text(self, file_path: str) -> str:
+        """Return the overlay content of a file, falling back to the store. Raises if the file can't be read.
+
+        Args:
+            file_path: Path of the file in the SDK
+
+        Returns:
+            str: Current content of the file
+        """
+        file_path = os.path.abspath(file_path)
+        if file_path in self._files:
+            return self._files[file_path][0]
+        return self.store.read_text(file_path)
+
+    def read(self, file_path: str) -> str:
+        """Return the overlay content of a file, falling back to the store.
+
+        Args:
+            file_path: Path of the file in the SDK
+
+        Returns:
+            str: Current content of the file or error message if reading fails
+        """
+        file_path = os.path.abspath(file_path)
+        if file_path in self._files:
+            return self._files[file_path][0]
+        return self.store.read(file_path)
+
+    def exists(self, file_path: str) -> bool:
+        """Whether a file exists either in the overlay or on disk."""
+        return os.path.abspath(file_path) in self._files or os.path.exists(file_path)
+
+    def destination(self, file_path: str) -> str:
+        """Return the path the staged content of a file will be flushed to."""
+        return self._files[os.path.abspath(file_path)][1]
+
+    def files(self) -> dict[str, str]:
+        """Return the staged files as a mapping of SDK path to generated content."""
+        return {file_path: content for file_path, (content, _) in self._files.items()}
+
+    def fork(self) -> "OverlayFS":
+        """Return a new overlay on the same store, starting from the files staged in this one.
+
+        Returns:
+            OverlayFS: The new overlay. Writes to it don't affect this overlay
+        """
+        overlay = OverlayFS(self.store)
+        overlay._files = dict(self._files)
+        return overlay
+
+    def discard(self, file_path: str):
+        """Drop the staged content of a file.
+
+        Args:
+            file_path: Path of the file in the SDK
+        """
+        self._files.pop(os.path.abspath(file_path), None)
+
+    def flush(self, max_workers: int = 8) -> list[str]:
+        """Atomically write every staged file to its destination.
+
+        All files are first written in parallel to temporary files next to their destinations. Only once every
+        temporary file was written successfully are they renamed over their destinations, so a failure leaves
+        every destination untouched.
+
+        Args:
+            max_workers: Number of threads used to write the temporary files
+
+        Returns:
+            list[str]: The destinations that were written
+        """
+        umask = os.umask(0)
+        os.umask(umask)
+
+        def stage(item: tuple[str, str]) -> str:
+            content, destination = item
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(destination), prefix=f".{os.path.basename(destination)}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(content)
+                    f.flush()
+                    os.fsync(f.fileno())
+                if os.path.exists(destination):
+                    shutil.copymode(destination, temp_path)
+                else:
+                    os.chmod(temp_path, 0o666 & ~umask)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+            return temp_path
+
+        items = list(self._files.values())
+        staged = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(stage, item) for item in items]
+            errors = []
+            for future in futures:
+                try:
+                    staged.append(future.result())
+                except Exception as e:
+                    errors.append(e)
+        if errors:
+            for temp_path in staged:
+                os.unlink(temp_path)
+            raise errors[0]
+
+        for temp_path, (_, destination) in zip(staged, items):
+            os.replace(temp_path, destination)
+        return [destination for _, destination in items]
@@ -0,0 +1,233 @@
+from google.genai import types
+from pydantic import BaseModel
+
+from ai_updater_changes import ChangeModel
+from ai_updater_hunks import IDENTIFIER_PATTERN, extract_anchors
+from ai_updater_utils import calculate_cost, estimate_tokens
+from ai_updater_windows import WindowPlan
+from prompts.applychanges_prompts import (GENERATECOMPLETEFILE_P, GENERATECOMPLETEFILE_S, GENERATEPATCH_P, GENERATEPATCH_S,
+                                          GENERATELINEEDITS_P, GENERATELINEEDITS_S, GENERATEWINDOW_P, GENERATEWINDOW_S)
+
+STRATEGIES = ["full", "patch", "line-range", "windowed"]
+# Model each strategy sends its requests to (see AIUpdater.generate_file, generate_patch, generate_line_edits and generate_windowed)
+STRATEGY_MODELS = {
+    "full": "gemini-2.5-flash-lite",
+    "patch": "gemini-2.5-flash",
+    "line-range": "gemini-2.5-flash",
+    "windowed": "gemini-2.5-flash-lite",
+}
+# Tokens of the fixed instructions (prompt template and system prompt) of each strategy
+PROMPT_TOKENS = {
+    "full": estimate_tokens(GENERATECOMPLETEFILE_P + GENERATECOMPLETEFILE_S),
+    "patch": estimate_tokens(GENERATEPATCH_P + GENERATEPATCH_S),
+    "line-range": estimate_tokens(GENERATELINEEDITS_P + GENERATELINEEDITS_S),
+    "windowed": estimate_tokens(GENERATEWINDOW_P + GENERATEWINDOW_S),
+}
+# Thinking tokens (billed as output) the thinking models spend per request
+THINKING_TOKENS = 1500
+# Output tokens of new code per token of implementation details
+EDIT_TOKENS_PER_INSTRUCTION_TOKEN = 2.5
+# Tokens of existing code a search block repeats around each edit site (and its replacement block once more)
+SEARCH_CONTEXT_TOKENS = 60
+# Tokens of existing code a line range replaces around each edit site
+LINE_RANGE_CONTEXT_TOKENS = 15
+# Tokens added per line by the line numbers of the line-range prompt
+LINE_NUMBER_TOKENS = 2
+# Output tokens from which regenerating a whole file is likely to drift or get cut off
+FULL_DRIFT_TOKENS = 40000
+# Anchors that occur more often than this in a file need extra context to make a search block unique
+AMBIGUOUS_ANCHOR_COUNT = 3
+# Failure risks are capped so that every strategy keeps a finite expected cost
+MAX_RISK = 0.9
+
+
+class StrategyEstimate(BaseModel):
+    """The predicted cost of editing a file with one strategy.
+    strategy: One of STRATEGIES.
+    input_tokens: Predicted prompt tokens.
+    output_tokens: Predicted output tokens (including thinking).
+    failure_risk: Predicted probability that the strategy fails and the file has to be regenerated.
+    cost: Predicted cost of the requests of the strategy when it succeeds, in dollars.
+    expected_cost: cost plus failure_risk times the cost of the regeneration, in dollars.
+    """
+    strategy: str
+    input_tokens: int
+    output_tokens: int
+    failure_risk: float
+    cost: float
+    expected_cost: float
+
+
+class EditCost(BaseModel):
+    """The actual cost of the requests made while editing a file.
+    cost: Cost in dollars (see calculate_cost).
+    output_tokens: Output tokens, including thinking.
+    requests: Number of requests sent (cached responses are not counted).
+    """
+    cost: float = 0.0
+    output_tokens: int = 0
+    requests: int = 0
+
+    def add(self, usage_metadata, cost: float):
+        self.cost += cost
+        self.output_tokens += (usage_metadata.candidates_token_count or 0) + (usage_metadata.thoughts_token_count or 0)
+        self.requests += 1
+
+    def merge(self, other: "EditCost"):
+        self.cost += other.cost
+        self.output_tokens += other.output_tokens
+        self.requests += other.requests
+
+
+def _request_cost(strategy: str, input_tokens: int, output_tokens: int) -> float:
+    usage = types.GenerateContentResponseUsageMetadata(prompt_token_count=input_tokens, candidates_token_count=output_tokens)
+    return calculate_cost(usage, STRATEGY_MODELS[strategy])
+
+
+def estimate_strategies(file_content: str, implementation_detail: str, change_model: ChangeModel = None,
+                        patch_candidates: int = 1, window_plan: WindowPlan = None) -> list[StrategyEstimate]:
+    """Predict the cost and failure risk of every edit strategy for an existing file.
+
+    The size of the edit is predicted from the implementation details, and the number of places it touches from the
+    anchors (identifiers named in the implementation details or the proto change) that already occur in the file:
+      - full regeneration reproduces the whole file, and drifts or gets cut off more often the longer the file is
+      - a search/replace patch repeats some context around every edit site, and fails more often when no anchor
+        locates the edit or when the anchors are too common in the file to make search blocks unique. Sampling several
+        candidates per request multiplies its output and only fails if every candidate fails
+      - a line-range edit only outputs the new lines, but its line numbers get harder to get right with every extra
+        edit site
+      - a windowed edit sends the skeleton and one window per request and reproduces only the windows, but an edit can
+        miss a part of the change that falls outside of the windows, more likely the more windows there are
+    Patches and line-range edits fall back to full regeneration when they fail, a failed full regeneration is
+    regenerated again by the syntax check.
+
+    Args:
+        file_content: Current content of the file
+        implementation_detail: The implementation instructions for the file
+        change_model: The change model of the proto change, if available
+        patch_candidates: Number of patch candidates sampled per request (see --patch-candidates)
+        window_plan: The windows of the file (see ai_updater_windows.plan_windows). Without it, windowed is not estimated
+
+    Returns:
+        list[StrategyEstimate]: One estimate per strategy, in STRATEGIES order
+    """
+    file_tokens = estimate_tokens(file_content)
+    instruction_tokens = estimate_tokens(implementation_detail)
+    edit_tokens = int(instruction_tokens * EDIT_TOKENS_PER_INSTRUCTION_TOKEN)
+    line_count = file_content.count("\n") + 1
+
+    anchors = extract_anchors(implementation_detail, change_model)
+    occurrences = {}
+    for identifier in IDENTIFIER_PATTERN.findall(file_content):
+        normalized = identifier.replace("_", "").lower()
+        if normalized in anchors:
+            occurrences[normalized] = occurrences.get(normalized, 0) + 1
+    edit_sites = max(1, len(occurrences))
+    ambiguous_anchors = sum(count > AMBIGUOUS_ANCHOR_COUNT for count in occurrences.values())
+
+    full_input = PROMPT_TOKENS["full"] + file_tokens + instruction_tokens
+    full_output = file_tokens + edit_tokens
+    full_risk = min(MAX_RISK, full_output / FULL_DRIFT_TOKENS)
+    full_cost = _request_cost("full", full_input, full_output)
+
+    patch_input = PROMPT_TOKENS["patch"] + file_tokens + instruction_tokens
+    patch_output = patch_candidates * (THINKING_TOKENS + edit_tokens + 2 * edit_sites * SEARCH_CONTEXT_TOKENS)
+    patch_risk = min(MAX_RISK, 0.1 + (0.3 if not occurrences else 0.0) + 0.05 * ambiguous_anchors) ** patch_candidates
+
+    line_range_input = PROMPT_TOKENS["line-range"] + file_tokens + line_count * LINE_NUMBER_TOKENS + instruction_tokens
+    line_range_output = THINKING_TOKENS + edit_tokens + edit_sites * LINE_RANGE_CONTEXT_TOKENS
+    line_range_risk = min(MAX_RISK, 0.15 + 0.05 * (edit_sites - 1))
+
+    candidates = [("full", full_input, full_output, full_risk),
+                  ("patch", patch_input, patch_output, patch_risk),
+                  ("line-range", line_range_input, line_range_output, line_range_risk)]
+    if window_plan is not None:
+        window_count = len(window_plan.windows)
+        window_tokens = file_tokens * window_plan.windowed_lines // max(1, window_plan.line_count)
+        skeleton_tokens = estimate_tokens(window_plan.skeleton)
+        windowed_input = window_count * (PROMPT_TOKENS["windowed"] + skeleton_tokens + instruction_tokens) + window_tokens
+        windowed_output = window_tokens + edit_tokens
+        windowed_risk = min(MAX_RISK, 0.15 + 0.05 * (window_count - 1))
+        candidates.append(("windowed", windowed_input, windowed_output, windowed_risk))
+
+    estimates = []
+    for strategy, input_tokens, output_tokens, risk in candidates:
+        cost = _request_cost(strategy, input_tokens, output_tokens)
+        estimates.append(StrategyEstimate(strategy=strategy, input_tokens=input_tokens, output_tokens=output_tokens,
+                                          failure_risk=round(risk, 3), cost=cost, expected_cost=cost + risk * full_cost))
+    return estimates
+
+
+def select_strategy(estimates: list[StrategyEstimate], forced: str = "auto") -> StrategyEstimate:
+    """Pick the strategy with the lowest expected cost.
+
+    Args:
+        estimates: Estimates as returned by estimate_strategies
+        forced: A strategy to use regardless of the estimates, or "auto". If it was not estimated (windowed for a file
+            without a window plan), full regeneration is used instead
+
+    Returns:
+        StrategyEstimate: The estimate of the selected strategy
+    """
+    if forced != "auto":
+        return next((estimate for estimate in estimates if estimate.strategy == forced),
+                    next(estimate for estimate in estimates if estimate.strategy == "full"))
+    return min(estimates, key=lambda estimate: estimate.expected_cost)
+
+
+class LineEdit(BaseModel):
+    """Model for a replacement of a range of lines of a file.
+    start_line: The 1-based number of the first line to replace.
+    end_line: The 1-based number of the last line to replace (inclusive). To insert lines without replacing any, set it to start_line - 1: the new lines are inserted before start_line.
+    replacement_text: The lines replacing the range.
+    """
+    start_line: int
+    end_line: int
+    replacement_text: str
+
+
+class LineEdits(BaseModel):
+    """Model for the line-range edits of a file.
+    edits: The edits, each against the line numbers of the original file.
+    """
+    edits: list[LineEdit]
+
+
+def number_lines(content: str) -> str:
+    """Prefix every line of a file with its 1-based line number, for the line-range prompt."""
+    lines = content.splitlines()
+    width = len(str(len(lines)))
+    return "\n".join(f"{number:>{width}}| {line}" for number, line in enumerate(lines, start=1))
+
+
+def apply_line_edits(content: str, edits: list[LineEdit]) -> str:
+    """Apply line-range edits to a file. Every edit refers to the line numbers of the original file.
+
+    Args:
+        content: Original content of the file
+        edits: The edits
+
+    Returns:
+        str: The edited content
+
+    Raises:
+        ValueError: If an edit is out of range or overlaps another edit
+    """
+    lines = content.splitlines(keepends=True)
+    if lines and not lines[-1].endswith("\n"):
+        lines[-1] += "\n"
+    ordered = sorted(edits, key=lambda edit: (edit.start_line, edit.end_line))
+    previous_end = 0
+    for edit in ordered:
+        if edit.start_line < 1 or edit.end_line < edit.start_line - 1 or edit.end_line > len(lines):
+            raise ValueError(f"Line range {edit.start_line}-{edit.end_line} is outside of the file (1-{len(lines)})")
+        if edit.start_line <= previous_end:
+            raise ValueError(f"Line range {edit.start_line}-{edit.end_line} overlaps a previous edit ending at line {previous_end}")
+        previous_end = max(previous_end, edit.end_line)
+    for edit in reversed(ordered):
+        replacement = edit.replacement_text.splitlines(keepends=True)
+        if replacement and not replacement[-1].endswith("\n"):
+            replacement[-1] += "\n"
+        lines[edit.start_line - 1:edit.end_line] = replacement
+    result = "".join(lines)
+    return result if content.endswith("\n") or not result else result[:-1]
@@ -0,0 +1,1238 @@
+import os
+import re
+import ast
+import builtins
+import functools
+
+from pydantic import BaseModel
+
+from ai_updater_changes import ChangeModel
+from ai_updater_topology import SdkTopology, normalize_name
+
+# Directory holding each kind of resource in the python SDK, and the file holding its mocks
+PYTHON_RESOURCE_DIRS = {"component": "components", "service": "services"}
+PYTHON_MOCK_FILES = {"component": "tests/mocks/components.py", "service": "tests/mocks/services.py"}
+PACKAGE_KIND_PATTERN = re.compile(r"^viam\.(component|service)\.([a-z0-9_]+)\.v\d+[a-z0-9]*$")
+MAX_IMPORT_LINE_LENGTH = 140
+IDENTIFIER_TOKEN_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+# Suffixes of the generated modules and the files of a resource (arm_pb2, arm_grpc, arm_pb, arm_connect, arm_client.hpp)
+RESOURCE_MODULE_SUFFIXES = ("_pb2", "_grpc", "_pb2_grpc", "_pb", "_connect", "_client", "_server")
+# Words before and after the class name of a resource in the names of its other classes and variables (MockArm, FakeArm,
+# myArm, ArmClient, ArmServer, ArmServiceStub)
+RESOURCE_CLASS_PREFIXES = ("Mock", "Test", "Fake", "my")
+RESOURCE_CLASS_SUFFIXES = ("Client", "RPCService", "Server", "Service")
+# Prefixes of the variables holding a resource in docstring examples and tests, and of the C++ mock factories (my_arm,
+# mock_arm, get_mock_arm)
+RESOURCE_VARIABLE_PREFIXES = ("my_", "mock_", "get_mock_")
+# Python types of the proto scalar types, for the parameters added for new request fields
+PYTHON_SCALAR_TYPES = {
+    "double": "float", "float": "float", "bool": "bool", "string": "str", "bytes": "bytes",
+    "int32": "int", "int64": "int", "uint32": "int", "uint64": "int", "sint32": "int", "sint64": "int",
+    "fixed32": "int", "fixed64": "int", "sfixed32": "int", "sfixed64": "int",
+}
+# Registration module of a new python resource, the same for every resource package of the SDK
+PYTHON_INIT_TEMPLATE = '''import {gen_module}
+from viam.resource.registry import Registry, ResourceRegistration
+
+from .client import {name}Client
+from .service import {name}RPCService
+from .{module} import {name}
+
+__all__ = ["{name}"]
+
+Registry.register_api(
+    ResourceRegistration(
+        {name}, {name}RPCService, lambda name, channel: {name}Client(name, channel)
+    )
+)
+'''
+# Docstring of the abstract class of a new python resource, in place of the docstring of the sibling it is cloned from
+PYTHON_RESOURCE_DOCSTRING = '''"""
+    {name} represents a {label} {kind}.
+
+    This acts as an abstract base class for any drivers representing specific
+    {label} implementations. This cannot be used on its own. If the ``__init__()`` function is
+    overridden, it must call the ``super().__init__()`` function.
+
+    ::
+
+        from viam.{resource_dir}.{module} import {name}
+    """
+'''
+# Language of the sources of the SDKs whose templates work on brace delimited declarations rather than on a python AST
+BRACE_LANGUAGES = {"typescript": "typescript", "cpp": "cpp", "flutter": "dart"}
+# Directory holding each kind of resource in those SDKs. C++ resources are headers in it, the others are directories
+BRACE_RESOURCE_DIRS = {
+    "typescript": {"component": "src/components", "service": "src/services"},
+    "cpp": {"component": "src/viam/sdk/components", "service": "src/viam/sdk/services"},
+    "flutter": {"component": "lib/src/components", "service": "lib/src/services"},
+}
+BRACE_RESOURCE_HEADERS = {"cpp": ".hpp"}
+# Files a new RPC is added to in those SDKs: (path, form of the member name, role). {dir} is the resource directory of
+# the kind, {kinds} its last segment and {name} the name of the resource. The member is camelCase (getKinematics), snake
+# (get_kinematics), the RPC name (GetKinematics) or the C++ test case name (test_get_kinematics)
+BRACE_NEW_RPC_FILES = {
+    "typescript": [
+        ("{dir}/{name}/{name}.ts", "camel", "resource"),
+        ("{dir}/{name}/client.ts", "camel", "resource"),
+        ("{dir}/{name}/{name}.spec.ts", "camel", "tests"),
+        ("{dir}/{name}/client.spec.ts", "camel", "tests"),
+    ],
+    "cpp": [
+        ("{dir}/{name}.hpp", "snake", "resource"),
+        ("{dir}/private/{name}_client.hpp", "snake", "resource"),
+        ("{dir}/private/{name}_client.cpp", "snake", "resource"),
+        ("{dir}/private/{name}_server.hpp", "rpc", "resource"),
+        ("{dir}/private/{name}_server.cpp", "rpc", "resource"),
+        ("src/viam/sdk/tests/mocks/mock_{name}.hpp", "snake", "mock"),
+        ("src/viam/sdk/tests/mocks/mock_{name}.cpp", "snake", "mock"),
+        ("src/viam/sdk/tests/test_{name}.cpp", "test", "tests"),
+    ],
+    "flutter": [
+        ("{dir}/{name}/{name}.dart", "camel", "resource"),
+        ("{dir}/{name}/client.dart", "camel", "resource"),
+        ("{dir}/{name}/service.dart", "camel", "resource"),
+        # The fake resource of the dart tests lives in the test file
+        ("test/unit_test/{kinds}/{name}_test.dart", "camel", "tests"),
+    ],
+}
+# Declarations whose body holds more declarations (class Arm {, namespace impl {, enum class holding_status {)
+DECLARATION_PATTERN = re.compile(r"^(?:(?:export|default|abstract|declare|final|base|sealed|interface|inline)\s+)*"
+                                 r"(class|struct|interface|enum|mixin|namespace|extension)\b\s*(?:class\s+|struct\s+)?"
+                                 r"(?:[A-Z][A-Z0-9]*_[A-Z0-9_]*\s+)?(\w+)?")
+# Tests and groups of tests named by their first argument (test('getKinematics', ...), describe('ArmClient', ...))
+TEST_CALL_PATTERN = re.compile(r"""^(test|testWidgets|it|group|describe)\s*\(\s*(['"])(.*?)\2""")
+TEST_GROUP_CALLS = {"group", "describe"}
+# C++ macros named by their argument (BOOST_AUTO_TEST_CASE(test_get_kinematics)), and those alone on their line
+MACRO_CALL_PATTERN = re.compile(r"^[A-Z][A-Z0-9_]*\s*\(\s*(\w+)\s*\)")
+MACRO_LINE_PATTERN = re.compile(r"[A-Z][A-Z0-9_]*\s*\([^()]*\)")
+ACCESS_LABEL_PATTERN = re.compile(r"(?:public|protected|private)\s*:(?!:)")
+ANNOTATION_PATTERN = re.compile(r"^(?:@\w+(?:\([^)]*\))?\s*|\[\[[^\]]*\]\]\s*)+")
+IMPORT_STATEMENT_PATTERN = re.compile(r"^(?:import\b|export\s*(?:\*|\{[^}]*\}\s*from)|part\b|library\b)")
+# Import statements, one per SDK language, and the named typescript imports
+TS_NAMED_IMPORT_PATTERN = re.compile(r"^import\s+(type\s+)?\{([^}]*)\}\s*from\s*(['\"])([^'\"]+)\3;?", re.MULTILINE)
+IMPORT_LINE_PATTERNS = {
+    "typescript": re.compile(r"^import\b[^;]*;[^\n]*\n", re.MULTILINE),
+    "cpp": re.compile(r"^#include\s*[<\"][^>\"\n]+[>\"][^\n]*\n", re.MULTILINE),
+    "dart": re.compile(r"^import\s+['\"][^'\"]+['\"][^;\n]*;[^\n]*\n", re.MULTILINE),
+}
+
+
+class ChangeShape(BaseModel):
+    """A recognized kind of proto change.
+    kind: One of new_rpc (new unary RPC on an existing resource), new_field (new optional field on the request message of
+        an RPC of an existing resource), new_component (package without an SDK implementation yet) or other.
+    package: The proto package of the change.
+    method: The name of the RPC for new_rpc changes, and of the RPC whose request gets the field for new_field changes.
+    rpcs: The RPCs of the new resource (package.Service/Method) for new_component changes.
+    field: The name of the new field for new_field changes.
+    field_type: The proto type of the new field for new_field changes.
+    """
+    kind: str
+    package: str
+    method: str = ""
+    rpcs: list[str] = []
+    field: str = ""
+    field_type: str = ""
+
+    def describe(self) -> str:
+        return f"{self.kind} {self.package}" + (f" {self.method}" if self.method else "") + (f".{self.field}" if self.field else "")
+
+
+class TemplateEdit(BaseModel):
+    """A file edit emitted by a template.
+    file_path: Path of the file relative to the SDK root.
+    content: The complete new content of the file.
+    summary: Short description of the edit.
+    """
+    file_path: str
+    content: str
+    summary: str
+
+
+class TemplateResult(BaseModel):
+    """Result of running the templates over a change.
+    edits: The edits emitted by the templates.
+    matched: Changes that were completely handled by templates.
+    unmatched: Changes (or the parts of them) that still need the AI pipeline.
+    """
+    edits: list[TemplateEdit] = []
+    matched: list[ChangeShape] = []
+    unmatched: list[ChangeShape] = []
+
+    def describe(self) -> str:
+        """Render the applied edits as a text block for the AI pipeline, so it only works on the remainder."""
+        if not self.edits:
+            return ""
+        lines = ["The following edits were already applied deterministically. The current content of these files already "
+                 "contains them, so they must not be implemented again:"]
+        lines += [f"- {edit.file_path}: {edit.summary}" for edit in self.edits]
+        return "\n".join(lines) + "\n"
+
+
+class SourceItem(BaseModel):
+    """A declaration or statement of a typescript, C++ or dart source, with the comments before it.
+    start: Start of the item in the source, at the start of its first line when nothing precedes it on that line.
+    end: End of the item, after the rest of its last line when only a comment follows it.
+    header: The code of the item before its first block, without comments.
+    body: Start and end of the contents of its first block ({...}), if any.
+    name: The name of the declared member, class or namespace, the title of a test, or None (imports, access labels).
+    test: Whether the item is a test or a group of tests, named by its title.
+    container: Whether its block holds declarations (classes, namespaces, groups of tests, main) rather than statements.
+    """
+    start: int
+    end: int
+    header: str
+    body: tuple[int, int] | None = None
+    name: str | None = None
+    test: bool = False
+    container: bool = False
+
+
+def camel_to_snake(name: str) -> str:
+    """Convert an RPC name to a python method name (GetKinematics -> get_kinematics)."""
+    name = re.sub(r"(.)([A-Z][a-z]+)", r"\1_\2", name)
+    return re.sub(r"([a-z0-9])([A-Z])", r"\1_\2", name).lower()
+
+
+def snake_to_pascal(name: str) -> str:
+    """Convert a resource directory name to its class name (movement_sensor -> MovementSensor)."""
+    return "".join(part.capitalize() for part in name.split("_"))
+
+
+def detect_change_shapes(change_model: ChangeModel, topology: SdkTopology) -> list[ChangeShape]:
+    """Classify the changes of a change model into recognized shapes.
+
+    Args:
+        change_model: The change model of the proto change
+        topology: The topology of the SDK being updated
+
+    Returns:
+        list[ChangeShape]: One shape per added RPC of an existing resource, one per new resource package, one per
+            optional field added to the request of an RPC of an existing resource (fields are only reported by the
+            semantic .proto diff, see --proto-repo), and one per changed package with other changes
+    """
+    shapes = []
+    for rpc in change_model.rpcs_added:
+        service, method = rpc.split("/")
+        package = service.rsplit(".", 1)[0]
+        if topology.resource_files(package):
+            shapes.append(ChangeShape(kind="new_rpc", package=package, method=method))
+            continue
+        shape = next((shape for shape in shapes if shape.kind == "new_component" and shape.package == package), None)
+        if shape is None:
+            shape = ChangeShape(kind="new_component", package=package)
+            shapes.append(shape)
+        shape.rpcs.append(rpc)
+
+    other_packages = set()
+    for field, declaration in change_model.fields_added.items():
+        package = max((package for package in change_model.packages if field.startswith(package + ".")), key=len, default="")
+        message, _, field_name = field[len(package) + 1:].rpartition(".")
+        label, _, field_type = declaration.partition(" ")
+        if package and label == "optional" and message.endswith("Request") and "." not in message and topology.resource_files(package):
+            shapes.append(ChangeShape(kind="new_field", package=package, method=message[:-len("Request")], field=field_name,
+                                      field_type=field_type))
+        else:
+            other_packages.add(package)
+    recognized = {shape.package for shape in shapes}
+    for package in change_model.packages:
+        if package not in recognized or package in other_packages:
+            shapes.append(ChangeShape(kind="other", package=package))
+    return shapes
+
+
+def _find_class(tree: ast.Module, predicate) -> ast.ClassDef | None:
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and predicate(node.name):
+            return node
+    return None
+
+
+def _find_method(class_node: ast.ClassDef, name: str):
+    for node in class_node.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == name:
+            return node
+    return None
+
+
+def _node_source(lines: list[str], node) -> str:
+    start = min([decorator.lineno for decorator in node.decorator_list] + [node.lineno])
+    return "".join(lines[start - 1:node.end_lineno])
+
+
+def _rename_token(token: str, old: str, new: str) -> str | None:
+    """Rename one identifier (or word of a string) naming the sibling resource, or return None if it doesn't.
+
+    Only the sibling's own names are renamed: the name itself (arm, Arm, ARM), its generated modules and files (arm_pb2,
+    arm_client), its classes (ArmClient, ArmRPCService, ArmServer, ArmServiceStub, MockArm, FakeArm, TestArm), its
+    variables (my_arm, myArm) and its constants (ARM_...). A name merely containing it as a segment (component_base and
+    ComponentBase for the base sibling) is left alone.
+    """
+    if token == old:
+        return new
+    if not token.startswith(old):
+        prefixes = RESOURCE_VARIABLE_PREFIXES if old.islower() else RESOURCE_CLASS_PREFIXES if not old.isupper() else ()
+        prefix = next((prefix for prefix in prefixes if token.startswith(prefix + old)), None)
+        if prefix is not None:
+            renamed = _rename_token(token[len(prefix):], old, new)
+            return prefix + renamed if renamed is not None else None
+    if not token.startswith(old):
+        return None
+    rest = token[len(old):]
+    if old.islower() and rest in RESOURCE_MODULE_SUFFIXES:
+        return new + rest
+    if old.isupper() and rest.startswith("_"):
+        return new + rest
+    if old[0].isupper() and not old.isupper() and (not rest or rest.startswith(RESOURCE_CLASS_SUFFIXES)):
+        return new + rest
+    return None
+
+
+def _rename(source: str, renames: dict[str, str]) -> str:
+    """Rename the sibling resource to the target in a source, see _rename_token."""
+    def rename(match):
+        token = match.group()
+        for old, new in renames.items():
+            renamed = _rename_token(token, old, new)
+            if renamed is not None:
+                return renamed
+        return token
+    return IDENTIFIER_TOKEN_PATTERN.sub(rename, source)
+
+
+def _module_name(file_path: str) -> str:
+    parts = file_path[:-len(".py")].split("/")
+    if parts[0] == "src":
+        parts = parts[1:]
+    return ".".join(parts)
+
+
+def _defined_names(tree: ast.Module) -> set[str]:
+    names = set(dir(builtins))
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+        elif isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            names.add(node.name)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            names.update(target.id for target in targets if isinstance(target, ast.Name))
+    return names
+
+
+def _imported_names(tree: ast.Module, module_name: str) -> dict[str, tuple[str, str, str]]:
+    """Map every name imported by a module to (module, name, asname), with relative imports made absolute."""
+    imported = {}
+    package = module_name.rsplit(".", 1)[0]
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imported[(alias.asname or alias.name).split(".")[0]] = ("", alias.name, alias.asname)
+        elif isinstance(node, ast.ImportFrom):
+            module = node.module or ""
+            if node.level:
+                base = package.rsplit(".", node.level - 1)[0] if node.level > 1 else package
+                module = f"{base}.{module}" if module else base
+            for alias in node.names:
+                imported[alias.asname or alias.name] = (module, alias.name, alias.asname)
+    return imported
+
+
+def _used_names(method_source: str) -> set[str]:
+    tree = ast.parse(method_source)
+    loaded, stored = set(), set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            (loaded if isinstance(node.ctx, ast.Load) else stored).add(node.id)
+        elif isinstance(node, ast.arg):
+            stored.add(node.arg)
+    return loaded - stored
+
+
+def _format_import_from(module: str, names: list[str], multiline: bool) -> str:
+    single_line = f"from {module} import {', '.join(names)}\n"
+    if not multiline and len(single_line) <= MAX_IMPORT_LINE_LENGTH:
+        return single_line
+    return f"from {module} import (\n" + "".join(f"    {name},\n" for name in names) + ")\n"
+
+
+def add_imports(source: str, imports: list[tuple[str, str, str]]) -> str:
+    """Add imports to a python module, extending an existing `from module import ...` statement when there is one.
+
+    Args:
+        source: Content of the module
+        imports: (module, name, asname) tuples as returned by _imported_names. An empty module means `import name`
+
+    Returns:
+        str: The module with the imports added
+    """
+    if not imports:
+        return source
+    tree = ast.parse(source)
+    lines = source.splitlines(keepends=True)
+    import_nodes = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    replacements = {}
+    new_lines = []
+    for module, name, asname in imports:
+        alias = f"{name} as {asname}" if asname else name
+        if not module:
+            new_lines.append(f"import {alias}\n")
+            continue
+        node = next((node for node in import_nodes if isinstance(node, ast.ImportFrom) and node.level == 0 and node.module == module), None)
+        if node is None:
+            new_lines.append(_format_import_from(module, [alias], multiline=False))
+            continue
+        names = replacements.get(node, [f"{a.name} as {a.asname}" if a.asname else a.name for a in node.names])
+        replacements[node] = names + [alias]
+
+    for node in sorted(replacements, key=lambda node: node.lineno, reverse=True):
+        multiline = "(" in "".join(lines[node.lineno - 1:node.end_lineno])
+        lines[node.lineno - 1:node.end_lineno] = [_format_import_from(node.module, replacements[node], multiline)]
+    if new_lines:
+        # Line numbers of the last import are unaffected by the rewrites above only if it was not rewritten itself,
+        # so locate it again in the rewritten source.
+        rewritten = "".join(lines)
+        rewritten_imports = [node for node in ast.parse(rewritten).body if isinstance(node, (ast.Import, ast.ImportFrom))]
+        insert_at = rewritten_imports[-1].end_lineno if rewritten_imports else 0
+        lines = rewritten.splitlines(keepends=True)
+        lines[insert_at:insert_at] = new_lines
+    return "".join(lines)
+
+
+def _clone_method(source_module: str, source_text: str, source_class, target_module: str, target_text: str, target_class,
+                  method: str, renames: dict[str, str]) -> str | None:
+    """Clone a method from a class of one module into a class of another, adding the imports it needs.
+
+    Returns:
+        str | None: The new content of the target module, or None if the method can't be cloned safely
+    """
+    source_tree = ast.parse(source_text)
+    target_tree = ast.parse(target_text)
+    source_class_node = _find_class(source_tree, source_class)
+    target_class_node = _find_class(target_tree, target_class)
+    if source_class_node is None or target_class_node is None:
+        return None
+    source_method = _find_method(source_class_node, method)
+    if source_method is None or _find_method(target_class_node, method) is not None:
+        return None
+
+    method_source = _rename(_node_source(source_text.splitlines(keepends=True), source_method), renames)
+    try:
+        used = _used_names("if True:\n" + method_source)
+    except SyntaxError:
+        return None
+    missing = sorted(used - _defined_names(target_tree))
+    source_imports = _imported_names(source_tree, source_module)
+    if any(name not in source_imports for name in missing):
+        return None
+
+    target_lines = target_text.splitlines(keepends=True)
+    insert_at = target_class_node.end_lineno
+    if not target_lines[insert_at - 1].endswith("\n"):
+        target_lines[insert_at - 1] += "\n"
+    target_lines[insert_at:insert_at] = ["\n", method_source if method_source.endswith("\n") else method_source + "\n"]
+    return add_imports("".join(target_lines), [source_imports[name] for name in missing])
+
+
+def _mock_attributes_available(mock_text: str, mock_class: str, method_source_class: str, source_mock_text: str, method: str) -> bool:
+    """Whether every self.<attribute> a mock method reads is also set up by the target mock class."""
+    source_class_node = _find_class(ast.parse(source_mock_text), lambda name: name == method_source_class)
+    target_class_node = _find_class(ast.parse(mock_text), lambda name: name == mock_class)
+    if source_class_node is None or target_class_node is None:
+        return False
+    source_method = _find_method(source_class_node, method)
+    if source_method is None:
+        return False
+
+    def self_attributes(node, context):
+        return {child.attr for child in ast.walk(node) if isinstance(child, ast.Attribute) and isinstance(child.ctx, context)
+                and isinstance(child.value, ast.Name) and child.value.id == "self"}
+
+    required = self_attributes(source_method, ast.Load) - self_attributes(source_method, ast.Store)
+    available = self_attributes(target_class_node, ast.Store) | {
+        node.name for node in target_class_node.body if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))}
+    return required <= available
+
+
+def _python_resource(shape: ChangeShape, sdk_root_dir: str) -> tuple[str, list[str], str | None] | None:
+    """Locate the python resource of a change.
+
+    Returns:
+        tuple[str, list[str], str | None] | None: The kind of resource, the resource directories of that kind and the
+            directory of the changed resource (None if it doesn't exist yet), or None if the package is not a resource
+    """
+    match = PACKAGE_KIND_PATTERN.match(shape.package)
+    if match is None:
+        return None
+    kind, package_name = match.groups()
+    resource_dir = os.path.join(sdk_root_dir, "src", "viam", PYTHON_RESOURCE_DIRS[kind])
+    if not os.path.isdir(resource_dir):
+        return None
+    directories = sorted(entry for entry in os.listdir(resource_dir) if os.path.isdir(os.path.join(resource_dir, entry)))
+    return kind, directories, next((entry for entry in directories if normalize_name(entry) == package_name), None)
+
+
+def _file_reader(sdk_root_dir: str, read):
+    def read_file(file_path):
+        try:
+            return read(os.path.join(sdk_root_dir, file_path))
+        except (OSError, UnicodeDecodeError):
+            return None
+    return read_file
+
+
+def _python_clone_tests(sibling: str, target: str, test_name: str, renames: dict[str, str], read_file) -> tuple[TemplateEdit | None, bool]:
+    """Clone a test from the test module of a sibling resource into the test module of the target, in every test class
+    of the sibling that has it (e.g. TestArm, TestService and TestClient into TestGripper, TestService and TestClient).
+
+    Returns:
+        tuple[TemplateEdit | None, bool]: The edit of the target test module (None if there is nothing to add) and
+            whether every test could be cloned
+    """
+    sibling_file, target_file = f"tests/test_{sibling}.py", f"tests/test_{target}.py"
+    sibling_text, target_text = read_file(sibling_file), read_file(target_file)
+    if sibling_text is None or target_text is None:
+        return None, False
+    classes = [node.name for node in ast.parse(sibling_text).body if isinstance(node, ast.ClassDef) and _find_method(node, test_name)]
+    content, cloned, complete = target_text, [], bool(classes)
+    for class_name in classes:
+        target_class = _rename(class_name, renames)
+        class_node = _find_class(ast.parse(content), lambda name: name == target_class)
+        if class_node is not None and _find_method(class_node, test_name) is not None:
+            continue
+        new_content = _clone_method(_module_name(sibling_file), sibling_text, lambda name, c=class_name: name == c,
+                                    _module_name(target_file), content, lambda name: name == target_class, test_name, renames)
+        if new_content is None:
+            complete = False
+            continue
+        content = new_content
+        cloned.append(target_class)
+    if not cloned:
+        return None, complete
+    classes_text = ", ".join(f"`{name}`" for name in cloned)
+    edit = TemplateEdit(file_path=target_file, content=content,
+                        summary=f"Added `{test_name}` to {classes_text} (cloned from {sibling_file})")
+    return edit, complete
+
+
+def _python_new_rpc(shape: ChangeShape, sdk_root_dir: str, read) -> tuple[list[TemplateEdit], bool] | None:
+    """Template for a new unary RPC on an existing python resource.
+
+    The implementation is cloned from a sibling resource of the same kind that already implements the same RPC (e.g. a
+    common RPC like GetKinematics), renaming the sibling to the target resource in the abstract class, client, RPC
+    service, mock (when the mock already has the state the method needs) and tests (into the test classes of the
+    target named like those of the sibling that test the method).
+
+    Returns:
+        tuple[list[TemplateEdit], bool] | None: The edits and whether the mock and the tests were included, or None if
+            the template doesn't apply
+    """
+    resource = _python_resource(shape, sdk_root_dir)
+    if resource is None or resource[2] is None:
+        return None
+    kind, directories, target = resource
+    snake_method = camel_to_snake(shape.method)
+    target_base = f"src/viam/{PYTHON_RESOURCE_DIRS[kind]}/{target}"
+    read_file = _file_reader(sdk_root_dir, read)
+
+    for sibling in directories:
+        if sibling == target:
+            continue
+        sibling_base = f"src/viam/{PYTHON_RESOURCE_DIRS[kind]}/{sibling}"
+        renames = {sibling: target, snake_to_pascal(sibling): snake_to_pascal(target), sibling.upper(): target.upper()}
+        # (file name, class predicate for the sibling, class predicate for the target, method name)
+        plan = [
+            (f"{sibling}.py", f"{target}.py", lambda name, s=sibling: name == snake_to_pascal(s),
+             lambda name: name == snake_to_pascal(target), snake_method),
+            ("client.py", "client.py", lambda name: name.endswith("Client"), lambda name: name.endswith("Client"), snake_method),
+            ("service.py", "service.py", lambda name: name.endswith("RPCService"), lambda name: name.endswith("RPCService"), shape.method),
+        ]
+        edits = []
+        for sibling_file, target_file, sibling_class, target_class, method in plan:
+            sibling_text = read_file(f"{sibling_base}/{sibling_file}")
+            target_text = read_file(f"{target_base}/{target_file}")
+            if sibling_text is None or target_text is None:
+                break
+            content = _clone_method(_module_name(f"{sibling_base}/{sibling_file}"), sibling_text, sibling_class,
+                                    _module_name(f"{target_base}/{target_file}"), target_text, target_class, method, renames)
+            if content is None:
+                break
+            edits.append(TemplateEdit(file_path=f"{target_base}/{target_file}", content=content,
+                                      summary=f"Added `{method}` (cloned from the {sibling} {kind})"))
+        else:
+            mock_included = False
+            mock_file = PYTHON_MOCK_FILES[kind]
+            mock_text = read_file(mock_file)
+            sibling_mock, target_mock = f"Mock{snake_to_pascal(sibling)}", f"Mock{snake_to_pascal(target)}"
+            if mock_text is not None and _mock_attributes_available(mock_text, target_mock, sibling_mock, mock_text, snake_method):
+                content = _clone_method(_module_name(mock_file), mock_text, lambda name: name == sibling_mock,
+                                        _module_name(mock_file), mock_text, lambda name: name == target_mock, snake_method, renames)
+                if content is not None:
+                    edits.append(TemplateEdit(file_path=mock_file, content=content,
+                                              summary=f"Added `{snake_method}` to `{target_mock}` (cloned from `{sibling_mock}`)"))
+                    mock_included = True
+            test_edit, tests_included = _python_clone_tests(sibling, target, f"test_{snake_method}", renames, read_file)
+            if test_edit is not None:
+                edits.append(test_edit)
+            return edits, mock_included and tests_included
+    return None
+
+
+def _insert_text(text: str, insertions: list[tuple[int, int, str]]) -> str:
+    """Insert snippets into a text at (1-based line, 0-based column) positions."""
+    lines = text.splitlines(keepends=True)
+    for lineno, column, snippet in sorted(insertions, reverse=True):
+        lines[lineno - 1] = lines[lineno - 1][:column] + snippet + lines[lineno - 1][column:]
+    return "".join(lines)
+
+
+def _insert_before(lines: list[str], node, snippet: str) -> tuple[int, int, str]:
+    """Insertion of a parameter or keyword argument right before another one, on its own line if that one is."""
+    line = lines[node.lineno - 1]
+    if not line[:node.col_offset].strip():
+        return node.lineno, 0, f"{line[:node.col_offset]}{snippet},\n"
+    return node.lineno, node.col_offset, f"{snippet}, "
+
+
+def _add_parameter(lines: list[str], function, name: str, parameter: str) -> tuple[int, int, str] | None:
+    """Insertion of a keyword-only parameter before the `extra` parameter of a method, or None if it has none."""
+    arguments = function.args.posonlyargs + function.args.args + function.args.kwonlyargs
+    extra = next((argument for argument in function.args.kwonlyargs if argument.arg == "extra"), None)
+    if extra is None or any(argument.arg == name for argument in arguments):
+        return None
+    return _insert_before(lines, extra, parameter)
+
+
+def _add_argument(lines: list[str], call: ast.Call, name: str, argument: str) -> tuple[int, int, str] | None:
+    """Insertion of a keyword argument into a call, before its `extra` argument if it has one, or None if it is
+    already passed."""
+    if any(keyword.arg == name for keyword in call.keywords):
+        return None
+    extra = next((keyword for keyword in call.keywords if keyword.arg == "extra"), None)
+    if extra is not None:
+        return _insert_before(lines, extra, argument)
+    existing = call.args + call.keywords
+    if existing:
+        last = max(existing, key=lambda node: (node.end_lineno, node.end_col_offset))
+        return last.end_lineno, last.end_col_offset, f", {argument}"
+    return call.end_lineno, call.end_col_offset - 1, argument
+
+
+def _python_new_field(shape: ChangeShape, sdk_root_dir: str, read) -> tuple[list[TemplateEdit], bool] | None:
+    """Template for a new optional scalar field on the request message of an RPC of an existing python resource.
+
+    The field becomes a keyword-only parameter (None by default) of the method in the abstract class and the client,
+    before its `extra` parameter. The client sets it on the request, and the RPC service passes it on to the resource,
+    as None when the field is unset. The docstrings, mock and tests are left to the AI pipeline, so the change is never
+    handled completely.
+
+    Returns:
+        tuple[list[TemplateEdit], bool] | None: The edits and False, or None if the template doesn't apply
+    """
+    python_type = PYTHON_SCALAR_TYPES.get(shape.field_type)
+    resource = _python_resource(shape, sdk_root_dir)
+    if python_type is None or resource is None or resource[2] is None:
+        return None
+    kind, _, target = resource
+    snake_method = camel_to_snake(shape.method)
+    target_base = f"src/viam/{PYTHON_RESOURCE_DIRS[kind]}/{target}"
+    read_file = _file_reader(sdk_root_dir, read)
+    field = shape.field
+
+    edits = []
+    for file_name, class_predicate, method in [(f"{target}.py", lambda name: name == snake_to_pascal(target), snake_method),
+                                               ("client.py", lambda name: name.endswith("Client"), snake_method),
+                                               ("service.py", lambda name: name.endswith("RPCService"), shape.method)]:
+        text = read_file(f"{target_base}/{file_name}")
+        if text is None:
+            return None
+        tree = ast.parse(text)
+        class_node = _find_class(tree, class_predicate)
+        function = _find_method(class_node, method) if class_node is not None else None
+        if function is None:
+            return None
+        lines = text.splitlines(keepends=True)
+        if file_name == "service.py":
+            # The resource is called with the fields of the request, e.g. await gripper.open(extra=struct_to_dict(request.extra), ...)
+            call = next((node for node in ast.walk(function) if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                         and node.func.attr == snake_method), None)
+            names = {node.id for node in ast.walk(function) if isinstance(node, ast.Name)}
+            if call is None or "request" not in names or field in names:
+                return None
+            statement = max((node for node in ast.walk(function) if isinstance(node, ast.stmt) and node is not function
+                             and node.lineno <= call.lineno and node.end_lineno >= call.end_lineno), key=lambda node: node.lineno)
+            indentation = lines[statement.lineno - 1][:statement.col_offset]
+            insertions = [(statement.lineno, 0, f'{indentation}{field} = request.{field} if request.HasField("{field}") else None\n'),
+                          _add_argument(lines, call, field, f"{field}={field}")]
+        else:
+            insertions = [_add_parameter(lines, function, field, f"{field}: Optional[{python_type}] = None")]
+            if file_name == "client.py":
+                call = next((node for node in ast.walk(function) if isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                             and node.func.id == f"{shape.method}Request"), None)
+                if call is None:
+                    return None
+                insertions.append(_add_argument(lines, call, field, f"{field}={field}"))
+        if None in insertions:
+            return None
+        content = _insert_text(text, insertions)
+        if file_name != "service.py" and "Optional" not in _defined_names(tree):
+            content = add_imports(content, [("typing", "Optional", None)])
+        edits.append(TemplateEdit(file_path=f"{target_base}/{file_name}", content=content,
+                                  summary=f"Passed the new optional `{field}` field of `{shape.method}Request` through `{method}`"))
+    return edits, False
+
+
+def _loaded_names(tree: ast.Module) -> set[str]:
+    """Names a module refers to outside of its imports, including names in string annotations and __all__."""
+    docstrings = {id(node.value) for node in ast.walk(tree) if isinstance(node, ast.Expr)}
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str) and id(node) not in docstrings:
+            names.update(re.findall(r"[A-Za-z_]\w*", node.value))
+    return names
+
+
+def _prune_imports(source: str) -> str:
+    """Drop the names of `from ... import` statements that a module doesn't use."""
+    tree = ast.parse(source)
+    used = _loaded_names(tree)
+    lines = source.splitlines(keepends=True)
+    for node in sorted((node for node in tree.body if isinstance(node, ast.ImportFrom)), key=lambda node: node.lineno, reverse=True):
+        kept = [f"{alias.name} as {alias.asname}" if alias.asname else alias.name for alias in node.names
+                if alias.name == "*" or (alias.asname or alias.name) in used]
+        if len(kept) == len(node.names):
+            continue
+        multiline = "(" in "".join(lines[node.lineno - 1:node.end_lineno])
+        replacement = [_format_import_from("." * node.level + (node.module or ""), kept, multiline)] if kept else []
+        lines[node.lineno - 1:node.end_lineno] = replacement
+    return re.sub(r"\n{4,}", "\n\n\n", "".join(lines)).strip("\n") + "\n"
+
+
+def _prune_clone(source: str, renames: dict[str, str], keep: set[str], docstrings: dict[str, str] = None) -> str | None:
+    """Clone a module of a sibling resource for a new resource: rename the sibling, drop the methods and nested classes
+    of its classes that are not in keep (dunder methods are kept), replace the docstrings of the given classes and
+    drop the imports that are no longer used.
+
+    Returns:
+        str | None: The new module, or None if the sibling module can't be parsed
+    """
+    text = _rename(source, renames)
+    try:
+        tree = ast.parse(text)
+    except SyntaxError:
+        return None
+    lines = text.splitlines(keepends=True)
+    replacements = []
+    for class_node in (node for node in tree.body if isinstance(node, ast.ClassDef)):
+        for node in class_node.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and not node.name.startswith("__") \
+                    and node.name not in keep:
+                start = min([decorator.lineno for decorator in node.decorator_list] + [node.lineno])
+                while start > 1 and not lines[start - 2].strip():
+                    start -= 1
+                replacements.append((start, node.end_lineno, []))
+        if docstrings and class_node.name in docstrings and ast.get_docstring(class_node) is not None:
+            docstring = class_node.body[0]
+            indentation = lines[docstring.lineno - 1][:docstring.col_offset]
+            replacements.append((docstring.lineno, docstring.end_lineno, [indentation + docstrings[class_node.name]]))
+    for start, end, replacement in sorted(replacements, reverse=True):
+        lines[start - 1:end] = replacement
+    try:
+        return _prune_imports("".join(lines))
+    except SyntaxError:
+        return None
+
+
+def _imports_available(source: str, module_name: str, renamed: tuple[str, ...], read_file) -> bool:
+    """Whether every name a module imports from another module of the SDK exists: every relative import, and the
+    absolute imports of the modules of the new resource (renamed from the sibling's)."""
+    package = module_name.rsplit(".", 1)[0]
+    for node in ast.parse(source).body:
+        if not isinstance(node, ast.ImportFrom):
+            continue
+        module = node.module or ""
+        if node.level:
+            base = package.rsplit(".", node.level - 1)[0] if node.level > 1 else package
+            module = f"{base}.{module}" if module else base
+        elif not module.startswith("viam.") or not any(name in module for name in renamed):
+            continue
+        module_path = "src/" + module.replace(".", "/")
+        module_text = read_file(module_path + ".py") or read_file(module_path + "/__init__.py")
+        if module_text is None:
+            return False
+        for alias in node.names:
+            # A relative import may import a submodule of a package
+            if not re.search(rf"\b{re.escape(alias.name)}\b", module_text) and read_file(f"{module_path}/{alias.name}.py") is None:
+                return False
+    return True
+
+
+def _python_new_component(shape: ChangeShape, sdk_root_dir: str, read) -> tuple[list[TemplateEdit], bool] | None:
+    """Template for a new python resource: scaffolds its package (registration, abstract class, client and RPC service).
+
+    The modules are cloned from the sibling resource of the same kind that implements the most RPCs of the new one,
+    keeping only those RPCs (e.g. DoCommand or GetGeometries) and the imports they use. The RPCs specific to the new
+    resource, the mock and the tests are left to the AI pipeline, so the change is never handled completely.
+
+    Returns:
+        tuple[list[TemplateEdit], bool] | None: The edits and False, or None if the template doesn't apply
+    """
+    resource = _python_resource(shape, sdk_root_dir)
+    if resource is None or resource[2] is not None or not shape.rpcs:
+        return None
+    kind, directories, _ = resource
+    service = shape.rpcs[0].split("/")[0].rsplit(".", 1)[1]
+    name = service[:-len("Service")] if service.endswith("Service") else service
+    target = camel_to_snake(name)
+    read_file = _file_reader(sdk_root_dir, read)
+
+    gen_dir = os.path.join(sdk_root_dir, "src", "viam", "gen", *shape.package.split(".")[1:])
+    gen_files = sorted(os.listdir(gen_dir)) if os.path.isdir(gen_dir) else []
+    gen_module = next((entry[:-len(".py")] for entry in gen_files
+                       if entry.endswith("_pb2.py") and normalize_name(entry[:-len("_pb2.py")]) == normalize_name(target)), None)
+    if gen_module is None:
+        return None
+    gen_module = f"viam.gen.{'.'.join(shape.package.split('.')[1:])}.{gen_module}"
+
+    methods = [rpc.split("/")[1] for rpc in shape.rpcs]
+    keep = set(methods) | {camel_to_snake(method) for method in methods}
+    resource_dir = PYTHON_RESOURCE_DIRS[kind]
+    target_base = f"src/viam/{resource_dir}/{target}"
+    docstring = PYTHON_RESOURCE_DOCSTRING.format(name=name, label=target.replace("_", " "), kind=kind, resource_dir=resource_dir,
+                                                 module=target)
+
+    def shared_rpcs(sibling):
+        client = read_file(f"src/viam/{resource_dir}/{sibling}/client.py") or ""
+        return sum(bool(re.search(rf"\bdef {camel_to_snake(method)}\(", client)) for method in methods)
+
+    for sibling in sorted(directories, key=shared_rpcs, reverse=True):
+        sibling_base = f"src/viam/{resource_dir}/{sibling}"
+        renames = {sibling: target, snake_to_pascal(sibling): name, sibling.upper(): target.upper(),
+                   normalize_name(sibling): normalize_name(target)}
+        edits = [TemplateEdit(file_path=f"{target_base}/__init__.py", summary=f"Registered the new {target} {kind}",
+                              content=PYTHON_INIT_TEMPLATE.format(gen_module=gen_module, name=name, module=target))]
+        contents = {}
+        for sibling_file, target_file in [(f"{sibling}.py", f"{target}.py"), ("client.py", "client.py"), ("service.py", "service.py")]:
+            sibling_text = read_file(f"{sibling_base}/{sibling_file}")
+            content = _prune_clone(sibling_text, renames, keep, {name: docstring}) if sibling_text is not None else None
+            if content is None:
+                break
+            contents[f"{target_base}/{target_file}"] = content
+        else:
+            # The modules of the new resource import each other, so their imports are checked once all of them exist
+            pending = {edit.file_path: edit.content for edit in edits} | contents
+            read_pending = lambda file_path, pending=pending: pending.get(file_path) or read_file(file_path)
+            if not all(_imports_available(content, _module_name(file_path), (target, normalize_name(target)), read_pending)
+                       for file_path, content in contents.items()):
+                continue
+            for file_path, content in contents.items():
+                defined = [node.name for node in ast.walk(ast.parse(content))
+                           if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name in keep]
+                summary = f"Scaffolded from the {sibling} {kind}"
+                if defined:
+                    summary += f" with {', '.join(f'`{method}`' for method in defined)}"
+                edits.append(TemplateEdit(file_path=file_path, content=content,
+                                          summary=f"{summary}, the other RPCs of {service} still need to be added"))
+            return edits, False
+    return None
+
+
+def _skip_literal(text: str, pos: int, language: str) -> int | None:
+    """Return the end of the comment or string literal starting at pos, or None if none starts there."""
+    if text.startswith("//", pos):
+        end = text.find("\n", pos)
+        return len(text) if end == -1 else end
+    if text.startswith("/*", pos):
+        end = text.find("*/", pos + 2)
+        return len(text) if end == -1 else end + 2
+    quote = text[pos]
+    if quote not in "\"'`":
+        return None
+    if language == "cpp" and quote == '"' and text[pos - 1:pos] == "R":
+        match = re.match(r'"([^()\s]*)\(', text[pos:])
+        if match is not None:
+            end = text.find(f'){match.group(1)}"', pos)
+            return len(text) if end == -1 else end + len(match.group(1)) + 2
+    if language == "dart" and text.startswith(quote * 3, pos):
+        end = text.find(quote * 3, pos + 3)
+        return len(text) if end == -1 else end + 3
+    pos += 1
+    while pos < len(text) and text[pos] != quote and (quote == "`" or text[pos] != "\n"):
+        pos += 2 if text[pos] == "\\" else 1
+    return min(pos + 1, len(text))
+
+
+def _code_identifiers(text: str, language: str) -> set[str]:
+    """Identifiers of a source outside of its comments and string literals."""
+    code, pos = [], 0
+    while pos < len(text):
+        end = _skip_literal(text, pos, language)
+        code.append(text[pos] if end is None else " ")
+        pos = pos + 1 if end is None else end
+    return set(IDENTIFIER_TOKEN_PATTERN.findall("".join(code)))
+
+
+def _item_name(header: str) -> tuple[str | None, bool, bool]:
+    """Name an item from its header.
+
+    Returns:
+        tuple[str | None, bool, bool]: The name (see SourceItem), whether the item is a test and whether its block
+            holds declarations
+    """
+    header = ANNOTATION_PATTERN.sub("", header.strip())
+    if header.startswith("#") or IMPORT_STATEMENT_PATTERN.match(header) or ACCESS_LABEL_PATTERN.match(header):
+        return None, False, False
+    match = TEST_CALL_PATTERN.match(header)
+    if match is not None:
+        return match.group(3), True, match.group(1) in TEST_GROUP_CALLS
+    match = MACRO_CALL_PATTERN.match(header)
+    if match is not None:
+        return match.group(1), False, False
+    match = DECLARATION_PATTERN.match(header)
+    if match is not None:
+        return match.group(2), False, True
+    paren = header.find("(")
+    if paren != -1:
+        names = IDENTIFIER_TOKEN_PATTERN.findall(header[:paren])
+    else:
+        # Fields: `bool peek_stop_called{false};`, `private client: PromiseClient<...>;`, `sdk::ProtoStruct peek_command;`
+        names = IDENTIFIER_TOKEN_PATTERN.findall(re.split(r"(?<!:):(?!:)", re.split(r"[=;{]", header)[0])[0])
+    name = names[-1] if names else None
+    return name, False, name == "main"
+
+
+def _line_start(text: str, pos: int, floor: int) -> int:
+    start = text.rfind("\n", 0, pos) + 1
+    return start if start >= floor and not text[start:pos].strip() else pos
+
+
+def parse_items(text: str, language: str, start: int = 0, end: int = None) -> list[SourceItem]:
+    """Split a typescript, C++ or dart source (or the block between start and end) into its top-level items.
+
+    An item ends at a `;` or at the `}` closing a block outside of any bracket. Preprocessor directives, C++ access
+    labels and macros alone on their line (BOOST_AUTO_TEST_SUITE(test_arm)) are items of one line.
+
+    Args:
+        text: The source
+        language: typescript, cpp or dart
+        start: Start of the block to split
+        end: End of the block to split, the end of the source by default
+
+    Returns:
+        list[SourceItem]: The items, without the comments that follow the last one
+    """
+    end = len(text) if end is None else end
+    items = []
+    pos = start
+    item_start = code_start = body_open = body_close = None
+    stack = []
+    while pos < end:
+        literal_end = _skip_literal(text, pos, language)
+        if literal_end is not None or text[pos].isspace():
+            if literal_end is not None and item_start is None:
+                item_start = _line_start(text, pos, items[-1].end if items else start)
+            if literal_end is not None and code_start is None and text[pos] in "\"'`":
+                code_start = pos
+            pos = literal_end if literal_end is not None else pos + 1
+            continue
+        char = text[pos]
+        if item_start is None:
+            item_start = _line_start(text, pos, items[-1].end if items else start)
+        terminator = None
+        if code_start is None:
+            code_start = pos
+            line_end = text.find("\n", pos)
+            line_end = end if line_end == -1 or line_end > end else line_end
+            line = text[pos:line_end].strip()
+            if char == "#" or language == "cpp" and (ACCESS_LABEL_PATTERN.fullmatch(line) or MACRO_LINE_PATTERN.fullmatch(line)):
+                terminator = line_end
+        if terminator is None:
+            if char in "([{":
+                if char == "{" and body_open is None:
+                    body_open, body_depth = pos, len(stack)
+                stack.append(char)
+            elif char in ")]}":
+                if not stack:
+                    break
+                stack.pop()
+                if char == "}" and body_open is not None and body_close is None and len(stack) == body_depth:
+                    body_close = pos
+                if char == "}" and not stack:
+                    semicolon = re.compile(r"[ \t]*;").match(text, pos + 1)
+                    terminator = semicolon.end() if semicolon else pos + 1
+            elif char == ";" and not stack:
+                terminator = pos + 1
+        if terminator is None:
+            pos += 1
+            continue
+        # The item takes the rest of its line when only a comment follows it (`}  // namespace impl`)
+        item_end = min(re.compile(r"[ \t]*(?://[^\n]*)?\n?").match(text, terminator).end(), end)
+        header_end = body_open if body_open is not None else terminator
+        header = re.sub(r"/\*.*?\*/|//[^\n]*", " ", text[code_start:header_end], flags=re.DOTALL)
+        name, test, container = _item_name(header)
+        items.append(SourceItem(start=item_start, end=item_end, header=header, name=name, test=test,
+                                body=(body_open + 1, body_close) if body_close is not None else None,
+                                container=container and body_close is not None))
+        item_start = code_start = body_open = body_close = None
+        stack = []
+        pos = item_end
+    return items
+
+
+def _find_members(text: str, items: list[SourceItem], member: str, language: str, path: tuple = ()):
+    """Yield the runs of consecutive items named member, with the path of containers leading to them and their siblings."""
+    index = 0
+    while index < len(items):
+        if items[index].name == member:
+            last = index
+            while last + 1 < len(items) and items[last + 1].name == member:
+                last += 1
+            yield path, items, index, last
+            index = last + 1
+            continue
+        if items[index].container:
+            children = parse_items(text, language, *items[index].body)
+            yield from _find_members(text, children, member, language, path + (items[index],))
+        index += 1
+
+
+def _declared_names(text: str, items: list[SourceItem], language: str) -> set[str]:
+    """Names of the declarations of a source, in its containers too (tests are not declarations)."""
+    names = set()
+    for item in items:
+        if item.name is not None and not item.test:
+            names.add(item.name)
+        if item.container:
+            names |= _declared_names(text, parse_items(text, language, *item.body), language)
+    return names
+
+
+def _add_brace_imports(content: str, target_text: str, sibling_text: str, clones: list[str], renames: dict[str, str],
+                       language: str) -> str:
+    """Import the names cloned code uses that the target didn't use yet, as the sibling imports them.
+
+    Typescript names are added to the target's import from the same module (or a new import statement). Dart libraries
+    and C++ headers can't be told apart by the names they declare, so the imports of the sibling the target lacks are
+    added as a whole when the cloned code uses new names.
+    """
+    used = set().union(*(_code_identifiers(clone, language) for clone in clones))
+    new_names = used - _code_identifiers(target_text, language)
+    if not new_names:
+        return content
+    sibling_text = _rename(sibling_text, renames)
+    pattern = IMPORT_LINE_PATTERNS[language]
+    if language != "typescript":
+        present = {line.strip() for line in pattern.findall(content)}
+        missing = [line for line in pattern.findall(sibling_text) if line.strip() not in present]
+    else:
+        missing = []
+        imported = {}
+        for match in TS_NAMED_IMPORT_PATTERN.finditer(sibling_text):
+            for entry in filter(None, (entry.strip() for entry in match.group(2).split(","))):
+                if entry.split()[-1] in new_names:
+                    imported.setdefault((match.group(1) or "", match.group(3), match.group(4)), []).append(entry)
+        for (type_only, quote, module), entries in imported.items():
+            existing = next((match for match in TS_NAMED_IMPORT_PATTERN.finditer(content)
+                             if match.group(4) == module and (match.group(1) or "") == type_only), None)
+            if existing is None:
+                missing.append(f"import {type_only}{{ {', '.join(entries)} }} from {quote}{module}{quote};\n")
+                continue
+            names = [entry.strip() for entry in existing.group(2).split(",") if entry.strip()]
+            sort_key = lambda entry: entry.split()[-1].lower()
+            names = sorted(names + entries, key=sort_key) if names == sorted(names, key=sort_key) else names + entries
+            if "\n" in existing.group(2):
+                indentation = re.match(r"\s*?([ \t]*)\S", existing.group(2)).group(1)
+                braces = "{\n" + "".join(f"{indentation}{name},\n" for name in names) + "}"
+            else:
+                braces = "{ " + ", ".join(names) + " }"
+            start, end = existing.span(2)
+            content = content[:start - 1] + braces + content[end + 1:]
+    if not missing:
+        return content
+    last = None
+    for last in pattern.finditer(content):
+        pass
+    position = last.end() if last is not None else 0
+    return content[:position] + "".join(missing) + content[position:]
+
+
+def _clone_members(sibling_text: str, target_text: str, member: str, renames: dict[str, str], language: str) -> tuple[str | None, int]:
+    """Clone the items named member of a sibling source into the matching containers of the target source.
+
+    Every run of items named member (e.g. the inline overload and the pure virtual method of a C++ resource, with their
+    doc comments) is renamed and inserted into the container of the target named like its container in the sibling,
+    after the counterpart of the closest item before it (or before the counterpart of the closest item after it),
+    keeping the blank lines of the sibling. Containers that already have the member are left alone.
+
+    Returns:
+        tuple[str | None, int]: The new target source and the number of containers the member was added to, or None if
+            the sibling doesn't have the member, a container is missing from the target, or the clone uses a name the
+            sibling declares and the target doesn't (e.g. state of a fake resource, or a type local to the sibling)
+    """
+    sibling_items = parse_items(sibling_text, language)
+    target_items = parse_items(target_text, language)
+    runs = list(_find_members(sibling_text, sibling_items, member, language))
+    if not runs:
+        return None, 0
+    declared = {_rename(name, renames) for name in _declared_names(sibling_text, sibling_items, language)} - {member}
+    available = _declared_names(target_text, target_items, language)
+    insertions, clones = [], []
+    for path, items, first, last in runs:
+        parent, parent_items = None, target_items
+        for container in path:
+            name = _rename(container.name, renames) if container.name is not None else None
+            parent = next((item for item in parent_items if item.container and item.name == name), None)
+            if parent is None:
+                return None, 0
+            parent_items = parse_items(target_text, language, *parent.body)
+        if any(item.name == member for item in parent_items):
+            continue
+        clone = _rename(sibling_text[items[first].start:items[last].end], renames)
+        if (_code_identifiers(clone, language) & declared) - available:
+            return None, 0
+        gap_before = sibling_text[items[first - 1].end:items[first].start] if first else ""
+        gap_after = sibling_text[items[last].end:items[last + 1].start] if last + 1 < len(items) else ""
+        counterpart = lambda item: [candidate for candidate in parent_items
+                                    if item.name is not None and candidate.name == _rename(item.name, renames)]
+        before = next((counterpart(item)[-1] for item in reversed(items[:first]) if counterpart(item)), None)
+        after = next((counterpart(item)[0] for item in items[last + 1:] if counterpart(item)), None)
+        if before is not None:
+            insertions.append((before.end, gap_before + clone))
+        elif after is not None:
+            insertions.append((after.start, clone + gap_after))
+        else:
+            end = parent.body[1] if parent is not None else len(target_text)
+            insertions.append((_line_start(target_text, end, parent.body[0] if parent is not None else 0), gap_before + clone))
+        clones.append(clone)
+    content = target_text
+    for position, snippet in sorted(insertions, key=lambda insertion: insertion[0], reverse=True):
+        content = content[:position] + snippet + content[position:]
+    if clones:
+        content = _add_brace_imports(content, target_text, sibling_text, clones, renames, language)
+    return content, len(clones)
+
+
+def _brace_resource(sdk: str, shape: ChangeShape, sdk_root_dir: str) -> tuple[str, list[str], str | None] | None:
+    """Locate the typescript, C++ or flutter resource of a change, see _python_resource."""
+    match = PACKAGE_KIND_PATTERN.match(shape.package)
+    if match is None:
+        return None
+    kind, package_name = match.groups()
+    resource_dir = os.path.join(sdk_root_dir, BRACE_RESOURCE_DIRS[sdk][kind])
+    if not os.path.isdir(resource_dir):
+        return None
+    extension = BRACE_RESOURCE_HEADERS.get(sdk)
+    if extension is not None:
+        names = sorted(entry[:-len(extension)] for entry in os.listdir(resource_dir) if entry.endswith(extension))
+    else:
+        names = sorted(entry for entry in os.listdir(resource_dir) if os.path.isdir(os.path.join(resource_dir, entry)))
+    return kind, names, next((name for name in names if normalize_name(name) == package_name), None)
+
+
+def _brace_new_rpc(sdk: str, shape: ChangeShape, sdk_root_dir: str, read) -> tuple[list[TemplateEdit], bool] | None:
+    """Template for a new unary RPC on an existing typescript, C++ or flutter resource.
+
+    Like _python_new_rpc, the members are cloned from a sibling resource of the same kind that already implements the
+    RPC, into every file of BRACE_NEW_RPC_FILES: the interface or abstract class and the client (and the C++ and dart
+    RPC servers), then the C++ mock and the tests (with the fake resource of the dart tests). The sibling is skipped
+    when it lacks the RPC in one of the resource files, or when a clone needs a declaration the target lacks.
+
+    Returns:
+        tuple[list[TemplateEdit], bool] | None: The edits and whether the mock and the tests were included, or None if
+            the template doesn't apply
+    """
+    resource = _brace_resource(sdk, shape, sdk_root_dir)
+    if resource is None or resource[2] is None:
+        return None
+    kind, names, target = resource
+    language = BRACE_LANGUAGES[sdk]
+    resource_dir = BRACE_RESOURCE_DIRS[sdk][kind]
+    snake_method = camel_to_snake(shape.method)
+    members = {"camel": shape.method[0].lower() + shape.method[1:], "snake": snake_method, "rpc": shape.method,
+               "test": f"test_{snake_method}"}
+    read_file = _file_reader(sdk_root_dir, read)
+
+    for sibling in names:
+        if sibling == target:
+            continue
+        sibling_snake, target_snake = sibling.replace("-", "_"), target.replace("-", "_")
+        renames = {sibling_snake: target_snake, snake_to_pascal(sibling_snake): snake_to_pascal(target_snake),
+                   sibling_snake.upper(): target_snake.upper()}
+        renames[sibling_snake[0] + snake_to_pascal(sibling_snake)[1:]] = target_snake[0] + snake_to_pascal(target_snake)[1:]
+        edits = []
+        # Per role of the mock and test files, whether every one of them was cloned
+        cloned_roles: dict[str, bool] = {}
+        for path, form, role in BRACE_NEW_RPC_FILES[sdk]:
+            paths = [path.format(dir=resource_dir, kinds=os.path.basename(resource_dir), name=name) for name in (sibling, target)]
+            sibling_text, target_text = read_file(paths[0]), read_file(paths[1])
+            if sibling_text is None or target_text is None:
+                if role == "resource":
+                    break
+                continue
+            content, cloned = _clone_members(sibling_text, target_text, members[form], renames, language)
+            if content is None and role == "resource":
+                break
+            if role != "resource":
+                cloned_roles[role] = cloned_roles.get(role, True) and content is not None
+            if cloned:
+                edits.append(TemplateEdit(file_path=paths[1], content=content,
+                                          summary=f"Added `{members[form]}` (cloned from {paths[0]})"))
+        else:
+            roles = {role for _, _, role in BRACE_NEW_RPC_FILES[sdk]} - {"resource"}
+            return edits, all(cloned_roles.get(role, False) for role in roles)
+    return None
+
+
+# Templates per (sdk, change kind). Each returns the edits and whether the change was handled completely
+TEMPLATES = {
+    ("python", "new_rpc"): _python_new_rpc,
+    ("python", "new_field"): _python_new_field,
+    ("python", "new_component"): _python_new_component,
+    ("typescript", "new_rpc"): functools.partial(_brace_new_rpc, "typescript"),
+    ("cpp", "new_rpc"): functools.partial(_brace_new_rpc, "cpp"),
+    ("flutter", "new_rpc"): functools.partial(_brace_new_rpc, "flutter"),
+}
+
+
+def apply_templates(sdk: str, sdk_root_dir: str, change_model: ChangeModel, topology: SdkTopology, read) -> TemplateResult:
+    """Recognize routine change shapes and emit their edits directly from the per-SDK templates.
+
+    Edits of several changes to the same file are applied on top of each other. Changes without a matching template,
+    and the parts of a change a template couldn't handle (e.g. a mock that lacks the required state), are reported
+    as unmatched so that they can be sent through the AI pipeline.
+
+    Args:
+        sdk: The SDK being updated
+        sdk_root_dir: Root directory of the SDK checkout
+        change_model: The change model of the proto change
+        topology: The topology of the SDK checkout
+        read: Function returning the current content of a file by absolute path (e.g. OverlayFS.read_text)
+
+    Returns:
+        TemplateResult: The emitted edits and the matched/unmatched changes
+    """
+    result = TemplateResult()
+    edits_by_path: dict[str, TemplateEdit] = {}
+
+    def read_current(file_path):
+        relative_path = os.path.relpath(file_path, sdk_root_dir)
+        return edits_by_path[relative_path].content if relative_path in edits_by_path else read(file_path)
+
+    for shape in detect_change_shapes(change_model, topology):
+        template = TEMPLATES.get((sdk, shape.kind))
+        outcome = template(shape, sdk_root_dir, read_current) if template else None
+        if outcome is None:
+            result.unmatched.append(shape)
+            continue
+        edits, complete = outcome
+        for edit in edits:
+            if edit.file_path in edits_by_path:
+                previous = edits_by_path[edit.file_path]
+                edit.summary = f"{previous.summary}; {edit.summary}"
+            edits_by_path[edit.file_path] = edit
+        (result.matched if complete else result.unmatched).append(shape)
+    result.edits = list(edits_by_path.values())
+    return result
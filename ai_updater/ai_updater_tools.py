@@ -2,10 +2,12 @@ import os
 
 from google.genai import types
 
+from ai_updater_store import ContentStore, OverlayFS
+
 # Define the function declaration for apply_patch
 apply_patch_declaration = {
     "name": "apply_patch",
-    "description": "Applies a list of patches to a file sequentially.",
+    "description": "Applies a list of patches to a file sequentially. Patches that apply cleanly are locked in, only the failed ones need to be resent.",
     "parameters": {
         "type": "object",
         "properties": {
@@ -24,20 +26,31 @@ apply_patch_declaration = {
     },
 }
 
-def apply_patch(file_path: str, search_text: list[str], replacement_text: list[str], attempt_number: int, quiet: bool = False) -> dict:
+def apply_patch(file_path: str, search_text: list[str], replacement_text: list[str], attempt_number: int, quiet: bool = False,
+                sdk_root_dir: str = None, store: ContentStore | OverlayFS = None, content: str = None) -> dict:
     """Applies a list of patches to a file sequentially.
 
+    Each block is validated and applied on its own: blocks whose search text appears exactly once in the working copy
+    are applied to it (in order) and locked in, the other blocks are reported back by index so that the next attempt
+    only has to resend those.
+
     Args:
         file_path: Path to the file to patch
         search_text: List of text blocks to search for
         replacement_text: List of text blocks to replace with (corresponds to search_text)
         attempt_number: The number of the attempt to apply the patch.
         quiet: If true, suppresses print statements.
+        sdk_root_dir: Root directory of the SDK the file belongs to. Defaults to the SDK_ROOT_DIR env var.
+        store: Content store or overlay to read the file through. If not given, the file is read from disk.
+        content: Working copy to apply the blocks to, with the blocks accepted by previous attempts already applied.
+            If not given, the file is read.
 
     Returns:
-        dict: Status with success/failure and detailed messages.
+        dict: Status with success/failure and detailed messages. `accepted_blocks` and `failed_blocks` list the 1-based
+            indices of the blocks that were applied and of the blocks that need to be resent, and `patched_content` holds
+            the working copy with the accepted blocks applied (it is meant for the caller, not for the model).
     """
-    sdk_root_dir = os.getenv('SDK_ROOT_DIR')
+    sdk_root_dir = sdk_root_dir or os.getenv('SDK_ROOT_DIR')
     file_path = os.path.join(sdk_root_dir, file_path)
 
     # Define maximum number of attempts before giving up
@@ -60,7 +73,7 @@ def apply_patch(file_path: str, search_text: list[str], replacement_text: list[s
             "success": False,
             "error": f"ERROR: Mismatched list lengths - {len(search_text)} search blocks but {len(replacement_text)} replacement blocks"
         }
-    if not os.path.exists(file_path):
+    if content is None and not os.path.exists(file_path):
         if attempt_number > MAX_ATTEMPTS:
             if not quiet:
                 print(max_attempts_message)
@@ -71,56 +84,61 @@ def apply_patch(file_path: str, search_text: list[str], replacement_text: list[s
             "success": False,
             "error": f"ERROR: File {file_path} does not exist"
         }
-    try:
-        with open(file_path, "r") as f:
-            file_content = f.read()
-    except Exception as e:
-        if attempt_number > MAX_ATTEMPTS:
-            if not quiet:
-                print(max_attempts_message)
-            return max_attempts_return
-        if not quiet:
-            print(f"ERROR: Failed to read file {file_path}: {str(e)}")
-        return {
-            "success": False,
-            "error": f"ERROR: Failed to read file {file_path}: {str(e)}"
-        }
-    # Validate all patches before applying any
-    for i, (search, replace) in enumerate(zip(search_text, replacement_text)):
-        if not search:
+    if content is None:
+        try:
+            if store is not None:
+                content = store.read_text(file_path)
+            else:
+                with open(file_path, "r") as f:
+                    content = f.read()
+        except Exception as e:
             if attempt_number > MAX_ATTEMPTS:
                 if not quiet:
                     print(max_attempts_message)
                 return max_attempts_return
             if not quiet:
-                print(f"ERROR: Patch {i+1}: Search text is empty")
+                print(f"ERROR: Failed to read file {file_path}: {str(e)}")
             return {
                 "success": False,
-                "error": f"ERROR: Patch {i+1}: Search text is empty"
+                "error": f"ERROR: Failed to read file {file_path}: {str(e)}"
             }
-        search_count = file_content.count(search)
+
+    # Validate and apply every block on its own, in order
+    accepted_blocks = []
+    errors = []
+    for i, (search, replace) in enumerate(zip(search_text, replacement_text)):
+        if not search:
+            errors.append(f"ERROR: Patch {i+1}: Search text is empty")
+            continue
+        search_count = content.count(search)
         if search_count == 0:
-            if attempt_number > MAX_ATTEMPTS:
-                if not quiet:
-                    print(max_attempts_message)
-                return max_attempts_return
-            if not quiet:
-                print(f"ERROR: Patch {i+1}: Search text not found in file. The AI needs to generate a search block that exists in the file exactly as written.")
-            return {
-                "success": False,
-                "error": f"ERROR: Patch {i+1}: Search text not found in file. The AI needs to generate a search block that exists in the file exactly as written."
-            }
+            errors.append(f"ERROR: Patch {i+1}: Search text not found in file. The AI needs to generate a search block that exists in the file exactly as written.")
         elif search_count > 1:
-            if attempt_number > MAX_ATTEMPTS:
-                if not quiet:
-                    print(max_attempts_message)
-                return max_attempts_return
+            errors.append(f"ERROR: Patch {i+1}: Search text appears {search_count} times in file. The AI must include more surrounding context to make the search block unique.")
+        else:
+            content = content.replace(search, replace)
+            accepted_blocks.append(i + 1)
+    failed_blocks = [i + 1 for i in range(len(search_text)) if i + 1 not in accepted_blocks]
+
+    if errors:
+        if attempt_number > MAX_ATTEMPTS:
             if not quiet:
-                print(f"ERROR: Patch {i+1}: Search text appears {search_count} times in file. The AI must include more surrounding context to make the search block unique.")
-            return {
-                "success": False,
-                "error": f"ERROR: Patch {i+1}: Search text appears {search_count} times in file. The AI must include more surrounding context to make the search block unique."
-            }
+                print(max_attempts_message)
+            return max_attempts_return
+        if not quiet:
+            for error in errors:
+                print(error)
+        retry_message = (f"Patches {accepted_blocks} were applied and are locked in, do NOT send them again. "
+                         if accepted_blocks else "")
+        retry_message += (f"Call apply_patch again with ONLY the corrected search and replacement blocks for patches {failed_blocks} "
+                          "(in that order). The search text must match the file with the locked in patches applied.")
+        return {
+            "success": False,
+            "error": "\n".join(errors + [retry_message]),
+            "accepted_blocks": accepted_blocks,
+            "failed_blocks": failed_blocks,
+            "patched_content": content,
+        }
 
     success_message = "SUCCESS: All patches validated successfully!"
     if not quiet:
@@ -128,4 +146,7 @@ def apply_patch(file_path: str, search_text: list[str], replacement_text: list[s
     return {
         "success": True,
         "message": success_message,
+        "accepted_blocks": accepted_blocks,
+        "failed_blocks": [],
+        "patched_content": content,
     }
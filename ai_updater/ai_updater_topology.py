@@ -0,0 +1,176 @@
+import os
+import re
+import subprocess
+
+# Where each SDK keeps its hand-written sources and tests, which generated directories to skip, and the shared files
+# every change to a resource of a given kind (component/service/app) touches.
+SDK_LAYOUTS = {
+    "python": {
+        "roots": ["src/viam", "tests"],
+        "exclude": ["src/viam/gen"],
+        # Generated modules that are still useful as context, but don't implement a resource
+        "generated": ["src/viam/proto"],
+        "shared": {
+            "component": ["tests/mocks/components.py"],
+            "service": ["tests/mocks/services.py"],
+            "app": ["tests/mocks/services.py"],
+        },
+    },
+    "typescript": {
+        "roots": ["src"],
+        "exclude": ["src/gen"],
+        "shared": {
+            "component": ["src/main.ts"],
+            "service": ["src/main.ts"],
+        },
+    },
+    "cpp": {
+        "roots": ["src/viam/sdk"],
+        "exclude": [],
+        "shared": {
+            "component": ["src/viam/sdk/CMakeLists.txt", "src/viam/sdk/tests/CMakeLists.txt"],
+            "service": ["src/viam/sdk/CMakeLists.txt", "src/viam/sdk/tests/CMakeLists.txt"],
+        },
+    },
+    "flutter": {
+        "roots": ["lib/src", "test"],
+        "exclude": ["lib/src/gen"],
+        "shared": {
+            "component": ["lib/viam_sdk.dart"],
+            "service": ["lib/viam_sdk.dart"],
+        },
+    },
+}
+SOURCE_EXTENSIONS = {".py", ".ts", ".cpp", ".hpp", ".dart"}
+# Prefixes and suffixes wrapped around a resource name in file names, e.g. test_gripper.py, mock_gripper.hpp,
+# gripper_client.cpp, gripper_test.dart, gripper.spec.ts, data_client.py
+NAME_PREFIXES = ("test_", "mock_")
+NAME_SUFFIXES = ("_client", "_server", "_service", "_test", ".spec", "_pb")
+PACKAGE_PATTERN = re.compile(r"^viam\.(component|service|app)\.([a-z0-9_]+)\.v\d+[a-z0-9]*$")
+
+
+def normalize_name(name: str) -> str:
+    """Normalize a resource name so that movementsensor, movement_sensor and movement-sensor compare equal."""
+    return re.sub(r"[-_]", "", name).lower()
+
+
+def file_stem(file_path: str) -> str:
+    """Return the resource name a file is named after (e.g. test_gripper.py, gripper_client.cpp -> gripper)."""
+    stem = os.path.basename(file_path)
+    for extension in SOURCE_EXTENSIONS:
+        if stem.endswith(extension):
+            stem = stem[:-len(extension)]
+            break
+    for prefix in NAME_PREFIXES:
+        if stem.startswith(prefix):
+            stem = stem[len(prefix):]
+    for suffix in NAME_SUFFIXES:
+        if stem.endswith(suffix):
+            stem = stem[:-len(suffix)]
+    return stem
+
+
+class SdkTopology:
+    """Map of an SDK checkout from resource names to the hand-written files that implement and test them.
+
+    Viam SDKs follow rigid layouts (e.g. src/viam/components/<name>/{__init__,<name>,client,service}.py,
+    tests/test_<name>.py and tests/mocks/components.py in python), so the files affected by a change to a proto
+    package like viam.component.gripper.v1 can be looked up without a model call.
+    """
+
+    def __init__(self, sdk: str, files: list[str]):
+        """Initialize the topology from the list of files of a checkout.
+
+        Args:
+            sdk: The SDK of the checkout (python, typescript, cpp, flutter)
+            files: Paths of all files in the checkout, relative to its root
+        """
+        layout = SDK_LAYOUTS[sdk]
+        self.sdk = sdk
+        self.files = set(files)
+        self.shared = layout["shared"]
+        self.generated = tuple(directory + "/" for directory in layout.get("generated", []))
+        self._by_name: dict[str, list[str]] = {}
+
+        roots = tuple(root + "/" for root in layout["roots"])
+        excluded = tuple(directory + "/" for directory in layout["exclude"])
+        for file_path in sorted(files):
+            if not file_path.startswith(roots) or file_path.startswith(excluded):
+                continue
+            if os.path.splitext(file_path)[1] not in SOURCE_EXTENSIONS:
+                continue
+            names = {normalize_name(segment) for segment in file_path.split("/")[:-1]}
+            names.add(normalize_name(file_stem(file_path)))
+            for name in names:
+                self._by_name.setdefault(name, []).append(file_path)
+
+    @classmethod
+    def scan(cls, sdk_root_dir: str, sdk: str) -> "SdkTopology":
+        """Build the topology by listing the files of a checkout once (via git, falling back to walking the tree).
+
+        Args:
+            sdk_root_dir: Root directory of the SDK checkout
+            sdk: The SDK of the checkout
+
+        Returns:
+            SdkTopology: The topology of the checkout
+        """
+        try:
+            output = subprocess.check_output(["git", "ls-files"], text=True, cwd=sdk_root_dir, stderr=subprocess.DEVNULL)
+            files = output.splitlines()
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            files = []
+            for directory, _, filenames in os.walk(sdk_root_dir):
+                for filename in filenames:
+                    files.append(os.path.relpath(os.path.join(directory, filename), sdk_root_dir).replace(os.sep, "/"))
+        return cls(sdk, files)
+
+    def resolve_package(self, package: str) -> list[str]:
+        """Resolve a proto package to the files of this SDK that implement, test and mock it.
+
+        Args:
+            package: Fully qualified proto package (e.g. viam.component.gripper.v1)
+
+        Returns:
+            list[str]: Paths relative to the SDK root, empty if the package doesn't map to a resource of this SDK
+        """
+        match = PACKAGE_PATTERN.match(package)
+        if not match:
+            return []
+        kind, name = match.groups()
+        resolved = list(self._by_name.get(normalize_name(name), []))
+        if resolved or kind != "app":
+            resolved += [file_path for file_path in self.shared.get(kind, []) if file_path in self.files and file_path not in resolved]
+        return resolved
+
+    def resource_files(self, package: str) -> list[str]:
+        """Return the files named after the resource of a proto package, without the files shared by its kind of resource
+        and the generated modules.
+
+        Args:
+            package: Fully qualified proto package (e.g. viam.component.gripper.v1)
+
+        Returns:
+            list[str]: Paths relative to the SDK root, empty if the SDK doesn't implement the resource yet
+        """
+        match = PACKAGE_PATTERN.match(package)
+        files = self._by_name.get(normalize_name(match.group(2)), []) if match else []
+        return [file_path for file_path in files if not file_path.startswith(self.generated)]
+
+    def resolve_packages(self, packages: list[str]) -> tuple[list[str], list[str]]:
+        """Resolve several proto packages at once.
+
+        Args:
+            packages: Fully qualified proto packages
+
+        Returns:
+            tuple[list[str], list[str]]: The resolved files (deduplicated, in order) and the packages that couldn't be resolved
+        """
+        resolved = []
+        unresolved = []
+        for package in packages:
+            files = self.resolve_package(package)
+            if not files:
+                unresolved.append(package)
+            resolved += [file_path for file_path in files if file_path not in resolved]
+        return resolved, unresolved
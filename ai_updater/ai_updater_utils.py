@@ -12,22 +12,6 @@ def write_to_file(filepath: str, content: str, quiet: bool = False) -> None:
     if not quiet:
         print(f"Successfully wrote to: {filepath} \n")
 
-def read_file_content(file_path) -> str:
-    """Read and return the content of a file.
-
-    Args:
-        file_path: Path to the file to read
-
-    Returns:
-        str: Content of the file or error message if reading fails
-    """
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except Exception as e:
-        print(f"Error reading file: {str(e)}")
-        return f"Error reading file: {str(e)}"
-
 def calculate_cost(usage_metadata, model: str) -> float:
     """Calculates the estimated cost of a Gemini response.
 
@@ -62,6 +46,19 @@ def calculate_cost(usage_metadata, model: str) -> float:
 
     input_tokens = usage_metadata.prompt_token_count if usage_metadata.prompt_token_count is not None else 0
     output_tokens = usage_metadata.candidates_token_count if usage_metadata.candidates_token_count is not None else 0
+    # Thinking tokens are billed as output tokens
+    output_tokens += usage_metadata.thoughts_token_count if usage_metadata.thoughts_token_count is not None else 0
 
     cost = (input_tokens / 1_000_000) * INPUT_COST_PER_MILLION_TOKENS + (output_tokens / 1_000_000) * OUTPUT_COST_PER_MILLION_TOKENS
     return cost
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the number of Gemini tokens in a piece of text (roughly 4 characters per token for code).
+
+    Args:
+        text: The text to estimate.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    return (len(text) + 3) // 4
@@ -0,0 +1,252 @@
+import os
+import ast
+from concurrent.futures import ProcessPoolExecutor
+
+from pydantic import BaseModel
+
+LANGUAGE_BY_EXTENSION = {
+    ".py": "python",
+    ".pyi": "python",
+    ".ts": "typescript",
+    ".tsx": "typescript",
+    ".js": "typescript",
+    ".cpp": "cpp",
+    ".cc": "cpp",
+    ".hpp": "cpp",
+    ".h": "cpp",
+    ".dart": "dart",
+}
+CLOSING_BRACKETS = {")": "(", "]": "[", "}": "{"}
+# Characters after which a "/" in typescript starts a regular expression literal rather than a division. < and > are
+# left out since they precede the / of JSX closing tags (</div>, />)
+REGEX_PRECEDING_CHARS = set("(,=:[!&|?{};+-*%~^")
+# Extensions of typescript files with JSX, in which a "/" is never taken for the start of a regular expression literal
+JSX_EXTENSIONS = {".tsx"}
+
+
+class SyntaxIssue(BaseModel):
+    """A syntax error found in a generated file.
+    line: 1-based line of the error.
+    column: 1-based column of the error.
+    message: Description of the error.
+    """
+    line: int
+    column: int
+    message: str
+
+    def describe(self) -> str:
+        return f"line {self.line}, column {self.column}: {self.message}"
+
+
+class _ScanError(Exception):
+    def __init__(self, position: int, message: str):
+        super().__init__(message)
+        self.position = position
+        self.message = message
+
+
+class _BracketScanner:
+    """Lightweight lexer for typescript, C++ and dart that checks brackets, strings and comments are balanced."""
+
+    def __init__(self, content: str, language: str, regex_literals: bool = True):
+        self.content = content
+        self.language = language
+        self.regex_literals = regex_literals and language == "typescript"
+
+    def scan(self):
+        self._scan_code(0, nested=False)
+
+    def _scan_code(self, pos: int, nested: bool) -> int:
+        content = self.content
+        stack = []
+        previous = ""
+        while pos < len(content):
+            char = content[pos]
+            two = content[pos:pos + 2]
+            if two == "//":
+                end = content.find("\n", pos)
+                pos = len(content) if end == -1 else end
+                continue
+            if two == "/*":
+                pos = self._skip_block_comment(pos)
+                continue
+            if self.regex_literals and char == "/" and (previous == "" or previous in REGEX_PRECEDING_CHARS):
+                pos = self._skip_regex(pos)
+                previous = "/"
+                continue
+            if char in "\"'`":
+                pos = self._scan_string_literal(pos)
+                previous = char
+                continue
+            if char in "([{":
+                stack.append(pos)
+            elif char in CLOSING_BRACKETS:
+                if not stack:
+                    if nested and char == "}":
+                        return pos + 1
+                    raise _ScanError(pos, f"Unmatched closing '{char}'")
+                opening = content[stack.pop()]
+                if opening != CLOSING_BRACKETS[char]:
+                    raise _ScanError(pos, f"Mismatched closing '{char}' for '{opening}'")
+            if not char.isspace():
+                previous = char
+            pos += 1
+        if stack:
+            raise _ScanError(stack[-1], f"Unclosed '{content[stack[-1]]}'")
+        if nested:
+            raise _ScanError(pos, "Unterminated string interpolation")
+        return pos
+
+    def _skip_block_comment(self, pos: int) -> int:
+        content = self.content
+        depth = 0
+        start = pos
+        while pos < len(content):
+            if content.startswith("/*", pos):
+                depth += 1
+                pos += 2
+                if self.language != "dart":
+                    end = content.find("*/", pos)
+                    if end == -1:
+                        break
+                    return end + 2
+            elif content.startswith("*/", pos):
+                depth -= 1
+                pos += 2
+                if depth == 0:
+                    return pos
+            else:
+                pos += 1
+        raise _ScanError(start, "Unterminated block comment")
+
+    def _skip_regex(self, pos: int) -> int:
+        content = self.content
+        start = pos
+        pos += 1
+        in_class = False
+        while pos < len(content) and content[pos] != "\n":
+            char = content[pos]
+            if char == "\\":
+                pos += 2
+                continue
+            if char == "[":
+                in_class = True
+            elif char == "]":
+                in_class = False
+            elif char == "/" and not in_class:
+                return pos + 1
+            pos += 1
+        raise _ScanError(start, "Unterminated regular expression literal")
+
+    def _scan_string_literal(self, pos: int) -> int:
+        content = self.content
+        char = content[pos]
+        prefix = content[max(0, pos - 3):pos]
+        if self.language == "cpp" and char == '"' and prefix.endswith("R"):
+            open_paren = content.find("(", pos)
+            if open_paren == -1:
+                raise _ScanError(pos, "Malformed raw string literal")
+            terminator = ")" + content[pos + 1:open_paren] + '"'
+            end = content.find(terminator, open_paren)
+            if end == -1:
+                raise _ScanError(pos, "Unterminated raw string literal")
+            return end + len(terminator)
+        if self.language == "typescript" and char == "`":
+            return self._scan_string(pos, "`", raw=False, interpolation=True, multiline=True)
+        if self.language == "dart":
+            raw = prefix.endswith("r") and not (len(prefix) > 1 and (prefix[-2].isalnum() or prefix[-2] == "_"))
+            if content.startswith(char * 3, pos):
+                return self._scan_string(pos, char * 3, raw=raw, interpolation=not raw, multiline=True)
+            return self._scan_string(pos, char, raw=raw, interpolation=not raw, multiline=False)
+        return self._scan_string(pos, char, raw=False, interpolation=False, multiline=False)
+
+    def _scan_string(self, pos: int, quote: str, raw: bool, interpolation: bool, multiline: bool) -> int:
+        content = self.content
+        start = pos
+        pos += len(quote)
+        while pos < len(content):
+            if content[pos] == "\\" and not raw:
+                pos += 2
+                continue
+            if content.startswith(quote, pos):
+                return pos + len(quote)
+            if interpolation and content.startswith("${", pos):
+                pos = self._scan_code(pos + 2, nested=True)
+                continue
+            if content[pos] == "\n" and not multiline:
+                raise _ScanError(start, "Unterminated string literal")
+            pos += 1
+        raise _ScanError(start, "Unterminated string literal")
+
+
+def _issue_at(content: str, position: int, message: str) -> SyntaxIssue:
+    line = content.count("\n", 0, position) + 1
+    column = position - (content.rfind("\n", 0, position) + 1) + 1
+    return SyntaxIssue(line=line, column=column, message=message)
+
+
+def check_syntax(file_path: str, content: str) -> SyntaxIssue | None:
+    """Check a file for syntax errors. Python files are fully parsed, typescript, C++ and dart files get a lightweight
+    lexer check of brackets, strings and comments. Files in other languages are not checked.
+
+    Args:
+        file_path: Path of the file (used to determine the language)
+        content: Content of the file
+
+    Returns:
+        SyntaxIssue | None: The first syntax error found, or None if the file looks valid
+    """
+    language = LANGUAGE_BY_EXTENSION.get(os.path.splitext(file_path)[1])
+    if language == "python":
+        try:
+            ast.parse(content, filename=file_path)
+        except SyntaxError as e:
+            return SyntaxIssue(line=e.lineno or 1, column=e.offset or 1, message=e.msg)
+        except ValueError as e:
+            return SyntaxIssue(line=1, column=1, message=str(e))
+    elif language is not None:
+        try:
+            _BracketScanner(content, language, regex_literals=os.path.splitext(file_path)[1] not in JSX_EXTENSIONS).scan()
+        except _ScanError as e:
+            return _issue_at(content, e.position, e.message)
+    return None
+
+
+def _check_syntax_item(item: tuple[str, str]) -> SyntaxIssue | None:
+    return check_syntax(*item)
+
+
+def check_files(files: dict[str, str], max_workers: int = None) -> dict[str, SyntaxIssue]:
+    """Check several files for syntax errors in a process pool.
+
+    Args:
+        files: Mapping of file path to file content
+        max_workers: Number of worker processes (defaults to the number of CPUs)
+
+    Returns:
+        dict[str, SyntaxIssue]: The syntax error of every file that failed the check
+    """
+    items = list(files.items())
+    if len(items) <= 1:
+        results = [_check_syntax_item(item) for item in items]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_check_syntax_item, items))
+    return {file_path: issue for (file_path, _), issue in zip(items, results) if issue is not None}
+
+
+def error_context(content: str, issue: SyntaxIssue, radius: int = 3) -> str:
+    """Return the lines surrounding a syntax error, with line numbers and the error line marked.
+
+    Args:
+        content: Content of the file
+        issue: The syntax error
+        radius: Number of lines to show before and after the error
+
+    Returns:
+        str: The numbered lines around the error
+    """
+    lines = content.splitlines()
+    start = max(0, issue.line - 1 - radius)
+    end = min(len(lines), issue.line + radius)
+    return "\n".join(f"{'>' if number == issue.line else ' '}{number:5d} | {lines[number - 1]}" for number in range(start + 1, end + 1))
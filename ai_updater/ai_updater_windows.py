@@ -0,0 +1,161 @@
+import re
+
+from pydantic import BaseModel
+
+from ai_updater_changes import ChangeModel
+from ai_updater_hunks import IDENTIFIER_PATTERN, extract_anchors
+from ai_updater_index import parse_source
+
+# Files with fewer lines are always edited as a whole
+WINDOWED_MIN_LINES = 400
+# Definitions up to this many lines are sent whole when they contain an anchor, longer ones only around the anchor
+MAX_DEFINITION_LINES = 150
+# Lines of context around an anchor outside of a short enough definition
+WINDOW_CONTEXT_LINES = 20
+# Windows separated by at most this many lines are merged
+MERGE_GAP_LINES = 10
+# Anchors occurring more often than this don't locate a change (e.g. a type used everywhere in the file)
+MAX_ANCHOR_OCCURRENCES = 8
+# Windowing is not worth it when the windows cover more than this fraction of the file
+MAX_WINDOWED_FRACTION = 0.5
+IMPORT_PATTERN = re.compile(r"^\s*(?:import\b|from\s+\S+\s+import\b|#\s*include\b|export\s+.*\bfrom\b)")
+
+
+class Window(BaseModel):
+    """A region of a file that is edited on its own.
+    start_line: 1-based first line of the window.
+    end_line: 1-based last line of the window (inclusive).
+    anchors: The anchors that located the window.
+    """
+    start_line: int
+    end_line: int
+    anchors: list[str] = []
+
+
+class WindowPlan(BaseModel):
+    """The windows of a file affected by a change, and the skeleton sent along with each of them.
+    windows: Disjoint windows, in file order.
+    skeleton: Outline of the file (imports and definitions with their line numbers), with the windows marked.
+    line_count: Number of lines of the file.
+    """
+    windows: list[Window]
+    skeleton: str
+    line_count: int
+
+    @property
+    def windowed_lines(self) -> int:
+        return sum(window.end_line - window.start_line + 1 for window in self.windows)
+
+
+def _definition_spans(file_path: str, content: str, line_count: int) -> list[tuple[int, int]]:
+    """Line spans of the definitions of a file (methods nested in their class, as found by parse_source)."""
+    symbols, _ = parse_source(file_path, content)
+    lines = sorted({symbol.line for symbol in symbols})
+    return [(start, lines[i + 1] - 1 if i + 1 < len(lines) else line_count) for i, start in enumerate(lines)]
+
+
+def plan_windows(file_path: str, content: str, implementation_detail: str, change_model: ChangeModel = None) -> WindowPlan | None:
+    """Locate the regions of a large file that a change touches.
+
+    Every line mentioning an anchor (an identifier named in the implementation details or the proto change) is
+    covered by the definition it belongs to if that definition is short enough, or else by WINDOW_CONTEXT_LINES lines
+    around it. Windows that overlap or are close to each other are merged. If the change mentions imports, the import
+    block of the file gets a window as well.
+
+    Args:
+        file_path: Path of the file (used to determine the language)
+        content: Content of the file
+        implementation_detail: The implementation instructions for the file
+        change_model: The change model of the proto change, if available
+
+    Returns:
+        WindowPlan | None: The windows and skeleton, or None if no window could be located or if the windows would
+            cover most of the file anyway
+    """
+    lines = content.splitlines()
+    anchors = extract_anchors(implementation_detail, change_model)
+    anchor_lines: dict[str, list[int]] = {}
+    for number, line in enumerate(lines, start=1):
+        for identifier in set(IDENTIFIER_PATTERN.findall(line)):
+            normalized = identifier.replace("_", "").lower()
+            if normalized in anchors:
+                anchor_lines.setdefault(identifier, []).append(number)
+
+    spans = _definition_spans(file_path, content, len(lines))
+    regions = []
+    for anchor, numbers in anchor_lines.items():
+        if len(numbers) > MAX_ANCHOR_OCCURRENCES:
+            continue
+        for number in numbers:
+            span = next(((start, end) for start, end in reversed(spans) if start <= number <= end), None)
+            if span is not None and span[1] - span[0] < MAX_DEFINITION_LINES:
+                regions.append((span[0], span[1], anchor))
+            else:
+                regions.append((max(1, number - WINDOW_CONTEXT_LINES), min(len(lines), number + WINDOW_CONTEXT_LINES), anchor))
+    if "import" in implementation_detail.lower() or "include" in implementation_detail.lower():
+        import_lines = [number for number, line in enumerate(lines, start=1) if IMPORT_PATTERN.match(line)]
+        if import_lines:
+            regions.append((1, import_lines[-1] + 1, "imports"))
+    if not regions:
+        return None
+
+    windows: list[Window] = []
+    for start, end, anchor in sorted(regions):
+        if windows and start <= windows[-1].end_line + MERGE_GAP_LINES:
+            windows[-1].end_line = max(windows[-1].end_line, end)
+            if anchor not in windows[-1].anchors:
+                windows[-1].anchors.append(anchor)
+        else:
+            windows.append(Window(start_line=start, end_line=end, anchors=[anchor]))
+    plan = WindowPlan(windows=windows, skeleton="", line_count=len(lines))
+    if plan.windowed_lines > MAX_WINDOWED_FRACTION * len(lines):
+        return None
+    plan.skeleton = _skeleton(lines, spans, windows)
+    return plan
+
+
+def _skeleton(lines: list[str], spans: list[tuple[int, int]], windows: list[Window]) -> str:
+    """Outline a file with its imports and definition lines, marking the windows."""
+    width = len(str(len(lines)))
+    outline = {number for number, line in enumerate(lines, start=1) if IMPORT_PATTERN.match(line)}
+    outline.update(start for start, _ in spans)
+    result = []
+    previous = 0
+    for number in sorted(outline | {window.start_line for window in windows}):
+        window = next((window for window in windows if window.start_line == number), None)
+        if number > previous + 1:
+            result.append(f"{'':>{width}}| ...")
+        if window is not None:
+            result.append(f"[window {windows.index(window) + 1}: lines {window.start_line}-{window.end_line}]")
+        result.append(f"{number:>{width}}| {lines[number - 1].rstrip()}")
+        previous = number
+    if previous < len(lines):
+        result.append(f"{'':>{width}}| ...")
+    return "\n".join(result)
+
+
+def window_text(content: str, window: Window) -> str:
+    """Return the lines of a window, with a trailing newline."""
+    return "".join(line + "\n" for line in content.splitlines()[window.start_line - 1:window.end_line])
+
+
+def stitch_windows(content: str, windows: list[Window], edited: list[str]) -> str:
+    """Replace the windows of a file with their edited versions.
+
+    Args:
+        content: Original content of the file
+        windows: Disjoint windows, in file order
+        edited: New content of each window
+
+    Returns:
+        str: The stitched file
+    """
+    lines = content.splitlines(keepends=True)
+    for window, text in sorted(zip(windows, edited), key=lambda item: -item[0].start_line):
+        replacement = text.splitlines(keepends=True)
+        if replacement and not replacement[-1].endswith("\n"):
+            replacement[-1] += "\n"
+        if window.end_line == len(lines) and not content.endswith("\n") and replacement:
+            replacement[-1] = replacement[-1][:-1]
+        lines[window.start_line - 1:window.end_line] = replacement
+    return "".join(lines)
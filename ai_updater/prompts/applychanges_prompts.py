@@ -69,6 +69,7 @@ Generate two equal-length lists:
 2. Generate your initial `search_text` and `replacement_text` lists
 3. Call the `apply_patch` tool to test your patches
 4. If errors occur:
+   - Patches that applied cleanly are locked in. Call `apply_patch` again with ONLY the failed patches, in the order given by the error
    - "Search text appears X times": Expand the search block with more unique context
    - "Search text not found": Verify the search text is an exact character-for-character copy
    - "Mismatched list lengths": Ensure both lists have equal length
@@ -109,7 +110,7 @@ Generate two equal-length lists:
 1. Analyze the requirements and target file
 2. Generate patches with sufficient context for uniqueness
 3. The system will test your patches with `apply_patch`
-4. If errors occur, revise based on the feedback:
+4. If errors occur, revise based on the feedback and resend only the failed patches (the others are locked in):
    - Non-unique search text → Add more surrounding context
    - Text not found → Verify exact character matching
    - Length mismatch → Ensure equal list lengths
@@ -125,6 +126,105 @@ Generate two equal-length lists:
 Begin by carefully reading the implementation requirements and file content, then generate your patches.
 """
 
+#Main prompt for generating line-range edits
+GENERATELINEEDITS_P = """
+You need to implement the following changes for a single file:
+{implementation_detail}
+
+Here is the complete current file content, with every line prefixed by its line number and "| " (the prefix is not part of the file):
+{existing_file_content}
+
+## Output Format
+
+Return a list of `edits`, each replacing a range of lines of the file:
+- `start_line`: the number of the first line to replace
+- `end_line`: the number of the last line to replace (inclusive). To insert new lines without replacing any, set `end_line` to `start_line - 1`: the new lines are inserted before `start_line`.
+- `replacement_text`: the new lines, without line number prefixes
+
+## Critical Success Criteria
+
+1. **Original Line Numbers**: Every edit refers to the line numbers shown above, regardless of the other edits. Edits must not overlap.
+2. **Exact Formatting**: Replacement lines must use the indentation and formatting of the surrounding code.
+3. **Minimal Changes**: Only replace the lines that need to change. Lines outside of the edits are kept exactly as they are.
+4. **Strict Adherence to Implementation Details**: Implement *only* what is explicitly requested in the implementation details.
+"""
+
+#System prompt for generating line-range edits.
+GENERATELINEEDITS_S = """
+You are a precise code editor. You receive the contents of a single file with line numbers, and instructions describing
+the changes to make to it. You describe the changes as replacements of line ranges of the original file, touching as few
+lines as possible. Line numbers must be exact: a wrong line number corrupts the file. BE EXTREMELY CAREFUL TO NOT MAKE
+SUBTLE CHANGES TO EXISTING CODE OR COMMENTS IF THEY ARE NOT EXPLICITLY INSTRUCTED.
+"""
+
+#Main prompt for editing one window of a large file.
+GENERATEWINDOW_P = '''
+You need to implement the following changes for a single file:
+{implementation_detail}
+
+The file is too large to be edited as a whole, so it is edited in windows. Here is an outline of the file, with its imports and definitions
+and the line numbers of every window:
+{skeleton}
+
+You are editing window {window_number} of {window_count}, lines {start_line}-{end_line} of `{file_path}`. Other windows are edited separately,
+so implement ONLY the parts of the changes that belong inside this window. If no part of the changes belongs inside this window, return it unchanged.
+
+{window_content}
+
+Provide the complete new content of this window only. It replaces lines {start_line}-{end_line} of the file as it is, so it must start and end
+at the same places in the code. The content should be raw code, not wrapped in markdown or any other formatting beyond standard syntax.
+'''
+
+#System prompt for editing one window of a large file.
+GENERATEWINDOW_S = '''
+You are a precise and careful code generator. You will receive specific implementation details about the code changes needed for a single
+file, an outline of the file and one window (a range of lines) of it. Your task is to regenerate the complete content of this window,
+integrating ONLY the parts of the changes that belong inside it. It is CRITICAL that you preserve the exact original formatting, including
+newlines, indentation, and whitespace. BE EXTREMELY CAREFUL TO NOT MAKE SUBTLE CHANGES TO EXISTING CODE OR COMMENTS IF THEY ARE NOT
+EXPLICITLY INSTRUCTED.
+'''
+
+#Prompt for continuing a file or window whose generation was cut off by the output token limit
+GENERATECONTINUATION_P = '''
+Your previous response was cut off by the output length limit. Its last complete lines were:
+{last_lines}
+
+Continue the output from the line right after these lines. Do NOT repeat any line you already produced, do NOT start over and
+do NOT add any explanation. Output only the remaining lines, with the same formatting, and end the output exactly as the complete
+output would end.
+'''
+
+#Prompt for resolving a conflict between independent edits of the same file
+MERGECONFLICT_P = '''
+Several independent changes were implemented in parallel in `{file_path}`, each starting from the same original file. Their edits overlap
+in lines {start_line}-{end_line} of the original file, so they must be combined by hand. These are the instructions of the changes:
+{implementation_details}
+
+The lines before the region, for reference only (do not repeat them):
+{context_before}
+
+The original lines {start_line}-{end_line}:
+{base_region}
+
+The lines after the region, for reference only (do not repeat them):
+{context_after}
+
+This is how each change rewrote the region:
+{versions}
+
+Provide the complete new content of the region only, combining ALL of the changes above. It replaces lines {start_line}-{end_line} of the
+original file, so it must start and end at the same places in the code. The content should be raw code, not wrapped in markdown or any other
+formatting beyond standard syntax.
+'''
+
+#System prompt for resolving a conflict between independent edits of the same file
+MERGECONFLICT_S = '''
+You are a precise and careful code generator merging independent edits of the same region of a file. You will receive the instructions of
+each edit, the original region with its surroundings and the region as rewritten by each edit. Your task is to output the region with every
+edit applied, keeping everything each edit added and nothing it did not. It is CRITICAL that you preserve the exact original formatting,
+including newlines, indentation, and whitespace.
+'''
+
 GENERATESUMMARY_P = '''You are an expert technical writer, adept at summarizing code changes from a git diff and a list of required changes. Your goal is to provide a concise, human-readable summary that can be used in a pull request body. Focus on the core purpose of the changes and their impact, not line-by-line details. The summary should be a short paragraph or a few bullet points.
 
 Here is the original git diff that led to the changes:
@@ -134,3 +234,13 @@ Here is the AI's analysis of the required code changes, including files to updat
 {diff_analysis_text}
 
 Provide a summary of the changes. The summary should be concise and easy to understand for a reviewer.'''
+
+#Implementation detail used to regenerate a file that failed the local syntax check.
+FIXSYNTAX_P = '''{implementation_detail}
+
+IMPORTANT: The file content provided below already contains these changes, but it fails a syntax check at {error_location}.
+Here are the lines around the error (the error line is marked with '>'):
+{error_context}
+
+Fix ONLY this syntax error. Every other line of the file must be reproduced exactly as it is provided.
+'''
@@ -80,7 +80,7 @@ Ensure that your proposed changes are what an expert developer would write and c
 
 Your response must contain:
 - `files_to_update`: List of file paths that need modification or creation
-- `implementation_details`: List of detailed implementation instructions (one per file, same order as files_to_update)
+- `implementation_details`: List of detailed implementation instructions (one per entry of files_to_update, in the same order)
 - `create_new_files`: List of booleans indicating whether or not to create a new file for each file in `files_to_update`
 
 Your output should only include files that need changes. Never include files that do not need changes. Never suggest any changes to auto-generated files.
@@ -111,8 +111,88 @@ Critical success factors:
 - SCOPE: Only suggest changes that are directly necessitated by the proto diff; do not invent or suggest extraneous modifications. Never suggest modifications to auto-generated files.
 
 IMPORTANT OUTPUT RULES:
-- For each file in `files_to_update`, output exactly ONE corresponding implementation instruction (containing all the changes needed for that file) in `implementation_details` (in the same order).
-- Never output multiple instruction lists for a single file. Each file must have a single, comprehensive instruction entry.
+- For each entry of `files_to_update`, output exactly ONE corresponding implementation instruction in `implementation_details` (in the same order).
+- Usually a file has a single, comprehensive instruction entry containing all the changes needed for that file. An existing file that needs several independent changes (e.g. mocks of several unrelated services added to the same mocks file) may instead be listed once per change, with an instruction covering only that change. These entries are implemented in parallel from the same original file, so each instruction must be self-contained, and changes that depend on each other or touch the same code must share one entry. A new file is always listed once.
 - The lengths of `files_to_update`, `implementation_details`, and `create_new_files` must always match exactly.
 '''
 
+
+#Prompt for the planning pass of the two-phase diff analysis (--analysis planned)
+DIFFPLANNER_P = '''
+You are planning the SDK changes needed to implement a proto definition change. You do NOT write implementation instructions: a
+separate call will write the detailed instructions for each file you plan, given the git diff, your plan and the context relevant to that file.
+
+## Git Diff (Proto Changes):
+{git_diff_output}
+
+## Context Files (outline only: the definitions found in each file):
+{context_outlines}
+
+## OUTPUT REQUIREMENTS:
+
+Your response must contain:
+- `files_to_update`: List of file paths that need modification or creation, including the corresponding tests
+- `intents`: One or two sentences per file (same order as files_to_update) summarizing what changes in that file
+- `requires_creation`: List of booleans indicating whether or not each file needs to be created from scratch
+
+Only include files that need changes. Never include files that do not need changes. Never suggest any changes to auto-generated files.
+An existing file that needs several independent changes may be listed once per change (they are implemented in parallel from the same
+original file), changes that depend on each other or touch the same code must share one entry.
+'''
+
+#System prompt for the planning pass of the two-phase diff analysis
+DIFFPLANNER_S = '''
+You are a senior SDK developer planning the code changes required by protocol buffer changes. You decide which files of the SDK need to
+change and summarize the change to each of them in a sentence or two, following the structure and conventions visible in the outline of the
+SDK files. Only plan changes that are directly necessitated by the proto diff. The lengths of `files_to_update`, `intents` and
+`requires_creation` must always match exactly.
+'''
+
+#Prompt for the per-file pass of the two-phase diff analysis (--analysis planned)
+FILEINSTRUCTIONS_P = '''
+You are Stage 2 in a three-stage AI pipeline for automatically updating SDK code based on proto definition changes. The changes have
+already been planned across files; your job is to write the implementation instructions for ONE file of the plan: `{file_path}`, {file_state}.
+
+## Git Diff (Proto Changes):
+{git_diff_output}
+
+## Change Plan (all files):
+{change_plan}
+
+## Planned Change for `{file_path}`:
+{intent}
+
+## Context Files Related to `{file_path}`:
+{selected_context_files}
+
+## CRITICAL REQUIREMENTS FOR YOUR OUTPUT:
+
+Your response must contain `implementation_details`: the complete implementation instructions for `{file_path}` only. They must be:
+- **COMPLETE**: Include every detail needed to implement the changes correctly
+- **SPECIFIC**: Provide exact method signatures, parameter names, return types, and implementation logic
+- **UNAMBIGUOUS**: Stage 3 will implement exactly what you specify with no additional context
+- **PATTERN-FOLLOWING**: Use the context files to understand and follow existing SDK conventions
+- **CONSISTENT**: Use the same names as the other files of the change plan when referring to code they add
+
+For an existing file, specify exactly which methods/classes/functions need to be added, modified, or removed and where in the file to place
+new code. If the file is listed several times in the change plan, only cover the planned change above: the other changes are implemented in
+parallel from their own instructions. For a new file, explicitly state "This is a new file that needs to be created from scratch" and describe the complete file
+structure. Never suggest any changes to auto-generated files.
+
+Remember: Stage 3 will receive only your implementation instructions and the existing file content (if the file exists). It will not have
+access to the git diff, context files, or any other information. Your instructions must be completely self-contained and actionable.
+'''
+
+#System prompt for the per-file pass of the two-phase diff analysis
+FILEINSTRUCTIONS_S = '''
+You are a precise code analysis and instruction generation AI specializing in SDK development.
+
+Your role is to translate the planned change to a single SDK file into specific, actionable implementation instructions for downstream code
+generation. Leverage the provided context files to follow the existing patterns and conventions of the SDK, include every detail needed for
+correct code and documentation, and preserve existing behavior. Only describe changes to the file you are asked about, and only changes that
+are directly necessitated by the proto diff. Never suggest modifications to auto-generated files.
+'''
+
+#Intent of a file the diff analysis listed without instructions, when its instructions are asked again (see AIUpdater.repair_diff_analysis)
+MISSINGINSTRUCTIONS_INTENT = '''The diff analysis listed this file as needing changes, but its instructions were lost. Work out the changes the git diff
+requires in this file, consistently with the rest of the change plan.'''
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The ai_updater modules import each other as top-level modules, as when ai_updater.py is run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,60 @@
+import pytest
+
+from ai_updater_continuation import complete_lines, output_token_limit, splice
+from ai_updater_strategy import LineEdit, apply_line_edits
+from ai_updater_windows import Window, stitch_windows
+
+CONTENT = "line 1\nline 2\nline 3\nline 4\n"
+
+
+def test_apply_line_edits_against_original_numbers():
+    edits = [LineEdit(start_line=3, end_line=3, replacement_text="three"),
+             LineEdit(start_line=1, end_line=1, replacement_text="one\none bis\n")]
+    assert apply_line_edits(CONTENT, edits) == "one\none bis\nline 2\nthree\nline 4\n"
+
+
+def test_apply_line_edits_insert_and_delete():
+    edits = [LineEdit(start_line=2, end_line=1, replacement_text="inserted"), LineEdit(start_line=4, end_line=4, replacement_text="")]
+    assert apply_line_edits(CONTENT, edits) == "line 1\ninserted\nline 2\nline 3\n"
+
+
+def test_apply_line_edits_missing_final_newline():
+    assert apply_line_edits("a\nb", [LineEdit(start_line=2, end_line=2, replacement_text="c\n")]) == "a\nc"
+    assert apply_line_edits("a\nb", [LineEdit(start_line=3, end_line=2, replacement_text="c")]) == "a\nb\nc"
+
+
+def test_apply_line_edits_rejects_bad_ranges():
+    with pytest.raises(ValueError):
+        apply_line_edits(CONTENT, [LineEdit(start_line=4, end_line=5, replacement_text="")])
+    with pytest.raises(ValueError):
+        apply_line_edits(CONTENT, [LineEdit(start_line=1, end_line=2, replacement_text=""),
+                                   LineEdit(start_line=2, end_line=3, replacement_text="")])
+
+
+def test_stitch_windows():
+    windows = [Window(start_line=1, end_line=1), Window(start_line=3, end_line=4)]
+    assert stitch_windows(CONTENT, windows, ["first\nextra", "last\n"]) == "first\nextra\nline 2\nlast\n"
+
+
+def test_stitch_windows_missing_final_newline():
+    assert stitch_windows("a\nb\nc", [Window(start_line=3, end_line=3)], ["C\nD\n"]) == "a\nb\nC\nD"
+    assert stitch_windows("a\nb\nc", [Window(start_line=2, end_line=2)], [""]) == "a\nc"
+
+
+def test_splice_drops_repeated_lines():
+    previous = "def f():\n    a = 1\n    b = 2\n"
+    assert splice(previous, "    b = 2\n    return a + b\n") == previous + "    return a + b\n"
+    assert splice(previous, "```python\n    a = 1\n    b = 2\n    return a\n```") == previous + "    return a\n```"
+
+
+def test_splice_ignores_blank_overlaps():
+    assert splice("a\n\n", "\nb\n") == "a\n\n\nb\n"
+    assert splice("a\n", "b\n") == "a\nb\n"
+
+
+def test_complete_lines_and_output_limit():
+    assert complete_lines("a\nb\nhalf a li") == "a\nb\n"
+    assert complete_lines("no newline") == ""
+    assert output_token_limit(100) == 8192
+    assert output_token_limit(20000) == 30000
+    assert output_token_limit(10 ** 6) == 65536
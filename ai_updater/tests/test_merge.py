@@ -0,0 +1,61 @@
+from ai_updater_merge import merge3
+
+BASE = "import a\n\nclass Mock:\n    pass\n"
+
+
+def test_identical_changes_are_applied_once():
+    version = BASE.replace("import a\n", "import a\nimport b\n")
+    result = merge3(BASE, [version, version])
+    assert not result.conflicts
+    assert result.content() == version
+
+
+def test_inserts_at_the_same_place_are_all_kept():
+    result = merge3(BASE, [BASE.replace("import a\n", "import a\nimport b\n"), BASE.replace("import a\n", "import a\nimport c\n")])
+    assert not result.conflicts
+    assert result.content() == "import a\nimport b\nimport c\n\nclass Mock:\n    pass\n"
+
+
+def test_contained_insert_is_kept_once():
+    result = merge3(BASE, [BASE.replace("import a\n", "import a\nimport b\n"), BASE.replace("import a\n", "import a\nimport b\nimport c\n")])
+    assert result.content() == "import a\nimport b\nimport c\n\nclass Mock:\n    pass\n"
+
+
+def test_insert_before_a_replacement_at_the_same_line():
+    inserted = BASE.replace("class Mock:\n", "# mock\nclass Mock:\n")
+    replaced = BASE.replace("class Mock:\n", "class Mock(Base):\n")
+    result = merge3(BASE, [inserted, replaced])
+    assert not result.conflicts
+    assert result.content() == "import a\n\n# mock\nclass Mock(Base):\n    pass\n"
+
+
+def test_incompatible_replacements_conflict():
+    first = BASE.replace("    pass\n", "    x = 1\n")
+    second = BASE.replace("    pass\n", "    y = 2\n")
+    result = merge3(BASE, [first, second, BASE.replace("import a\n", "import a\nimport b\n")])
+    assert len(result.conflicts) == 1
+    conflict = result.conflicts[0]
+    assert (conflict.base_start, conflict.base_end, conflict.base_lines) == (3, 4, ["    pass\n"])
+    assert conflict.versions == [["    x = 1\n"], ["    y = 2\n"]]
+    # The conflict defaults to the first version, a resolution replaces the whole region
+    assert result.content() == "import a\nimport b\n\nclass Mock:\n    x = 1\n"
+    assert result.content(["    x = 1\n    y = 2"]) == "import a\nimport b\n\nclass Mock:\n    x = 1\n    y = 2\n"
+
+
+def test_version_deleting_the_whole_file_conflicts():
+    result = merge3(BASE, ["", BASE.replace("pass", "x = 1")])
+    assert len(result.conflicts) == 1
+    assert result.conflicts[0].versions[0] == []
+    assert result.content([BASE.replace("pass", "x = 1")]) == BASE.replace("pass", "x = 1")
+
+
+def test_missing_final_newline():
+    result = merge3(BASE, [BASE.rstrip("\n"), BASE + "\n\nclass Other:\n    pass\n"])
+    assert not result.conflicts
+    assert result.content() == BASE + "\n\nclass Other:\n    pass\n"
+
+
+def test_unchanged_versions():
+    result = merge3(BASE, [BASE, BASE])
+    assert not result.hunks and not result.conflicts
+    assert result.content() == BASE
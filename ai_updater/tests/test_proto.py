@@ -0,0 +1,104 @@
+import pytest
+
+from ai_updater_proto import ProtoParseError, diff_schemas, parse_int, parse_proto
+
+GRIPPER = '''syntax = "proto3";
+
+package viam.component.gripper.v1;
+
+import "google/api/annotations.proto";
+
+// GripperService represents a gripper
+service GripperService {
+  // Open opens a gripper
+  rpc Open(OpenRequest) returns (OpenResponse) {
+    option (google.api.http) = {post: "/viam/api/v1/component/gripper/{name}/open"};
+  }
+  rpc StreamStatus(stream StatusRequest) returns (stream StatusResponse);
+}
+
+message OpenRequest {
+  // Name of the gripper
+  string name = 1;
+  map<string, double> extra = 99; // Additional arguments
+  oneof target {
+    double position = 2;
+    string preset = 3;
+  }
+}
+'''
+
+
+def test_parse_int():
+    assert [parse_int(token) for token in ("0", "10", "010", "0x1F", "0X1f", "-1", "+7")] == [0, 10, 8, 31, 31, -1, 7]
+    for token in ("09", "1.5", "abc", "0x"):
+        with pytest.raises(ProtoParseError):
+            parse_int(token)
+
+
+def test_octal_and_hex_field_numbers():
+    schema = parse_proto("message M { int32 a = 010; int32 b = 0x10; }")
+    assert schema.messages["M"].fields["a"].number == 8
+    assert schema.messages["M"].fields["b"].number == 16
+
+
+def test_negative_enum_values():
+    schema = parse_proto("package p;\nenum E { A = 0; B = -1; C = -0x2 [deprecated = true]; }")
+    assert schema.enums["p.E"].values == {"A": 0, "B": -1, "C": -2}
+
+
+def test_oneof_and_map_fields():
+    fields = parse_proto(GRIPPER).messages["viam.component.gripper.v1.OpenRequest"].fields
+    assert fields["position"].oneof == "target" and fields["preset"].oneof == "target"
+    assert fields["name"].oneof == ""
+    assert fields["extra"].type == "map<string, double>" and fields["extra"].number == 99
+
+
+def test_aggregate_options():
+    rpc = parse_proto(GRIPPER).services["viam.component.gripper.v1.GripperService"].rpcs["Open"]
+    assert rpc.options == {"(google.api.http)": '{ post : "/viam/api/v1/component/gripper/{name}/open" }'}
+
+
+def test_adjacent_string_literals():
+    schema = parse_proto('package p;\noption go_package = "a" \'b\';\nmessage M { string s = 1 [(c) = "x" "y"]; }')
+    assert schema.messages["p.M"].fields["s"].options == {"(c)": '"xy"'}
+
+
+def test_leading_and_trailing_comments():
+    schema = parse_proto(GRIPPER)
+    fields = schema.messages["viam.component.gripper.v1.OpenRequest"].fields
+    assert fields["name"].comment == "Name of the gripper"
+    # The trailing comment of extra is not the leading comment of the oneof field after it
+    assert fields["extra"].comment == "" and fields["position"].comment == ""
+    service = schema.services["viam.component.gripper.v1.GripperService"]
+    assert service.comment == "GripperService represents a gripper"
+    assert service.rpcs["Open"].comment == "Open opens a gripper"
+
+
+def test_stream_rpcs():
+    rpc = parse_proto(GRIPPER).services["viam.component.gripper.v1.GripperService"].rpcs["StreamStatus"]
+    assert rpc.client_streaming and rpc.server_streaming
+    assert rpc.signature() == "(stream StatusRequest) returns (stream StatusResponse)"
+    # A message named stream is not a stream
+    rpc = parse_proto("service S { rpc A(stream) returns (B); }").services["S"].rpcs["A"]
+    assert rpc.request == "stream" and not rpc.client_streaming
+
+
+def test_parse_error():
+    with pytest.raises(ProtoParseError):
+        parse_proto("message M { int32 a = ; }")
+
+
+def test_diff_schemas():
+    new = GRIPPER.replace("  rpc StreamStatus", "  rpc GetKinematics(GetKinematicsRequest) returns (GetKinematicsResponse);\n  rpc StreamStatus")
+    new = new.replace("  string name = 1;", "  string name = 1;\n  optional double speed = 4;")
+    diff = diff_schemas(parse_proto(GRIPPER), parse_proto(new))
+    assert [change.describe() for change in diff.changes] == [
+        "added rpc viam.component.gripper.v1.GripperService/GetKinematics: (GetKinematicsRequest) returns (GetKinematicsResponse)",
+        "added field viam.component.gripper.v1.OpenRequest.speed: optional double = 4",
+    ]
+    assert diff.packages == ["viam.component.gripper.v1"]
+    change_model = diff.to_change_model()
+    assert change_model.rpcs_added == ["viam.component.gripper.v1.GripperService/GetKinematics"]
+    assert change_model.fields_added == {"viam.component.gripper.v1.OpenRequest.speed": "optional double"}
+    assert diff_schemas(parse_proto(GRIPPER), parse_proto(GRIPPER)).is_empty()
@@ -0,0 +1,62 @@
+import types
+
+from pydantic import BaseModel
+
+from ai_updater_repair import normalize_path, parse_structured, repair_entries, repair_inclusion
+
+KNOWN_FILES = {"src/viam/components/arm/arm.py", "src/viam/components/arm/client.py", "tests/mocks/components.py"}
+
+
+class Changes(BaseModel):
+    files_to_update: list[str]
+    implementation_details: list[str]
+    requires_creation: list[bool]
+
+
+def response(text: str):
+    return types.SimpleNamespace(parsed=None, text=text)
+
+
+def test_parse_structured_lenient_json():
+    text = 'Here you go:\n```json\n{"files": "src/viam/components/arm/arm.py", "instructions": ["add it"], "unknown": 1}\n```'
+    assert parse_structured(response(text), Changes) == {"files_to_update": ["src/viam/components/arm/arm.py"],
+                                                         "implementation_details": ["add it"]}
+    assert parse_structured(response("no json here"), Changes) is None
+    assert parse_structured(response("{not json}"), Changes) is None
+
+
+def test_normalize_path():
+    assert normalize_path("`./src/viam/components/arm/arm.py`", "/nonexistent", KNOWN_FILES) == "src/viam/components/arm/arm.py"
+    assert normalize_path("viam/components/arm/client.py", "/nonexistent", KNOWN_FILES) == "src/viam/components/arm/client.py"
+    assert normalize_path("/nonexistent/tests/mocks/components.py", "/nonexistent", KNOWN_FILES) == "tests/mocks/components.py"
+
+
+def test_repair_entries():
+    exists = lambda path: path in KNOWN_FILES
+    repair = repair_entries(
+        paths=["viam/components/arm/arm.py", "src/viam/components/arm/arm.py", "src/viam/gen/arm_pb2.py", "",
+               "tests/mocks/components.py", "tests/mocks/components.py", "src/viam/components/arm/new.py"],
+        texts=["add the method", "add the method", "regenerate", "orphan", "mock A", "mock B", "", "dropped"],
+        creations=[True, False, False, False, "no", "no", "yes"],
+        sdk_root_dir="/nonexistent", known_files=KNOWN_FILES, generated_dir="src/viam/gen", exists=exists)
+    assert repair.paths == ["src/viam/components/arm/arm.py", "tests/mocks/components.py", "tests/mocks/components.py",
+                            "src/viam/components/arm/new.py"]
+    # A file listed with different instructions is kept once per instruction
+    assert repair.texts == ["add the method", "mock A", "mock B", ""]
+    assert repair.creations == [False, False, False, True]
+    assert repair.missing == [3]
+    assert "dropped 1 instructions without a file" in repair.notes
+    assert "dropped src/viam/gen/arm_pb2.py (generated code)" in repair.notes
+
+
+def test_repair_entries_drops_entries_without_instructions_of_listed_files():
+    repair = repair_entries(["tests/mocks/components.py", "tests/mocks/components.py"], ["", "mock A"], [False, False],
+                            "/nonexistent", KNOWN_FILES, exists=lambda path: True)
+    assert (repair.paths, repair.texts) == (["tests/mocks/components.py"], ["mock A"])
+
+
+def test_repair_inclusion():
+    assert repair_inclusion({"filename": "other.py", "inclusion": "Yes.", "reasoning": None}, "arm.py") == {
+        "filename": "arm.py", "inclusion": True, "reasoning": ""}
+    assert repair_inclusion({"inclusion": "maybe"}, "arm.py") is None
+    assert repair_inclusion(None, "arm.py") is None
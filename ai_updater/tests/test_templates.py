@@ -0,0 +1,138 @@
+from ai_updater_templates import ChangeShape, _brace_new_rpc, _clone_members, _imports_available, _rename, camel_to_snake, parse_items
+
+RENAMES = {"base": "gripper", "Base": "Gripper", "BASE": "GRIPPER"}
+ARM_RENAMES = {"arm": "gripper", "Arm": "Gripper", "ARM": "GRIPPER"}
+
+
+def test_rename_sibling_names():
+    source = ("from viam.proto.component.base import BaseServiceBase, BaseServiceStub\n"
+              "import viam.gen.component.base.v1.base_pb2\n"
+              "class BaseClient(Base):\n"
+              "    base = MockBase('base')  # my_base, TestBase, BASE_SPEED\n")
+    assert _rename(source, RENAMES) == (
+        "from viam.proto.component.gripper import GripperServiceBase, GripperServiceStub\n"
+        "import viam.gen.component.gripper.v1.gripper_pb2\n"
+        "class GripperClient(Gripper):\n"
+        "    gripper = MockGripper('gripper')  # my_gripper, TestGripper, GRIPPER_SPEED\n")
+
+
+def test_rename_leaves_segments_of_other_names():
+    source = ("from ..component_base import ComponentBase\n"
+              "from viam.resource.rpc_service_base import ResourceRPCServiceBase\n"
+              "class X(BaseModel, ReconfigurableResourceRPCClientBase): base_url = my_base_url\n")
+    assert _rename(source, RENAMES) == source
+
+
+def test_rename_names_of_the_other_sdks():
+    source = "import { ArmService } from './arm_connect'; // myArm, FakeArm, ArmServer, MockArm::get_mock_arm(), arm_client.hpp\n"
+    assert _rename(source, ARM_RENAMES) == (
+        "import { GripperService } from './gripper_connect'; // myGripper, FakeGripper, GripperServer, "
+        "MockGripper::get_mock_gripper(), gripper_client.hpp\n")
+    assert _rename("myArmy, arm_clients, Armature", ARM_RENAMES) == "myArmy, arm_clients, Armature"
+
+def test_imports_available_checks_relative_imports():
+    files = {
+        "src/viam/components/component_base.py": "class ComponentBase:\n    pass\n",
+        "src/viam/components/gripper/gripper.py": "class Gripper:\n    pass\n",
+    }
+    read_file = files.get
+    module = "viam.components.gripper.client"
+    assert _imports_available("from ..component_base import ComponentBase\nfrom .gripper import Gripper\n", module, ("gripper",), read_file)
+    assert not _imports_available("from ..component_gripper import ComponentBase\n", module, ("gripper",), read_file)
+    assert not _imports_available("from .gripper import Other\n", module, ("gripper",), read_file)
+    assert not _imports_available("from viam.components.gripper.missing import Gripper\n", module, ("gripper",), read_file)
+
+
+def test_camel_to_snake():
+    assert camel_to_snake("GetKinematics") == "get_kinematics"
+    assert camel_to_snake("GetGeometries") == "get_geometries"
+    assert camel_to_snake("DoCommand") == "do_command"
+
+
+def test_parse_items_cpp_header():
+    source = ("#pragma once\n"
+              "namespace viam {\n"
+              "class Arm : public Component {\n"
+              "   public:\n"
+              "    /// @brief Returns the geometries.\n"
+              "    inline std::vector<GeometryConfig> get_geometries() {\n"
+              "        return get_geometries({});\n"
+              "    }\n"
+              "    virtual std::vector<GeometryConfig> get_geometries(const ProtoStruct& extra) = 0;\n"
+              "    bool peek_stop_called{false};\n"
+              "};\n"
+              "}  // namespace viam\n")
+    items = parse_items(source, "cpp")
+    assert [item.name for item in items] == [None, "viam"]
+    assert items[1].end == len(source)
+    class_node = parse_items(source, "cpp", *items[1].body)[0]
+    assert class_node.name == "Arm" and class_node.container
+    members = parse_items(source, "cpp", *class_node.body)
+    assert [item.name for item in members] == [None, "get_geometries", "get_geometries", "peek_stop_called"]
+    assert source[members[1].start:].startswith("    /// @brief")
+
+
+def test_clone_members_typescript_merges_imports():
+    sibling = ("import {\n  GetKinematicsRequest,\n  StopRequest,\n} from '../../gen/component/arm/v1/arm_pb';\n"
+               "import { Struct } from '@bufbuild/protobuf';\n\n"
+               "export class ArmClient implements Arm {\n"
+               "  async stop(extra = {}) {\n    await this.client.stop(new StopRequest({ name: this.name }));\n  }\n\n"
+               "  async getKinematics(extra = {}) {\n"
+               "    const request = new GetKinematicsRequest({ name: this.name, extra: Struct.fromJson(extra) });\n"
+               "    return this.client.getKinematics(request);\n  }\n}\n")
+    target = ("import {\n  StopRequest,\n} from '../../gen/component/gripper/v1/gripper_pb';\n\n"
+              "export class GripperClient implements Gripper {\n"
+              "  async stop(extra = {}) {\n    await this.client.stop(new StopRequest({ name: this.name }));\n  }\n}\n")
+    content, cloned = _clone_members(sibling, target, "getKinematics", ARM_RENAMES, "typescript")
+    assert cloned == 1
+    assert content == (
+        "import {\n  GetKinematicsRequest,\n  StopRequest,\n} from '../../gen/component/gripper/v1/gripper_pb';\n"
+        "import { Struct } from '@bufbuild/protobuf';\n\n"
+        "export class GripperClient implements Gripper {\n"
+        "  async stop(extra = {}) {\n    await this.client.stop(new StopRequest({ name: this.name }));\n  }\n\n"
+        "  async getKinematics(extra = {}) {\n"
+        "    const request = new GetKinematicsRequest({ name: this.name, extra: Struct.fromJson(extra) });\n"
+        "    return this.client.getKinematics(request);\n  }\n}\n")
+    assert _clone_members(sibling, content, "getKinematics", ARM_RENAMES, "typescript") == (content, 0)
+    assert _clone_members(sibling, target, "getGeometries", ARM_RENAMES, "typescript") == (None, 0)
+
+
+def test_clone_members_needs_the_state_of_the_sibling():
+    sibling = ("class FakeArm extends Arm {\n  bool isStopped = true;\n  Map<String, dynamic>? extra;\n\n"
+               "  @override\n  Future<bool> isMoving() async {\n    return !isStopped;\n  }\n}\n")
+    with_state = "class FakeGripper extends Gripper {\n  bool isStopped = true;\n}\n"
+    without_state = "class FakeGripper extends Gripper {\n  bool isOpen = false;\n}\n"
+    content, cloned = _clone_members(sibling, with_state, "isMoving", ARM_RENAMES, "dart")
+    assert cloned == 1 and content.endswith("  bool isStopped = true;\n\n  @override\n  Future<bool> isMoving() async {\n"
+                                            "    return !isStopped;\n  }\n}\n")
+    assert _clone_members(sibling, without_state, "isMoving", ARM_RENAMES, "dart") == (None, 0)
+
+
+def test_brace_new_rpc_cpp(tmp_path):
+    files = {
+        "components/{name}.hpp": "namespace viam {{\nclass {Name} {{\n   public:\n    virtual void stop() = 0;\n{extra}}};\n}}\n",
+        "components/private/{name}_client.hpp": "class {Name}Client {{\n    void stop() override;\n{extra}}};\n",
+        "components/private/{name}_client.cpp": "void {Name}Client::stop() {{}}\n{extra}",
+        "components/private/{name}_server.hpp": "class {Name}Server {{\n    Status Stop() override;\n{extra}}};\n",
+        "components/private/{name}_server.cpp": "Status {Name}Server::Stop() {{}}\n{extra}",
+        "tests/mocks/mock_{name}.hpp": "class Mock{Name} {{\n    void stop() override;\n{extra}}};\n",
+    }
+    extras = ["    virtual void get_kinematics() = 0;\n", "    void get_kinematics() override;\n",
+              "void ArmClient::get_kinematics() {}\n", "    Status GetKinematics() override;\n",
+              "Status ArmServer::GetKinematics() {}\n", "    void get_kinematics() override;\n"]
+    for (path, template), extra in zip(files.items(), extras):
+        for name, member in (("arm", extra), ("gripper", "")):
+            file_path = tmp_path / "src/viam/sdk" / path.format(name=name)
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            file_path.write_text(template.format(name=name, Name=name.capitalize(), extra=member))
+    shape = ChangeShape(kind="new_rpc", package="viam.component.gripper.v1", method="GetKinematics")
+    edits, complete = _brace_new_rpc("cpp", shape, str(tmp_path), lambda path: open(path).read())
+    # The arm mock is cloned, but neither resource has tests
+    assert not complete
+    contents = {edit.file_path: edit.content for edit in edits}
+    assert len(contents) == 6
+    assert contents["src/viam/sdk/components/private/gripper_client.cpp"] == (
+        "void GripperClient::stop() {}\nvoid GripperClient::get_kinematics() {}\n")
+    assert contents["src/viam/sdk/components/gripper.hpp"] == (
+        "namespace viam {\nclass Gripper {\n   public:\n    virtual void stop() = 0;\n"
+        "    virtual void get_kinematics() = 0;\n};\n}\n")
@@ -0,0 +1,30 @@
+from ai_updater_validation import check_syntax
+
+
+def test_python_syntax_error():
+    issue = check_syntax("a.py", "def f(:\n    pass\n")
+    assert issue is not None and issue.line == 1
+
+
+def test_typescript_regex_literal():
+    assert check_syntax("a.ts", "const s = x.replace(/[)}]/g, '');\nconst y = a / b / c;\n") is None
+
+
+def test_typescript_unterminated_regex():
+    issue = check_syntax("a.ts", "const r = (/abc;\n")
+    assert issue is not None and "regular expression" in issue.message
+
+
+def test_tsx_closing_tags():
+    assert check_syntax("a.tsx", "export const A = () => (<div>{x}</div>);\n") is None
+    assert check_syntax("a.tsx", "export const B = () => <img src={x} />;\n") is None
+
+
+def test_typescript_less_than_before_division():
+    assert check_syntax("a.ts", "const ok = a < b / 2 && c > d / 3;\n") is None
+
+
+def test_unbalanced_brackets():
+    issue = check_syntax("a.cpp", "int main() {\n  return 0;\n")
+    assert issue is not None and issue.message == "Unclosed '{'"
+    assert check_syntax("a.dart", "void f() { print('}'); }\n") is None